@@ -0,0 +1,282 @@
+import asyncio
+import functools
+import time
+
+from src.auth import REFRESH_MARGIN, AuthenticationError, TokenCache, auth_payload, parse_expires_at, token_body
+from src.catalog import ServiceCatalog, default_auth_url, default_endpoints
+from src.models import decode
+from src.pagination import DEFAULT_PAGE_SIZE, aiter_collection
+from src.resources import RESOURCES, query_params
+from src.session import AsyncSessionPool
+
+
+class AsyncOpenStack:
+    """
+    Client OpenStack asynchrone construit sur ``httpx.AsyncClient``.
+
+    Les méthodes retournent les réponses JSON des API sans rien afficher, ce qui
+    permet de lancer plusieurs appels en parallèle avec ``asyncio.gather``.
+    L'authentification se fait dans ``auth_openstack`` (ou au premier appel) et
+    réutilise le token du cache persistant lorsqu'un ``TokenCache`` est fourni.
+    """
+
+    def __init__(self, ip, port, name, username, password, session=None, token_cache=None,
+                 auth_url=None, interface="public", region=None, page_size=DEFAULT_PAGE_SIZE):
+        self.ip = ip
+        self.port = port
+        self.username = username
+        self.password = password
+        self.name = name
+
+        # endpoints des services : catalogue Keystone, chemins DevStack par défaut sinon
+        self.auth_url = (auth_url or default_auth_url(ip, port)).rstrip("/")
+        self.interface = interface
+        self.region = region
+        self.catalog = None
+
+        # taille des pages demandées lors du parcours des collections
+        self.page_size = page_size
+
+        # session HTTP partagée par toutes les requêtes (connexions persistantes)
+        self.session = session or AsyncSessionPool()
+
+        # cache persistant des tokens Keystone (désactivé si None)
+        self.token_cache = token_cache
+        self.token = None
+        self.token_expires_at = None
+        self.project_id = None
+        self._refresh_task = None
+
+    async def auth_openstack(self, force=False):
+        """
+        Authentifie le client auprès de Keystone, en réutilisant le token en cache s'il est valide.
+
+        Args:
+            force: ignore le cache et demande un nouveau token.
+
+        Returns:
+            Le token d'authentification de l'instance OpenStack.
+
+        Raises:
+            AuthenticationError: Keystone a refusé l'authentification.
+        """
+        url = self.auth_url + "/auth/tokens"
+
+        cache_key = TokenCache.key(url, self.username, self.name)
+        if self.token_cache is not None and not force:
+            entry = self.token_cache.get(cache_key)
+            if entry is not None:
+                self.token = entry["token"]
+                self.token_expires_at = entry["expires_at"]
+                self.project_id = entry.get("project_id")
+                self.catalog = self._build_catalog(entry.get("catalog"))
+                return self.token
+
+        headers = {
+            "Content-Type": "application/json",
+        }
+
+        print("Authentification à OpenStack...")
+
+        data = auth_payload(self.username, self.password, self.name)
+        response = await self.session.post(url, headers=headers, json=data)
+
+        if response.status_code != 201:
+            raise AuthenticationError(f"Erreur lors de l'authentification à OpenStack (HTTP {response.status_code})")
+
+        self.token = response.headers.get("X-Subject-Token")
+        body = token_body(response)
+        self.token_expires_at = parse_expires_at(body)
+        self.project_id = (body.get("token", {}).get("project") or {}).get("id")
+        self.catalog = self._build_catalog(body.get("token", {}).get("catalog"))
+
+        if self.token_cache is not None:
+            self.token_cache.set(cache_key, self.token, self.token_expires_at, catalog=self.catalog.entries,
+                                 project_id=self.project_id)
+
+        return self.token
+
+    def _build_catalog(self, entries):
+        fallback = default_endpoints(self.ip, self.port)
+        fallback["identity"] = self.auth_url
+        catalog = ServiceCatalog(entries, interface=self.interface, region=self.region, fallback=fallback)
+        # le catalogue permet à l'instrumentation d'attribuer chaque requête à son service
+        recorder = getattr(self.session, "recorder", None)
+        if recorder is not None:
+            recorder.catalog = catalog
+        return catalog
+
+    def url(self, service_type, path=""):
+        """
+        Retourne l'URL d'un chemin d'API à partir du catalogue des services.
+        """
+        return self.catalog.url(service_type, path)
+
+    def start_token_refresh(self):
+        """
+        Renouvelle le token en tâche de fond avant son expiration (processus de longue durée).
+
+        Doit être appelée depuis la boucle asyncio qui utilise le client.
+        """
+        self._refresh_task = asyncio.ensure_future(self._refresh_token())
+
+    async def _refresh_token(self):
+        margin = self.token_cache.margin if self.token_cache is not None else REFRESH_MARGIN
+        while True:
+            await asyncio.sleep(max(self.token_expires_at - margin - time.time(), 0))
+            try:
+                await self.auth_openstack(force=True)
+            except Exception as e:
+                print(f"Erreur lors du renouvellement du token : {e}")
+                await asyncio.sleep(30)
+
+    async def close(self):
+        """
+        Ferme les connexions HTTP ouvertes par le client.
+        """
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        await self.session.close()
+
+    def iter_resources(self, service_type, path, key, params=None, page_size=None, decode=None):
+        """
+        Parcourt une collection page par page (``limit``/``marker`` et liens ``next``).
+
+        Returns:
+            Un générateur asynchrone des éléments de la collection.
+        """
+        return aiter_collection(
+            self.session,
+            self.url(service_type, path),
+            key,
+            headers={"X-Auth-Token": self.token},
+            params=params,
+            page_size=self.page_size if page_size is None else page_size,
+            decode=decode,
+        )
+
+    def query(self, kind, fields=None, page_size=None, models=False, **filters):
+        """
+        Recherche des ressources en laissant le serveur appliquer les filtres.
+
+        Le client doit être authentifié. Voir ``OpenStack.query`` ; avec ``models``,
+        chaque page est convertie en modèles (``src.models``) dès sa réception.
+
+        Returns:
+            Un générateur asynchrone des ressources correspondantes.
+        """
+        resource = RESOURCES[kind]
+        # Keystone ne pagine pas ses collections
+        if resource.service_type == "identity":
+            page_size = 0
+        return self.iter_resources(
+            resource.service_type,
+            resource.path,
+            resource.key,
+            params=query_params(kind, filters, fields),
+            page_size=page_size,
+            decode=functools.partial(decode, kind) if models else None,
+        )
+
+    async def _list(self, kind, models=False, **filters):
+        if self.token is None:
+            await self.auth_openstack()
+        return [item async for item in self.query(kind, models=models, **filters)]
+
+    async def list_users(self):
+        """
+        Récupère la liste des utilisateurs.
+
+        Returns:
+            La liste des utilisateurs de l'instance OpenStack.
+        """
+        try:
+            return await self._list("users")
+        except Exception:
+            print("Erreur lors de la récupération de la liste des utilisateurs")
+            raise
+
+    async def list_projects(self):
+        """
+        Récupère la liste des projets.
+
+        Returns:
+            La réponse de Keystone contenant la liste des projets.
+        """
+        return {"projects": await self._list("projects")}
+
+    async def list_networks(self):
+        """
+        Récupère la liste des réseaux.
+
+        Returns:
+            La réponse de Neutron contenant la liste des réseaux.
+        """
+        try:
+            return {"networks": await self._list("networks")}
+        except Exception:
+            print("Erreur lors de la récupération de la liste des réseaux")
+            raise
+
+    async def list_vms(self):
+        """
+        Récupère la liste des machines virtuelles.
+
+        Returns:
+            La réponse de Nova contenant la liste des machines virtuelles.
+        """
+        return {"servers": await self._list("servers")}
+
+    async def list_images(self):
+        """
+        Récupère la liste des images.
+
+        Returns:
+            La réponse de Glance contenant la liste des images.
+        """
+        return {"images": await self._list("images")}
+
+    async def list_flavors(self):
+        """
+        Récupère la liste des flavors.
+
+        Returns:
+            La réponse de Nova contenant la liste des flavors.
+        """
+        return {"flavors": await self._list("flavors")}
+
+    async def list_routers(self):
+        """
+        Récupère la liste des routeurs.
+
+        Returns:
+            La réponse de Neutron contenant la liste des routeurs.
+        """
+        return {"routers": await self._list("routers")}
+
+    async def export(self):
+        """
+        Récupère en parallèle les réseaux, sous-réseaux, ports, machines virtuelles et routeurs.
+
+        Les collections étant indépendantes, la durée totale est proche de celle
+        de l'appel le plus lent plutôt que de la somme des appels. Chaque page est
+        convertie en modèles (``src.models``) dès sa réception : l'export ne garde
+        que les attributs utilisés, pas les dictionnaires complets de l'API.
+
+        Returns:
+            Le dictionnaire exporté par ``export_json`` (listes de modèles).
+        """
+        if self.token is None:
+            await self.auth_openstack()
+
+        # ``/servers/detail`` : mêmes attributs que l'export incrémental (``changes-since``)
+        networks, subnets, ports, servers, routers = await asyncio.gather(
+            *(self._list(kind, models=True) for kind in ("networks", "subnets", "ports", "server_details", "routers")))
+
+        return {
+            "network": {"networks": networks},
+            "subnet": {"subnets": subnets},
+            "port": {"ports": ports},
+            "servers": {"servers": servers},
+            "router": {"routers": routers},
+        }
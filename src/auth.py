@@ -0,0 +1,208 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# délai (secondes) avant l'expiration à partir duquel un token est renouvelé
+REFRESH_MARGIN = 300
+
+# durée de vie supposée d'un token quand Keystone ne renvoie pas ``expires_at``
+DEFAULT_TOKEN_LIFETIME = 3600
+
+
+class AuthenticationError(Exception):
+    """
+    Levée quand Keystone refuse l'authentification ou ne répond pas.
+    """
+
+
+def default_cache_path():
+    """
+    Retourne le chemin du cache de tokens (``$XDG_CACHE_HOME/openstack-lab/tokens.json``).
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "openstack-lab", "tokens.json")
+
+
+def auth_payload(username, password, project_name):
+    """
+    Construit le corps de la requête d'authentification Keystone (méthode password).
+    """
+    return {
+        "auth": {
+            "identity": {
+                "methods": ["password"],
+                "password": {
+                    "user": {
+                        "name": username,
+                        "domain": {"id": "default"},
+                        "password": password,
+                    }
+                },
+            },
+            "scope": {"project": {"name": project_name, "domain": {"id": "default"}}},
+        }
+    }
+
+
+def parse_expires_at(body):
+    """
+    Retourne la date d'expiration (timestamp UNIX) d'une réponse Keystone.
+
+    Args:
+        body: le corps JSON de la réponse ``POST /v3/auth/tokens``.
+
+    Returns:
+        Le timestamp d'expiration, ou une expiration par défaut s'il est absent.
+    """
+    try:
+        expires_at = body["token"]["expires_at"].replace("Z", "+00:00")
+    except (KeyError, TypeError, AttributeError):
+        return time.time() + DEFAULT_TOKEN_LIFETIME
+
+    for date_format in ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z"):
+        try:
+            return datetime.strptime(expires_at, date_format).timestamp()
+        except ValueError:
+            continue
+    return time.time() + DEFAULT_TOKEN_LIFETIME
+
+
+def token_body(response):
+    """
+    Retourne le corps JSON d'une réponse Keystone, ou un dictionnaire vide.
+    """
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+class TokenCache:
+    """
+    Cache persistant des tokens Keystone.
+
+    Les tokens sont indexés par endpoint, utilisateur et projet, et stockés avec
+    leur date d'expiration dans un fichier JSON lisible uniquement par son
+    propriétaire (0600). Un token qui expire dans moins de ``margin`` secondes
+    est considéré comme périmé.
+
+    Args:
+        path: le chemin du fichier de cache.
+        margin: la marge (secondes) avant expiration.
+    """
+
+    def __init__(self, path=None, margin=REFRESH_MARGIN):
+        self.path = path or default_cache_path()
+        self.margin = margin
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint, username, project_name):
+        return f"{endpoint}|{username}|{project_name}"
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        # écriture atomique : fichier temporaire (0600) puis renommage
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tokens-")
+        try:
+            os.fchmod(fd, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key):
+        """
+        Retourne l'entrée du cache (``token``, ``expires_at``, ...) si elle est encore valide.
+        """
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None or entry.get("expires_at", 0) - self.margin <= time.time():
+            return None
+        return entry
+
+    def find(self, token):
+        """
+        Retourne l'entrée valide du cache correspondant à un token, ou None.
+        """
+        with self._lock:
+            entries = self._load()
+        for entry in entries.values():
+            if entry.get("token") == token and entry.get("expires_at", 0) > time.time():
+                return entry
+        return None
+
+    def set(self, key, token, expires_at, **extra):
+        """
+        Enregistre un token et sa date d'expiration (timestamp UNIX).
+        """
+        with self._lock:
+            entries = self._load()
+            # on profite de l'écriture pour purger les tokens expirés
+            now = time.time()
+            entries = {k: v for k, v in entries.items() if v.get("expires_at", 0) > now}
+            entries[key] = dict(extra, token=token, expires_at=expires_at)
+            self._save(entries)
+
+    def invalidate(self, key):
+        """
+        Supprime un token du cache (par exemple après un refus de Keystone).
+        """
+        with self._lock:
+            entries = self._load()
+            if entries.pop(key, None) is not None:
+                self._save(entries)
+
+
+class TokenRefresher(threading.Thread):
+    """
+    Renouvelle un token en arrière-plan avant son expiration.
+
+    Destiné aux processus de longue durée : le thread attend jusqu'à
+    ``expires_at - margin`` puis appelle ``refresh``, qui doit s'authentifier à
+    nouveau et retourner la nouvelle date d'expiration.
+
+    Args:
+        refresh: fonction de renouvellement, retourne le nouveau ``expires_at``.
+        expires_at: la date d'expiration du token courant (timestamp UNIX).
+        margin: la marge (secondes) avant expiration.
+        retry_delay: le délai (secondes) avant une nouvelle tentative en cas d'échec.
+    """
+
+    def __init__(self, refresh, expires_at, margin=REFRESH_MARGIN, retry_delay=30):
+        super().__init__(name="token-refresher", daemon=True)
+        self.refresh = refresh
+        self.expires_at = expires_at
+        self.margin = margin
+        self.retry_delay = retry_delay
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            delay = max(self.expires_at - self.margin - time.time(), 0)
+            if self._stopped.wait(delay):
+                return
+            try:
+                self.expires_at = self.refresh()
+            except Exception as e:
+                print(f"Erreur lors du renouvellement du token : {e}")
+                self._stopped.wait(self.retry_delay)
+
+    def stop(self):
+        self._stopped.set()
+
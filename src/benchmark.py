@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import typer
+
+from src import script1, script2
+from src.fake_openstack import FakeOpenStack
+from src.session import AsyncSessionPool, SessionPool
+from src.snapshot import write_snapshot
+
+app = typer.Typer()
+
+DEFAULT_BUDGETS = os.path.join("benchmarks", "budgets.json")
+
+# tailles de cloud mesurées (nombre de machines virtuelles)
+DEFAULT_SIZES = (10, 1000, 10000)
+
+# marges par défaut : aucune requête en plus, 50 % de temps en plus ;
+# un écart de temps inférieur à MIN_SECONDS est considéré comme du bruit
+DEFAULT_TOLERANCE = {"requests": 0.0, "seconds": 0.5}
+MIN_SECONDS = 0.05
+
+# topologie créée par le cas ``create_topology`` (valeurs par défaut de la commande)
+TOPOLOGY = ("blue", "blue_subnet", "10.0.0.0/24", "blue_vm1", "red", "red_subnet", "192.168.1.0/24", "red_vm2",
+            "public", "public_subnet", "172.24.4.0/24", "public_vm3", "router")
+
+
+def cloud(size, latency=0.0, jitter=0.0, seed=1):
+    """
+    Retourne un faux cloud de ``size`` machines virtuelles, avec des réseaux et routeurs proportionnés.
+    """
+    fake = FakeOpenStack(latency={"default": latency}, jitter=jitter, seed=seed)
+    networks = max(2, size // 100)
+    fake.populate(networks=networks, routers=max(1, networks // 10), servers=size)
+    return fake
+
+
+def _client(fake):
+    return script1.OpenStack("fake", "80", "admin", "admin", "password",
+                             session=SessionPool(transport=fake.transport()))
+
+
+def _async_client(fake):
+    return script2.OpenStack("fake", "80", "admin", "admin", "password",
+                             session=AsyncSessionPool(transport=fake.async_transport()))
+
+
+def _export_json(client, fake):
+    with tempfile.TemporaryDirectory() as directory:
+        write_snapshot(os.path.join(directory, "resultat.json"), client.export())
+
+
+def _export_ndjson(client, fake):
+    with tempfile.TemporaryDirectory() as directory:
+        client.stream_export(os.path.join(directory, "resultat.ndjson"))
+
+
+def _last(fake, kind):
+    return list(fake.collections[kind].values())[-1]
+
+
+# cas mesurés : (client, fonction appelée avec le client et le faux cloud)
+CASES = {
+    "create_topology": (_client, lambda client, fake: client.create_topology(*TOPOLOGY)),
+    "export_json": (_async_client, _export_json),
+    "export_json_ndjson": (_async_client, _export_ndjson),
+    "list_networks": (_client, lambda client, fake: client.list_networks()),
+    "list_subnets": (_client, lambda client, fake: client.list_subnets()),
+    "list_vms": (_client, lambda client, fake: client.list_vms()),
+    "list_images": (_client, lambda client, fake: client.list_images()),
+    "list_flavors": (_client, lambda client, fake: client.list_flavors()),
+    "list_routers": (_client, lambda client, fake: client.list_routers()),
+    "get_image_id": (_client, lambda client, fake: client.get_image_id(_last(fake, "images")["name"])),
+    "get_flavor_id": (_client, lambda client, fake: client.get_flavor_id("m1.tiny")),
+    "get_network_id": (_client, lambda client, fake: client.get_network_id(_last(fake, "networks")["name"])),
+    "get_subnet_id": (_client, lambda client, fake: client.get_subnet_id(_last(fake, "networks")["id"])),
+    "get_vm_id": (_client, lambda client, fake: client.get_vm_id(_last(fake, "servers")["name"])),
+    "get_router_id": (_client, lambda client, fake: client.get_router_id(_last(fake, "routers")["name"])),
+}
+
+
+def run_case(name, size, latency=0.0, jitter=0.0, memory=True):
+    """
+    Mesure un cas sur un faux cloud neuf de ``size`` machines virtuelles.
+
+    L'authentification a lieu avant la mesure ; la sortie des commandes est
+    ignorée. Le pic mémoire (allocations du client seulement, le faux cloud est
+    créé avant) est mesuré avec ``tracemalloc`` lors d'une seconde exécution,
+    pour ne pas fausser le temps mesuré.
+    Args:
+        name: le nom du cas (clé de ``CASES``).
+        size: le nombre de machines virtuelles du faux cloud.
+        latency: la latence simulée de chaque requête (secondes).
+        jitter: la variation de la latence (fraction).
+        memory: mesure aussi le pic mémoire.
+
+    Returns:
+        Le dictionnaire des mesures (seconds, requests, bytes, peak_memory, endpoints).
+    """
+    make_client, function = CASES[name]
+
+    def execute(trace=False):
+        fake = cloud(size, latency, jitter)
+        with contextlib.redirect_stdout(io.StringIO()):
+            client = make_client(fake)
+            fake.calls.clear()
+            fake.transferred.clear()
+            if trace:
+                tracemalloc.start()
+            try:
+                started = time.perf_counter()
+                function(client, fake)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1] if trace else None
+            finally:
+                if trace:
+                    tracemalloc.stop()
+            client.close()
+        return fake, elapsed, peak
+
+    fake, elapsed, _ = execute()
+    result = {
+        "seconds": round(elapsed, 4),
+        "requests": sum(fake.calls.values()),
+        "bytes": sum(fake.transferred.values()),
+        "endpoints": dict(sorted(fake.calls.items())),
+    }
+    if memory:
+        result["peak_memory"] = execute(trace=True)[2]
+    return result
+
+
+def check_budgets(results, budgets):
+    """
+    Compare les mesures aux budgets enregistrés.
+    Args:
+        results: les mesures par cas (``{"list_vms@1000": {...}}``).
+        budgets: le contenu du fichier des budgets.
+
+    Returns:
+        La liste des dépassements (messages) ; vide si tous les budgets sont respectés.
+    """
+    tolerance = dict(DEFAULT_TOLERANCE, **budgets.get("tolerance", {}))
+    failures = []
+    for key, result in results.items():
+        budget = budgets.get("cases", {}).get(key)
+        if budget is None:
+            continue
+        limit = budget["requests"] * (1 + tolerance["requests"])
+        if result["requests"] > limit:
+            failures.append(f"{key} : {result['requests']} requêtes (budget {budget['requests']})")
+        limit = budget["seconds"] * (1 + tolerance["seconds"])
+        if result["seconds"] > limit and result["seconds"] - budget["seconds"] > MIN_SECONDS:
+            failures.append(f"{key} : {result['seconds']:.3f} s (budget {budget['seconds']:.3f} s)")
+    return failures
+
+
+@app.command(help="Benchmark the scripts against the local fake OpenStack and check the stored budgets.")
+def benchmark(
+    case: list[str] = typer.Option(None, help="Case to run (repeatable, all by default)"),
+    size: list[int] = typer.Option(None, help="Number of servers in the fake cloud (repeatable, 10, 1000 and 10000 by default)"),
+    latency: float = typer.Option(0.0, help="Simulated latency of each request in seconds"),
+    jitter: float = typer.Option(0.0, help="Latency variation, as a fraction of the latency"),
+    memory: bool = typer.Option(True, help="Also measure peak memory (runs each case twice)"),
+    budgets: str = typer.Option(DEFAULT_BUDGETS, help="Budgets file"),
+    update: bool = typer.Option(False, help="Store the measured values as the new budgets"),
+    output: str = typer.Option(None, help="Write the measures to this JSON file"),
+):
+    """
+    Cette commande permet de mesurer les scripts sur un faux OpenStack local et de vérifier les budgets.
+    Args:
+        case: les cas à mesurer.
+        size: les tailles de cloud.
+        latency: la latence simulée des requêtes.
+        jitter: la variation de la latence.
+        memory: mesure aussi le pic mémoire.
+        budgets: le fichier des budgets.
+        update: enregistre les mesures comme nouveaux budgets.
+        output: le fichier JSON des mesures.
+    """
+    names = case or list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise typer.BadParameter(f"unknown case(s): {', '.join(unknown)}")
+
+    results = {}
+    for cloud_size in size or DEFAULT_SIZES:
+        for name in names:
+            key = f"{name}@{cloud_size}"
+            result = run_case(name, cloud_size, latency, jitter, memory)
+            results[key] = result
+            peak = f"{result['peak_memory'] / 2 ** 20:8.1f} Mio" if "peak_memory" in result else ""
+            typer.echo(f"{key:28} {result['seconds']:8.3f} s {result['requests']:6} requêtes "
+                       f"{result['bytes'] / 1024:10.1f} Kio {peak}")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    try:
+        with open(budgets) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = {"tolerance": DEFAULT_TOLERANCE, "cases": {}}
+
+    if update:
+        for key, result in results.items():
+            stored["cases"][key] = {"requests": result["requests"], "seconds": result["seconds"]}
+        stored["cases"] = dict(sorted(stored["cases"].items()))
+        with open(budgets, "w") as f:
+            json.dump(stored, f, indent=4)
+            f.write("\n")
+        typer.echo(f"Budgets enregistrés dans {budgets}")
+        return
+
+    failures = check_budgets(results, stored)
+    for failure in failures:
+        typer.echo(f"Budget dépassé : {failure}", err=True)
+    if failures:
+        raise typer.Exit(1)
+    typer.echo("Budgets respectés")
+
+
+if __name__ == "__main__":
+    app()
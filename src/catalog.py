@@ -0,0 +1,125 @@
+import re
+
+import httpx
+
+# version d'API attendue par le client pour chaque type de service
+API_VERSIONS = {
+    "identity": "v3",
+    "compute": "v2.1",
+    "network": "v2.0",
+    "image": "v2",
+}
+
+VERSION_PATTERN = re.compile(r"/v\d+(\.\d+)?(/|$)")
+
+
+def default_auth_url(ip, port):
+    """
+    Retourne l'URL Keystone par défaut d'une installation DevStack.
+    """
+    return f"http://{ip}:{port}/identity/v3"
+
+
+def default_endpoints(ip, port):
+    """
+    Retourne les endpoints DevStack utilisés quand le catalogue est indisponible.
+    """
+    return {
+        "identity": default_auth_url(ip, port),
+        "compute": f"http://{ip}:{port}/compute/v2.1",
+        "network": f"http://{ip}:9696/networking/v2.0",
+        "image": f"http://{ip}:{port}/image/v2",
+    }
+
+
+def versioned(service_type, url):
+    """
+    Ajoute la version d'API à une URL du catalogue qui n'en contient pas.
+
+    Keystone publie par exemple Neutron sous ``http://host:9696/`` et Glance
+    sous ``http://host/image`` alors que le client appelle ``/v2.0`` et ``/v2``.
+    """
+    url = url.rstrip("/")
+    version = API_VERSIONS.get(service_type)
+    if version is None or VERSION_PATTERN.search(url.split("://", 1)[-1]):
+        return url
+    return f"{url}/{version}"
+
+
+class ServiceCatalog:
+    """
+    Catalogue des services retourné par Keystone avec le token.
+
+    Les endpoints sont résolus une seule fois par type de service, selon
+    l'interface (public, internal, admin) et la région demandées, puis gardés
+    en mémoire. Un service absent du catalogue est résolu avec ``fallback``.
+
+    Args:
+        entries: la liste ``token.catalog`` de la réponse Keystone.
+        interface: l'interface des endpoints à utiliser.
+        region: la région des endpoints à utiliser (toutes si None).
+        fallback: les endpoints à utiliser pour les services absents du catalogue.
+    """
+
+    def __init__(self, entries=None, interface="public", region=None, fallback=None):
+        self.entries = entries or []
+        self.interface = interface
+        self.region = region
+        self.fallback = fallback or {}
+        self._endpoints = {}
+        self._bases = None
+
+    @classmethod
+    def from_token(cls, body, **kwargs):
+        """
+        Construit le catalogue à partir du corps de la réponse ``POST /v3/auth/tokens``.
+        """
+        token = body.get("token") or {}
+        return cls(token.get("catalog"), **kwargs)
+
+    def _find(self, service_type):
+        for service in self.entries:
+            if service.get("type") != service_type:
+                continue
+            for endpoint in service.get("endpoints", []):
+                if endpoint.get("interface") != self.interface:
+                    continue
+                if self.region is not None and self.region not in (endpoint.get("region"), endpoint.get("region_id")):
+                    continue
+                return versioned(service_type, endpoint["url"])
+        return None
+
+    def endpoint(self, service_type):
+        """
+        Retourne l'URL de base (versionnée) d'un type de service.
+        """
+        url = self._endpoints.get(service_type)
+        if url is None:
+            url = self._find(service_type) or self.fallback.get(service_type)
+            if url is None:
+                raise KeyError(f"Service {service_type} introuvable dans le catalogue")
+            self._endpoints[service_type] = url
+        return url
+
+    def service_for(self, url):
+        """
+        Retourne le type de service d'une URL (le plus long endpoint qui la préfixe), ou None.
+        """
+        if self._bases is None:
+            candidates = [(service.get("type"), endpoint.get("url", ""))
+                          for service in self.entries for endpoint in service.get("endpoints", [])]
+            candidates += list(self.fallback.items())
+            # httpx normalise les URL (port par défaut retiré) : les bases le sont aussi
+            self._bases = sorted(((str(httpx.URL(base.rstrip("/"))), service_type)
+                                  for service_type, base in candidates if base), key=lambda item: -len(item[0]))
+        url = str(httpx.URL(url))
+        for base, service_type in self._bases:
+            if url == base or url.startswith(base + "/"):
+                return service_type
+        return None
+
+    def url(self, service_type, path=""):
+        """
+        Retourne l'URL complète d'un chemin d'API, par exemple ``url("compute", "/servers")``.
+        """
+        return self.endpoint(service_type) + path
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+
+import asyncio
+import contextlib
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import typer
+
+from src.async_openstack import AsyncOpenStack
+from src.auth import AuthenticationError, TokenCache
+from src.models import dumps
+from src.pagination import DEFAULT_PAGE_SIZE
+from src.reachability import ROUTER_INTERFACE_OWNERS
+from src.resilience import DEFAULT_MAX_CONCURRENCY, DEFAULT_RETRIES, Resilience
+from src.session import AsyncSessionPool, DEFAULT_MAX_CONNECTIONS, DEFAULT_TIMEOUT
+from src.snapshot import SECTIONS, changes_since, export_incremental, load_snapshot, save_state, write_snapshot
+
+app = typer.Typer()
+
+DEFAULT_LISTEN = "127.0.0.1"
+DEFAULT_METRICS_PORT = 9180
+DEFAULT_MIN_INTERVAL = 15.0
+DEFAULT_MAX_INTERVAL = 300.0
+
+
+def diff_snapshots(previous, current):
+    """
+    Calcule les changements entre deux exports (ressources décodées en modèles).
+    Args:
+        previous: l'export précédent (None pour le premier).
+        current: l'export courant.
+
+    Returns:
+        La liste des événements ``{"event": added|changed|removed, "section", "id", "name", "resource"}``.
+    """
+    events = []
+    for section, _, key in SECTIONS:
+        before = {item.id: item for item in (previous or {}).get(section, {}).get(key, [])}
+        for item in current.get(section, {}).get(key, []):
+            old = before.pop(item.id, None)
+            if old is None:
+                events.append({"event": "added", "section": section, "id": item.id, "name": item.name,
+                               "resource": item})
+            elif old != item:
+                events.append({"event": "changed", "section": section, "id": item.id, "name": item.name,
+                               "resource": item})
+        for item in before.values():
+            events.append({"event": "removed", "section": section, "id": item.id, "name": item.name})
+    return events
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Exporter:
+    """
+    Garde en mémoire l'état du cloud et le rafraîchit de façon incrémentale.
+
+    Le premier rafraîchissement est un export complet (ou l'export ``snapshot``
+    d'une exécution précédente) ; les suivants ne relisent que ce qui a changé
+    (``export_incremental``). L'intervalle entre deux rafraîchissements
+    s'adapte : il est divisé par deux quand l'état change et multiplié par 1,5
+    sinon, entre ``min_interval`` et ``max_interval`` ; il double après une
+    erreur. Les métriques sont calculées une fois par rafraîchissement : un
+    scrape ne déclenche aucun appel à l'API.
+
+    Args:
+        client: le client ``AsyncOpenStack`` (une seule session authentifiée).
+        min_interval: l'intervalle minimal (secondes) entre deux rafraîchissements.
+        max_interval: l'intervalle maximal.
+        snapshot_path: l'export à reprendre au démarrage et à réécrire à chaque changement (None pour aucun).
+    """
+
+    def __init__(self, client, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 snapshot_path=None):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.snapshot_path = snapshot_path
+
+        self.snapshot = None
+        self.since = None
+        if snapshot_path is not None:
+            snapshot, state = load_snapshot(snapshot_path)
+            if snapshot is not None:
+                self.snapshot, self.since = snapshot, state["changes_since"]
+
+        self.counters = Counter()
+        self.last_refresh = None
+        self.last_duration = 0.0
+        self._metrics = b""
+        self._state = b"{}"
+        self._lock = threading.Lock()
+
+    async def refresh(self):
+        """
+        Rafraîchit l'état et retourne les changements depuis le rafraîchissement précédent.
+        """
+        started_at = time.time()
+        previous = self.snapshot
+        try:
+            if previous is None or self.since is None:
+                current = await self.client.export()
+            else:
+                current, _ = await export_incremental(self.client, previous, self.since)
+        except Exception:
+            # ``metrics()`` incrémente les mêmes compteurs depuis le thread du serveur HTTP
+            with self._lock:
+                self.counters["refresh_errors"] += 1
+            self.interval = min(self.interval * 2, self.max_interval)
+            raise
+
+        events = diff_snapshots(previous, current)
+        self.snapshot, self.since = current, changes_since(started_at)
+        with self._lock:
+            self.counters["refreshes"] += 1
+            self.counters["changes"] += len(events)
+        self.last_refresh = time.time()
+        self.last_duration = self.last_refresh - started_at
+
+        if events:
+            self.interval = max(self.interval / 2, self.min_interval)
+            if self.snapshot_path is not None:
+                write_snapshot(self.snapshot_path, current)
+        else:
+            self.interval = min(self.interval * 1.5, self.max_interval)
+        if self.snapshot_path is not None:
+            save_state(self.snapshot_path, {"changes_since": self.since})
+
+        metrics = self.render_metrics().encode()
+        state = dumps(current).encode()
+        with self._lock:
+            self._metrics, self._state = metrics, state
+        return events
+
+    def render_metrics(self):
+        """
+        Retourne les métriques Prometheus de l'état courant.
+        """
+        snapshot = self.snapshot or {}
+        servers = snapshot.get("servers", {}).get("servers", [])
+        routers = snapshot.get("router", {}).get("routers", [])
+        ports = snapshot.get("port", {}).get("ports", [])
+        router_names = {router.id: router.name or router.id for router in routers}
+        with self._lock:
+            counters = Counter(self.counters)
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_label(label)}"' for key, label in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        by_status = Counter(server.status for server in servers)
+        metric("openstack_lab_servers", "gauge", "Servers by status.",
+               [((("status", status),), count) for status, count in sorted(by_status.items(), key=str)])
+
+        interfaces = Counter((router_names.get(port.device_id, port.device_id), port.status)
+                             for port in ports if port.device_owner in ROUTER_INTERFACE_OWNERS)
+        metric("openstack_lab_router_interfaces", "gauge", "Router interfaces by router and port status.",
+               [((("router", router), ("status", status)), count)
+                for (router, status), count in sorted(interfaces.items(), key=str)])
+
+        for section, _, key in SECTIONS:
+            by_status = Counter(getattr(item, "status", None) for item in snapshot.get(section, {}).get(key, []))
+            if section != "servers":
+                # les sous-réseaux n'ont pas de statut : un seul total sans label
+                metric(f"openstack_lab_{key}", "gauge", f"{key.capitalize()} by status.",
+                       [((("status", status),) if status is not None else (), count)
+                        for status, count in sorted(by_status.items(), key=str)])
+
+        metric("openstack_lab_exporter_refreshes_total", "counter", "State refreshes.",
+               [((), counters["refreshes"])])
+        metric("openstack_lab_exporter_refresh_errors_total", "counter", "Failed state refreshes.",
+               [((), counters["refresh_errors"])])
+        metric("openstack_lab_exporter_changes_total", "counter", "Resource changes detected.",
+               [((), counters["changes"])])
+        metric("openstack_lab_exporter_last_refresh_timestamp_seconds", "gauge", "End of the last refresh.",
+               [((), f"{self.last_refresh or 0:.3f}")])
+        metric("openstack_lab_exporter_refresh_duration_seconds", "gauge", "Duration of the last refresh.",
+               [((), f"{self.last_duration:.3f}")])
+        metric("openstack_lab_exporter_refresh_interval_seconds", "gauge", "Current refresh interval.",
+               [((), f"{self.interval:.3f}")])
+        return "\n".join(lines) + "\n"
+
+    def metrics(self):
+        """
+        Retourne les métriques calculées au dernier rafraîchissement, avec le nombre de scrapes.
+        """
+        with self._lock:
+            self.counters["scrapes"] += 1
+            scrapes = self.counters["scrapes"]
+            metrics = self._metrics
+        return metrics + (b"# TYPE openstack_lab_exporter_scrapes_total counter\n"
+                          b"openstack_lab_exporter_scrapes_total %d\n" % scrapes)
+
+    def state(self):
+        """
+        Retourne l'export courant (JSON) tel qu'au dernier rafraîchissement.
+        """
+        with self._lock:
+            return self._state
+
+
+def metrics_server(exporter, listen=DEFAULT_LISTEN, port=DEFAULT_METRICS_PORT):
+    """
+    Démarre le serveur HTTP des métriques dans un thread : ``/metrics``, ``/state`` et ``/healthz``.
+
+    Les réponses viennent du cache de ``exporter`` ; aucune requête n'est envoyée à OpenStack.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body, content_type = exporter.metrics(), "text/plain; version=0.0.4"
+            elif path == "/state":
+                body, content_type = exporter.state(), "application/json"
+            elif path == "/healthz":
+                ready = exporter.last_refresh is not None
+                self.send_response(200 if ready else 503)
+                self.end_headers()
+                self.wfile.write(b"ok\n" if ready else b"starting\n")
+                return
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((listen, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+async def watch(exporter, changes=True, stream=None):
+    """
+    Boucle de rafraîchissement : écrit chaque changement (une ligne NDJSON) puis attend l'intervalle courant.
+    """
+    stream = stream or sys.stdout
+    exporter.client.start_token_refresh()
+    while True:
+        try:
+            events = await exporter.refresh()
+        except Exception as e:
+            print(f"Erreur lors du rafraîchissement : {e}", file=sys.stderr)
+        else:
+            if changes:
+                for event in events:
+                    stream.write(dumps(event) + "\n")
+                stream.flush()
+        await asyncio.sleep(exporter.interval)
+
+
+@app.command(help="Keep the exported state up to date and serve it, with metrics, over HTTP.")
+def serve(
+    ip: str = typer.Option("172.28.0.2", help="OpenStack IP address", envvar="DEVSTACK_IP"),
+    port: str = typer.Option("80", help="OpenStack port", envvar="DEVSTACK_PORT"),
+    project_name: str = typer.Option("admin", help="OpenStack project name", envvar="OS_PROJECT_NAME"),
+    username: str = typer.Option("admin", help="OpenStack username", envvar="OS_USERNAME"),
+    password: str = typer.Option("password", help="OpenStack password", envvar="OS_PASSWORD"),
+    listen: str = typer.Option(DEFAULT_LISTEN, help="Address of the metrics endpoint"),
+    metrics_port: int = typer.Option(DEFAULT_METRICS_PORT, help="Port of the metrics endpoint"),
+    min_interval: float = typer.Option(DEFAULT_MIN_INTERVAL, help="Minimum seconds between two refreshes"),
+    max_interval: float = typer.Option(DEFAULT_MAX_INTERVAL, help="Maximum seconds between two refreshes"),
+    snapshot: str = typer.Option(None, help="Export to resume from at startup and rewrite on each change"),
+    changes: bool = typer.Option(True, help="Print each change as one NDJSON line on stdout"),
+    pool_size: int = typer.Option(DEFAULT_MAX_CONNECTIONS, help="Maximum HTTP connections per endpoint"),
+    timeout: float = typer.Option(DEFAULT_TIMEOUT, help="HTTP timeout in seconds"),
+    token_cache: bool = typer.Option(True, help="Reuse cached Keystone tokens across runs"),
+    auth_url: str = typer.Option(None, help="Keystone URL", envvar="OS_AUTH_URL"),
+    interface: str = typer.Option("public", help="Service catalog interface", envvar="OS_INTERFACE"),
+    region: str = typer.Option(None, help="Service catalog region", envvar="OS_REGION_NAME"),
+    page_size: int = typer.Option(DEFAULT_PAGE_SIZE, help="Number of items requested per page"),
+    retries: int = typer.Option(DEFAULT_RETRIES, help="Retries of idempotent requests on 429/5xx and network errors"),
+    max_concurrency: int = typer.Option(DEFAULT_MAX_CONCURRENCY, help="Maximum concurrent requests per service (adaptive)"),
+):
+    """
+    Cette commande permet de garder l'état du cloud à jour et de le servir, avec des métriques, en HTTP.
+    Args:
+        listen: l'adresse du serveur des métriques.
+        metrics_port: le port du serveur des métriques.
+        min_interval: l'intervalle minimal entre deux rafraîchissements.
+        max_interval: l'intervalle maximal entre deux rafraîchissements.
+        snapshot: l'export repris au démarrage et réécrit à chaque changement.
+        changes: affiche chaque changement en NDJSON.
+    """
+    async def run(stream):
+        session = AsyncSessionPool(max_connections=pool_size, timeout=timeout,
+                                   resilience=Resilience(retries=retries, max_concurrency=max_concurrency))
+        client = AsyncOpenStack(ip, port, project_name, username, password, session=session,
+                                token_cache=TokenCache() if token_cache else None,
+                                auth_url=auth_url, interface=interface, region=region, page_size=page_size)
+        try:
+            await client.auth_openstack()
+            exporter = Exporter(client, min_interval, max_interval, snapshot)
+            server = metrics_server(exporter, listen, metrics_port)
+            print(f"Métriques sur http://{listen}:{metrics_port}/metrics", file=sys.stderr)
+            try:
+                await watch(exporter, changes, stream)
+            finally:
+                server.shutdown()
+        finally:
+            await client.close()
+
+    # stdout est réservé au flux des changements : les messages du client vont sur stderr
+    stream = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            asyncio.run(run(stream))
+    except AuthenticationError as e:
+        # seule l'authentification initiale arrête le démon : un échec de renouvellement
+        # est réessayé et l'état en cache reste servi
+        typer.echo(f"Erreur : {e}", err=True)
+        raise typer.Exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,742 @@
+import asyncio
+import ipaddress
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+# préfixes des services dans les URL (chemins DevStack)
+SERVICE_PREFIXES = {
+    "identity": "identity",
+    "compute": "compute",
+    "networking": "network",
+    "image": "image",
+}
+
+PATH_PATTERN = re.compile(r"^/(identity|compute|networking|image)(?:/v[\d.]+)?(/.*)?$")
+
+# collections Neutron servies par le faux serveur
+NEUTRON_COLLECTIONS = ("networks", "subnets", "ports", "routers")
+
+# paramètres de requête qui ne sont pas des filtres
+RESERVED_PARAMS = ("limit", "marker", "fields", "sort_key", "sort_dir")
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def _json(status_code, body=None, headers=None):
+    content = b"" if body is None else json.dumps(body).encode()
+    headers = dict(headers or {})
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+    return httpx.Response(status_code, content=content, headers=headers)
+
+
+def _error(status_code, message):
+    kind = {400: "badRequest", 403: "forbidden", 404: "itemNotFound", 409: "conflict"}.get(status_code, "error")
+    return _json(status_code, {kind: {"message": message, "code": status_code},
+                               "NeutronError": {"message": message}})
+
+
+def _matches(value, wanted):
+    if isinstance(value, bool):
+        return str(value).lower() in [item.lower() for item in wanted]
+    return str(value) in wanted
+
+
+class FakeOpenStack:
+    """
+    Faux Keystone, Nova, Neutron et Glance en mémoire, branché comme transport httpx.
+
+    Le faux serveur garde l'état des ressources (créations, modifications,
+    suppressions), applique les filtres, la projection ``fields=`` et la
+    pagination ``limit``/``marker`` des vrais services, et peut simuler une API
+    lente ou instable : latence et gigue par service, taux d'erreurs 503,
+    réponses 429 au-delà d'un nombre de requêtes simultanées par service.
+
+    Exemple::
+
+        fake = FakeOpenStack(latency={"compute": 0.2}, jitter=0.5, seed=1)
+        fake.populate(networks=10, servers=1000)
+        session = SessionPool(transport=fake.transport())
+        openstack = OpenStack("fake", "80", "admin", "admin", "password", session=session)
+
+    Args:
+        latency: la latence (secondes) par service (identity, compute, network,
+            image) ou ``default`` ; un nombre s'applique à tous les services.
+        jitter: la variation aléatoire de la latence, en fraction (0.5 : ±50 %).
+        error_rate: la proportion de réponses 503 par service (ou ``default``).
+        concurrency_limit: le nombre de requêtes simultanées acceptées par service
+            (ou ``default``) avant de répondre 429 ; illimité si None.
+        retry_after: la valeur de l'en-tête ``Retry-After`` des réponses 429 et 503 (absent si None).
+        quotas: les quotas du projet (``instances``, ``cores``, ``ram`` pour Nova,
+            ``network``, ``subnet``, ``port``, ``router`` pour Neutron) ; illimités si absents.
+            Une création au-delà du quota est refusée (403 pour Nova, 409 pour Neutron).
+        delete_delay: la durée (secondes) pendant laquelle une machine virtuelle supprimée
+            reste visible (``task_state`` deleting) et garde ses ports, comme avec Nova.
+        seed: la graine du générateur aléatoire (identifiants, gigue, erreurs).
+        max_page_size: le nombre maximal d'éléments par page.
+        host: le nom d'hôte annoncé dans le catalogue.
+    """
+
+    def __init__(self, latency=None, jitter=0.0, error_rate=None, seed=None, max_page_size=1000,
+                 host="fake-openstack", concurrency_limit=None, retry_after=None, delete_delay=0.0,
+                 quotas=None):
+        self.latency = latency if isinstance(latency, dict) else {"default": latency or 0.0}
+        self.jitter = jitter
+        self.error_rate = error_rate if isinstance(error_rate, dict) else {"default": error_rate or 0.0}
+        self.concurrency_limit = (concurrency_limit if isinstance(concurrency_limit, dict)
+                                  else {"default": concurrency_limit})
+        self.retry_after = retry_after
+        self.delete_delay = delete_delay
+        self.quotas = dict(quotas or {})
+        self.max_page_size = max_page_size
+        self.host = host
+        self.project_id = "fake-project"
+
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.transferred = Counter()
+        self.inflight = Counter()
+        self.peak_inflight = Counter()
+        self._lock = threading.RLock()
+
+        self.collections = {kind: {} for kind in NEUTRON_COLLECTIONS + ("servers", "flavors", "images")}
+        self.deleted_servers = {}
+        self._deleting = {}
+        self._allocated = Counter()
+
+        self.users = [{"id": self._id(), "name": "admin"}]
+        self.projects = [{"id": self.project_id, "name": "admin"}]
+        self.add_image("cirros-0.5.2-x86_64-disk")
+        for name, ram, vcpus in (("m1.nano", 128, 1), ("m1.tiny", 512, 1), ("m1.small", 2048, 1)):
+            self.add_flavor(name, ram=ram, vcpus=vcpus)
+
+    # ---- transports ---------------------------------------------------------
+
+    def transport(self):
+        """
+        Retourne un transport httpx synchrone (``SessionPool(transport=...)``).
+        """
+        return FakeTransport(self)
+
+    def async_transport(self):
+        """
+        Retourne un transport httpx asynchrone (``AsyncSessionPool(transport=...)``).
+        """
+        return AsyncFakeTransport(self)
+
+    def service(self, request):
+        match = PATH_PATTERN.match(request.url.path)
+        return SERVICE_PREFIXES[match.group(1)] if match else None
+
+    def delay(self, service):
+        """
+        Retourne la latence simulée d'une requête vers ``service``.
+        """
+        latency = self.latency.get(service, self.latency.get("default", 0.0)) or 0.0
+        if latency and self.jitter:
+            with self._lock:
+                latency *= 1 + self.random.uniform(-self.jitter, self.jitter)
+        return max(latency, 0.0)
+
+    def _fails(self, service):
+        rate = self.error_rate.get(service, self.error_rate.get("default", 0.0)) or 0.0
+        if not rate:
+            return False
+        with self._lock:
+            return self.random.random() < rate
+
+    def enter(self, service):
+        """
+        Compte une requête en cours vers ``service`` ; retourne False si elle dépasse la limite (429).
+        """
+        limit = self.concurrency_limit.get(service, self.concurrency_limit.get("default"))
+        with self._lock:
+            if limit is not None and self.inflight[service] >= limit:
+                return False
+            self.inflight[service] += 1
+            self.peak_inflight[service] = max(self.peak_inflight[service], self.inflight[service])
+            return True
+
+    def leave(self, service):
+        with self._lock:
+            self.inflight[service] -= 1
+
+    def _unavailable(self, status_code, message):
+        headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else None
+        return _json(status_code, {"message": message}, headers=headers)
+
+    def respond(self, request, throttled=False):
+        """
+        Traite une requête et retourne la réponse du faux service (429 si ``throttled``).
+        """
+        match = PATH_PATTERN.match(request.url.path)
+        if match is None:
+            return _error(404, f"Chemin inconnu : {request.url.path}")
+        service = SERVICE_PREFIXES[match.group(1)]
+        parts = [part for part in (match.group(2) or "").split("/") if part]
+        endpoint = f"{request.method} {service}/{parts[0] if parts else ''}"
+        self.calls[endpoint] += 1
+
+        if throttled:
+            response = self._unavailable(429, "Too Many Requests (fake)")
+        elif self._fails(service):
+            response = self._unavailable(503, "Service Unavailable (fake)")
+        else:
+            body = json.loads(request.content) if request.content else {}
+            with self._lock:
+                self._reap()
+                handler = getattr(self, f"_{service}")
+                response = handler(request.method, parts, request.url.params, body, request)
+        # octets échangés (corps de la requête et de la réponse)
+        self.transferred[endpoint] += len(request.content) + len(response.content)
+        return response
+
+    # ---- données ------------------------------------------------------------
+
+    def _id(self):
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def _new(self, kind, attributes):
+        now = _now()
+        item = {
+            "id": self._id(),
+            "name": "",
+            "description": "",
+            "status": "ACTIVE",
+            "admin_state_up": True,
+            "project_id": self.project_id,
+            "tenant_id": self.project_id,
+            "revision_number": 1,
+            "created_at": now,
+            "updated_at": now,
+        }
+        item.update(attributes)
+        self.collections[kind][item["id"]] = item
+        return item
+
+    def add_image(self, name, **attributes):
+        with self._lock:
+            image = {"id": self._id(), "name": name, "status": "active", "min_disk": 0, "min_ram": 0,
+                     "size": 16338944}
+            image.update(attributes)
+            self.collections["images"][image["id"]] = image
+            return image
+
+    def add_flavor(self, name, ram=512, vcpus=1, disk=1):
+        with self._lock:
+            flavor = {"id": self._id(), "name": name, "ram": ram, "vcpus": vcpus, "disk": disk}
+            self.collections["flavors"][flavor["id"]] = flavor
+            return flavor
+
+    def populate(self, networks=0, subnets_per_network=1, routers=0, servers=0, images=0, flavors=0):
+        """
+        Remplit le faux cloud avec des ressources générées.
+        Args:
+            networks: le nombre de réseaux (chacun avec ``subnets_per_network`` sous-réseaux).
+            subnets_per_network: le nombre de sous-réseaux par réseau.
+            routers: le nombre de routeurs (attachés aux premiers sous-réseaux).
+            servers: le nombre de machines virtuelles, réparties sur les réseaux.
+            images: le nombre d'images supplémentaires.
+            flavors: le nombre de flavors supplémentaires.
+        """
+        with self._lock:
+            network_ids = []
+            subnet_ids = []
+            for i in range(networks):
+                network = self._create_network({"name": f"network-{i}"})
+                network_ids.append(network["id"])
+                for j in range(subnets_per_network):
+                    cidr = f"10.{(i * subnets_per_network + j) // 256 % 256}.{(i * subnets_per_network + j) % 256}.0/24"
+                    subnet = self._create_subnet({"name": f"subnet-{i}-{j}", "network_id": network["id"],
+                                                  "cidr": cidr, "ip_version": 4})
+                    subnet_ids.append(subnet["id"])
+            for i in range(routers):
+                router = self._create_router({"name": f"router-{i}"})
+                if i < len(subnet_ids):
+                    self._attach(router, subnet_ids[i])
+            image_id = next(iter(self.collections["images"]))
+            flavor_id = next(iter(self.collections["flavors"]))
+            for i in range(servers):
+                network_id = network_ids[i % len(network_ids)] if network_ids else None
+                self._boot(f"server-{i}", image_id, flavor_id, network_id, {}, None)
+        for i in range(images):
+            self.add_image(f"image-{i}")
+        for i in range(flavors):
+            self.add_flavor(f"flavor-{i}")
+
+    # ---- listes, filtres et pagination -------------------------------------
+
+    def _page(self, items, params, key, base_url, nova=False):
+        limit = min(int(params.get("limit", self.max_page_size)), self.max_page_size)
+        marker = params.get("marker")
+        start = 0
+        if marker is not None:
+            ids = [item["id"] for item in items]
+            if marker not in ids:
+                return None, None
+            start = ids.index(marker) + 1
+        page = items[start:start + limit]
+        next_href = None
+        if start + limit < len(items) and page:
+            next_href = f"{base_url}?limit={limit}&marker={page[-1]['id']}"
+        return page, next_href
+
+    def _list_response(self, items, params, key, request, links="links"):
+        page, next_href = self._page(items, params, key, str(request.url.copy_with(query=None)))
+        if page is None:
+            return _error(400, "Marker introuvable")
+        fields = params.get_list("fields")
+        if fields:
+            page = [{field: item[field] for field in fields if field in item} for item in page]
+        body = {key: page}
+        if next_href is not None:
+            if links == "glance":
+                body["next"] = next_href
+            else:
+                body[f"{key}_links"] = [{"rel": "next", "href": next_href}]
+        return _json(200, body)
+
+    # ---- Keystone -----------------------------------------------------------
+
+    def catalog(self):
+        """
+        Retourne le catalogue des services annoncé avec les tokens.
+        """
+        endpoints = {
+            "identity": f"http://{self.host}/identity/v3",
+            "compute": f"http://{self.host}/compute/v2.1",
+            "network": f"http://{self.host}:9696/networking",
+            "image": f"http://{self.host}/image",
+        }
+        return [
+            {"type": service_type, "name": service_type, "endpoints": [
+                {"interface": interface, "region": "RegionOne", "region_id": "RegionOne", "url": url}
+                for interface in ("public", "internal", "admin")]}
+            for service_type, url in endpoints.items()
+        ]
+
+    def _identity(self, method, parts, params, body, request):
+        if parts[:2] == ["auth", "tokens"] and method == "POST":
+            if "auth" not in body:
+                return _error(400, "Corps d'authentification invalide")
+            expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+            token = {
+                "expires_at": expires_at.strftime("%Y-%m-%dT%H:%M:%S.000000Z"),
+                "project": {"id": self.project_id, "name": "admin"},
+                "user": self.users[0],
+                "catalog": self.catalog(),
+            }
+            return _json(201, {"token": token}, headers={"X-Subject-Token": f"fake-{self._id()}"})
+        if parts[:2] == ["auth", "catalog"]:
+            return _json(200, {"catalog": self.catalog()})
+        if parts == ["users"]:
+            return _json(200, {"users": self.users})
+        if parts == ["projects"]:
+            return _json(200, {"projects": self.projects})
+        return _error(404, "Ressource Keystone inconnue")
+
+    # ---- Glance -------------------------------------------------------------
+
+    def _image(self, method, parts, params, body, request):
+        if parts == ["images"] and method == "GET":
+            items = [item for item in self.collections["images"].values()
+                     if all(_matches(item.get(key), params.get_list(key)) for key in ("name", "status") if key in params)]
+            return self._list_response(items, params, "images", request, links="glance")
+        if len(parts) == 2 and parts[0] == "images" and method == "GET":
+            image = self.collections["images"].get(parts[1])
+            return _json(200, image) if image is not None else _error(404, "Image introuvable")
+        return _error(404, "Ressource Glance inconnue")
+
+    # ---- Nova ---------------------------------------------------------------
+
+    def _allocate(self, subnet):
+        network = ipaddress.ip_network(subnet["cidr"], strict=False)
+        self._allocated[subnet["id"]] += 1
+        return str(network.network_address + 1 + self._allocated[subnet["id"]])
+
+    def _subnets_of(self, network_id):
+        return [subnet for subnet in self.collections["subnets"].values() if subnet["network_id"] == network_id]
+
+    def _boot(self, name, image_id, flavor_id, network_id, metadata, reservation_id):
+        now = _now()
+        server = {
+            "id": self._id(),
+            "name": name,
+            "status": "ACTIVE",
+            "tenant_id": self.project_id,
+            "user_id": self.users[0]["id"],
+            "metadata": dict(metadata or {}),
+            "image": {"id": image_id},
+            "flavor": {"id": flavor_id},
+            "addresses": {},
+            "created": now,
+            "updated": now,
+            "reservation_id": reservation_id or f"r-{self._id()[:8]}",
+            "OS-EXT-STS:vm_state": "active",
+        }
+        network = self.collections["networks"].get(network_id)
+        if network is not None:
+            subnets = self._subnets_of(network_id)
+            fixed_ips = []
+            if subnets:
+                address = self._allocate(subnets[0])
+                fixed_ips.append({"subnet_id": subnets[0]["id"], "ip_address": address})
+                server["addresses"][network["name"]] = [
+                    {"addr": address, "version": 4, "OS-EXT-IPS:type": "fixed"}]
+            self._new("ports", {"network_id": network_id, "device_id": server["id"],
+                                "device_owner": "compute:nova", "fixed_ips": fixed_ips})
+        self.collections["servers"][server["id"]] = server
+        return server
+
+    def _compute(self, method, parts, params, body, request):
+        servers = self.collections["servers"]
+        if parts and parts[0] == "flavors":
+            if method == "GET" and parts[1:] in ([], ["detail"]):
+                return self._list_response(list(self.collections["flavors"].values()), params, "flavors", request)
+            return _error(404, "Flavor introuvable")
+
+        if parts == ["limits"] and method == "GET":
+            return _json(200, {"limits": {"rate": [], "absolute": self._limits()}})
+
+        if parts[:1] != ["servers"]:
+            return _error(404, "Ressource Nova inconnue")
+
+        if method == "POST" and len(parts) == 1:
+            return self._create_servers(body.get("server", {}))
+
+        if method == "GET" and parts[1:] in ([], ["detail"]):
+            items = list(servers.values())
+            since = params.get("changes-since")
+            if since is not None:
+                items += list(self.deleted_servers.values())
+                items = [item for item in items if item["updated"] >= since]
+            if "name" in params:
+                pattern = re.compile(params["name"])
+                items = [item for item in items if pattern.search(item["name"])]
+            for key in ("status", "reservation_id"):
+                if key in params:
+                    items = [item for item in items if _matches(item.get(key), params.get_list(key))]
+            if parts[1:] == []:
+                items = [{"id": item["id"], "name": item["name"], "links": []} for item in items]
+            return self._list_response(items, params, "servers", request)
+
+        if len(parts) == 2:
+            server = servers.get(parts[1])
+            if server is None:
+                return _error(404, "Machine virtuelle introuvable")
+            if method == "GET":
+                return _json(200, {"server": server})
+            if method == "PUT":
+                for key in ("name", "metadata"):
+                    if key in body.get("server", {}):
+                        server[key] = body["server"][key]
+                server["updated"] = _now()
+                return _json(200, {"server": server})
+            if method == "DELETE":
+                # la suppression est asynchrone : le serveur et ses ports disparaissent après ``delete_delay``
+                server["OS-EXT-STS:task_state"] = "deleting"
+                self._deleting.setdefault(server["id"], time.monotonic() + self.delete_delay)
+                self._reap()
+                return _json(204)
+        return _error(404, "Ressource Nova inconnue")
+
+    def _create_servers(self, server):
+        image_id, flavor_id = server.get("imageRef"), server.get("flavorRef")
+        if image_id not in self.collections["images"]:
+            return _error(400, f"Image {image_id} could not be found.")
+        if flavor_id not in self.collections["flavors"]:
+            return _error(400, f"Flavor {flavor_id} could not be found.")
+        networks = server.get("networks") or []
+        network_id = networks[0].get("uuid") if networks else None
+        if network_id is not None and network_id not in self.collections["networks"]:
+            return _error(400, f"Network {network_id} could not be found.")
+
+        count = int(server.get("max_count", server.get("min_count", 1)))
+        flavor = self.collections["flavors"][flavor_id]
+        usage = self._compute_usage()
+        for resource, requested in (("instances", count), ("cores", count * flavor["vcpus"]),
+                                    ("ram", count * flavor["ram"])):
+            if self._over_quota(resource, usage[resource], requested):
+                return _error(403, f"Quota exceeded for {resource}: Requested {requested}, but already used "
+                                   f"{usage[resource]} of {self._limit(resource)} {resource}")
+        reservation_id = f"r-{self._id()[:8]}"
+        created = []
+        for i in range(1, count + 1):
+            name = f"{server['name']}-{i}" if count > 1 else server["name"]
+            created.append(self._boot(name, image_id, flavor_id, network_id, server.get("metadata"), reservation_id))
+
+        if server.get("return_reservation_id"):
+            return _json(202, {"reservation_id": reservation_id})
+        return _json(202, {"server": {"id": created[0]["id"], "links": [], "adminPass": "fake"}})
+
+    def _limit(self, resource):
+        return self.quotas.get(resource, -1)
+
+    def _compute_usage(self):
+        flavors = self.collections["flavors"]
+        servers = [flavors.get(server["flavor"]["id"], {}) for server in self.collections["servers"].values()]
+        return {
+            "instances": len(servers),
+            "cores": sum(flavor.get("vcpus", 0) for flavor in servers),
+            "ram": sum(flavor.get("ram", 0) for flavor in servers),
+        }
+
+    def _limits(self):
+        usage = self._compute_usage()
+        return {
+            "maxTotalInstances": self._limit("instances"),
+            "totalInstancesUsed": usage["instances"],
+            "maxTotalCores": self._limit("cores"),
+            "totalCoresUsed": usage["cores"],
+            "maxTotalRAMSize": self._limit("ram"),
+            "totalRAMUsed": usage["ram"],
+        }
+
+    def _over_quota(self, resource, used, requested):
+        limit = self._limit(resource)
+        return limit >= 0 and used + requested > limit
+
+    def _reap(self):
+        now = time.monotonic()
+        for server_id, deadline in list(self._deleting.items()):
+            if deadline > now:
+                continue
+            del self._deleting[server_id]
+            server = self.collections["servers"].pop(server_id)
+            for port in list(self.collections["ports"].values()):
+                if port["device_id"] == server_id:
+                    del self.collections["ports"][port["id"]]
+            self.deleted_servers[server_id] = dict(server, status="DELETED", updated=_now())
+
+    # ---- Neutron ------------------------------------------------------------
+
+    def _create_network(self, attributes):
+        return self._new("networks", dict({"subnets": [], "router:external": False, "shared": False,
+                                           "mtu": 1450}, **attributes))
+
+    def _create_subnet(self, attributes):
+        network = self.collections["networks"].get(attributes.get("network_id"))
+        if network is None:
+            raise ValueError(f"Network {attributes.get('network_id')} could not be found.")
+        if "cidr" not in attributes:
+            raise ValueError("cidr is required")
+        cidr = ipaddress.ip_network(attributes["cidr"], strict=False)
+        for other in self._subnets_of(network["id"]):
+            if cidr.overlaps(ipaddress.ip_network(other["cidr"], strict=False)):
+                raise ValueError(f"Invalid input: {attributes['cidr']} overlaps with another subnet")
+        subnet = self._new("subnets", dict({"ip_version": 4, "enable_dhcp": True,
+                                            "gateway_ip": str(cidr.network_address + 1)}, **attributes))
+        network["subnets"].append(subnet["id"])
+        return subnet
+
+    def _create_router(self, attributes):
+        gateway = attributes.pop("external_gateway_info", None)
+        router = self._new("routers", dict({"external_gateway_info": None}, **attributes))
+        if gateway:
+            self._set_gateway(router, gateway)
+        return router
+
+    def _set_gateway(self, router, gateway):
+        for port in list(self.collections["ports"].values()):
+            if port["device_id"] == router["id"] and port["device_owner"] == "network:router_gateway":
+                del self.collections["ports"][port["id"]]
+        if not gateway or not gateway.get("network_id"):
+            router["external_gateway_info"] = None
+            return
+        network_id = gateway["network_id"]
+        if network_id not in self.collections["networks"]:
+            raise ValueError(f"Network {network_id} could not be found.")
+        subnets = self._subnets_of(network_id)
+        fixed_ips = [{"subnet_id": subnets[0]["id"], "ip_address": self._allocate(subnets[0])}] if subnets else []
+        self._new("ports", {"network_id": network_id, "device_id": router["id"],
+                            "device_owner": "network:router_gateway", "fixed_ips": fixed_ips})
+        router["external_gateway_info"] = {"network_id": network_id, "enable_snat": gateway.get("enable_snat", True),
+                                           "external_fixed_ips": fixed_ips}
+
+    def _router_ports(self, router_id):
+        return [port for port in self.collections["ports"].values()
+                if port["device_id"] == router_id and port["device_owner"] == "network:router_interface"]
+
+    def _attach(self, router, subnet_id):
+        subnet = self.collections["subnets"].get(subnet_id)
+        if subnet is None:
+            raise LookupError(f"Subnet {subnet_id} could not be found.")
+        for port in self._router_ports(router["id"]):
+            if any(ip["subnet_id"] == subnet_id for ip in port["fixed_ips"]):
+                raise ValueError(f"Router already has a port on subnet {subnet_id}")
+        port = self._new("ports", {"network_id": subnet["network_id"], "device_id": router["id"],
+                                   "device_owner": "network:router_interface",
+                                   "fixed_ips": [{"subnet_id": subnet_id, "ip_address": subnet["gateway_ip"]}]})
+        return {"id": router["id"], "subnet_id": subnet_id, "subnet_ids": [subnet_id], "port_id": port["id"],
+                "network_id": subnet["network_id"], "tenant_id": self.project_id}
+
+    def _create(self, kind, attributes):
+        if kind == "networks":
+            return self._create_network(attributes)
+        if kind == "subnets":
+            return self._create_subnet(attributes)
+        if kind == "routers":
+            return self._create_router(attributes)
+        if attributes.get("network_id") not in self.collections["networks"]:
+            raise ValueError(f"Network {attributes.get('network_id')} could not be found.")
+        return self._new("ports", dict({"device_id": "", "device_owner": "", "fixed_ips": []}, **attributes))
+
+    def _in_use(self, kind, item):
+        ports = self.collections["ports"].values()
+        if kind == "subnets":
+            return any(ip["subnet_id"] == item["id"] for port in ports for ip in port["fixed_ips"])
+        if kind == "networks":
+            return any(port["network_id"] == item["id"] for port in ports)
+        if kind == "routers":
+            return bool(self._router_ports(item["id"]))
+        return False
+
+    def _delete(self, kind, item):
+        if kind == "routers":
+            self._set_gateway(item, None)
+        del self.collections[kind][item["id"]]
+        if kind == "subnets":
+            network = self.collections["networks"].get(item["network_id"])
+            if network is not None:
+                network["subnets"].remove(item["id"])
+        if kind == "networks":
+            for subnet in self._subnets_of(item["id"]):
+                del self.collections["subnets"][subnet["id"]]
+
+    def _network(self, method, parts, params, body, request):
+        if parts[:1] == ["quotas"] and len(parts) == 3 and parts[2] == "details" and method == "GET":
+            quota = {kind[:-1]: {"limit": self._limit(kind[:-1]), "used": len(self.collections[kind]), "reserved": 0}
+                     for kind in NEUTRON_COLLECTIONS}
+            return _json(200, {"quota": quota})
+        if not parts or parts[0] not in NEUTRON_COLLECTIONS:
+            return _error(404, "Ressource Neutron inconnue")
+        kind = parts[0]
+        singular = kind[:-1]
+        collection = self.collections[kind]
+
+        if len(parts) == 1 and method == "GET":
+            items = list(collection.values())
+            for key in params:
+                if key not in RESERVED_PARAMS:
+                    wanted = params.get_list(key)
+                    items = [item for item in items if _matches(item.get(key), wanted)]
+            return self._list_response(items, params, kind, request)
+
+        if len(parts) == 1 and method == "POST":
+            # création simple ({"network": {...}}) ou en lot ({"networks": [...]}), tout ou rien
+            bulk = kind in body
+            requested = body[kind] if bulk else [body.get(singular, {})]
+            if self._over_quota(singular, len(collection), len(requested)):
+                return _error(409, f"Quota exceeded for resources: ['{singular}'].")
+            created = []
+            allocated = Counter(self._allocated)
+            try:
+                for attributes in requested:
+                    created.append(self._create(kind, dict(attributes)))
+            except (ValueError, LookupError) as e:
+                # annule les créations du lot, y compris leurs effets de bord
+                # (sous-réseaux du réseau, port de passerelle, adresses allouées)
+                for item in reversed(created):
+                    self._delete(kind, item)
+                self._allocated = allocated
+                return _error(400, str(e))
+            return _json(201, {kind: created} if bulk else {singular: created[0]})
+
+        item = collection.get(parts[1]) if len(parts) > 1 else None
+        if item is None:
+            return _error(404, f"{singular} {parts[1] if len(parts) > 1 else ''} could not be found.")
+
+        if len(parts) == 3 and kind == "routers" and method == "PUT":
+            subnet_id = body.get("subnet_id")
+            if parts[2] == "add_router_interface":
+                try:
+                    return _json(200, self._attach(item, subnet_id))
+                except LookupError as e:
+                    return _error(404, str(e))
+                except ValueError as e:
+                    return _error(400, str(e))
+            if parts[2] == "remove_router_interface":
+                for port in self._router_ports(item["id"]):
+                    if any(ip["subnet_id"] == subnet_id for ip in port["fixed_ips"]):
+                        del self.collections["ports"][port["id"]]
+                        return _json(200, {"id": item["id"], "subnet_id": subnet_id, "port_id": port["id"]})
+                return _error(404, f"Router {item['id']} has no interface on subnet {subnet_id}")
+            return _error(404, "Action inconnue")
+
+        if len(parts) != 2:
+            return _error(404, "Ressource Neutron inconnue")
+        if method == "GET":
+            return _json(200, {singular: item})
+        if method == "PUT":
+            attributes = dict(body.get(singular, {}))
+            if kind == "routers" and "external_gateway_info" in attributes:
+                try:
+                    self._set_gateway(item, attributes.pop("external_gateway_info"))
+                except ValueError as e:
+                    return _error(400, str(e))
+            item.update(attributes)
+            item["revision_number"] += 1
+            item["updated_at"] = _now()
+            return _json(200, {singular: item})
+        if method == "DELETE":
+            if self._in_use(kind, item):
+                return _error(409, f"{singular} {item['id']} is in use")
+            self._delete(kind, item)
+            return _json(204)
+        return _error(405, "Méthode non supportée")
+
+
+class FakeTransport(httpx.BaseTransport):
+    """
+    Transport httpx synchrone vers un ``FakeOpenStack`` (latence simulée avec ``time.sleep``).
+    """
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    def handle_request(self, request):
+        request.read()
+        service = self.fake.service(request)
+        if not self.fake.enter(service):
+            return self.fake.respond(request, throttled=True)
+        try:
+            delay = self.fake.delay(service)
+            if delay:
+                time.sleep(delay)
+            return self.fake.respond(request)
+        finally:
+            self.fake.leave(service)
+
+
+class AsyncFakeTransport(httpx.AsyncBaseTransport):
+    """
+    Transport httpx asynchrone vers un ``FakeOpenStack`` (latence simulée avec ``asyncio.sleep``).
+    """
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        service = self.fake.service(request)
+        if not self.fake.enter(service):
+            return self.fake.respond(request, throttled=True)
+        try:
+            delay = self.fake.delay(service)
+            if delay:
+                await asyncio.sleep(delay)
+            return self.fake.respond(request)
+        finally:
+            self.fake.leave(service)
@@ -0,0 +1,266 @@
+import json
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+
+import typer
+
+from src.snapshot import atomic_open
+
+# segments d'URL remplacés par ``{id}`` dans les gabarits (UUID, identifiants hexadécimaux ou numériques)
+ID_SEGMENT = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{32}|\d+)$")
+
+STARTED = "openstack_lab.started"
+
+Sample = namedtuple("Sample", "started method url status seconds request_bytes response_bytes")
+
+
+def url_template(path):
+    """
+    Retourne le gabarit d'un chemin d'API (``/compute/v2.1/servers/{id}``).
+    """
+    return "/".join("{id}" if ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+def percentile(values, fraction):
+    """
+    Retourne le percentile (rang le plus proche) d'une liste de valeurs triées.
+    """
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Recorder:
+    """
+    Enregistre chaque requête HTTP du client OpenStack (hooks d'événements httpx).
+
+    Pour chaque appel : méthode, URL, statut, latence et octets envoyés et
+    reçus. Le service (identity, compute, network, image) et le gabarit de
+    l'URL sont résolus au moment du rapport, avec le catalogue Keystone du
+    client. Les requêtes qui échouent sans réponse (délai dépassé, connexion
+    refusée) ne sont pas enregistrées.
+
+    Exemple::
+
+        recorder = Recorder()
+        session = SessionPool(recorder=recorder)
+        ...
+        for line in recorder.summary_lines():
+            print(line)
+    """
+
+    def __init__(self):
+        self.samples = []
+        self.catalog = None
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def event_hooks(self):
+        """
+        Retourne les hooks d'un ``httpx.Client``.
+        """
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+    def async_event_hooks(self):
+        """
+        Retourne les hooks d'un ``httpx.AsyncClient``.
+        """
+        return {"request": [self._on_async_request], "response": [self._on_async_response]}
+
+    def _on_request(self, request):
+        request.extensions[STARTED] = time.perf_counter()
+
+    def _on_response(self, response):
+        response.read()
+        self._record(response)
+
+    async def _on_async_request(self, request):
+        self._on_request(request)
+
+    async def _on_async_response(self, response):
+        await response.aread()
+        self._record(response)
+
+    def _record(self, response):
+        request = response.request
+        started = request.extensions.get(STARTED, self.origin)
+        sample = Sample(started - self.origin, request.method, str(request.url.copy_with(query=None)),
+                        response.status_code, time.perf_counter() - started,
+                        len(request.content), response.num_bytes_downloaded or len(response.content))
+        with self._lock:
+            self.samples.append(sample)
+
+    def service(self, url):
+        """
+        Retourne le type de service d'une URL d'après le catalogue (``unknown`` s'il est inconnu).
+        """
+        service = self.catalog.service_for(url) if self.catalog is not None else None
+        return service or "unknown"
+
+    def endpoints(self):
+        """
+        Regroupe les mesures par endpoint.
+
+        Returns:
+            Le dictionnaire ``{(service, méthode, gabarit): [Sample...]}``, trié.
+        """
+        with self._lock:
+            samples = list(self.samples)
+        groups = {}
+        for sample in samples:
+            path = sample.url.split("://", 1)[-1].partition("/")[2]
+            key = (self.service(sample.url), sample.method, url_template(path))
+            groups.setdefault(key, []).append(sample)
+        return dict(sorted(groups.items()))
+
+    def summary(self):
+        """
+        Calcule les statistiques de chaque endpoint.
+
+        Returns:
+            La liste des dictionnaires (service, method, endpoint, count, errors, p50, p95, max, total,
+            request_bytes, response_bytes).
+        """
+        rows = []
+        for (service, method, endpoint), samples in self.endpoints().items():
+            latencies = sorted(sample.seconds for sample in samples)
+            rows.append({
+                "service": service,
+                "method": method,
+                "endpoint": "/" + endpoint,
+                "count": len(samples),
+                "errors": sum(1 for sample in samples if sample.status >= 400),
+                "p50": percentile(latencies, 0.5),
+                "p95": percentile(latencies, 0.95),
+                "max": latencies[-1],
+                "total": sum(latencies),
+                "request_bytes": sum(sample.request_bytes for sample in samples),
+                "response_bytes": sum(sample.response_bytes for sample in samples),
+            })
+        return rows
+
+    def summary_lines(self):
+        """
+        Retourne le rapport de fin d'exécution : une ligne par endpoint, puis le total par service.
+        """
+        rows = self.summary()
+        lines = [f"{'service':9} {'méthode':7} {'endpoint':48} {'appels':>6} {'erreurs':>7} "
+                 f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'Kio':>9}"]
+        for row in rows:
+            lines.append(f"{row['service']:9} {row['method']:7} {row['endpoint'][:48]:48} {row['count']:6} "
+                         f"{row['errors']:7} {row['p50'] * 1000:8.1f} {row['p95'] * 1000:8.1f} "
+                         f"{row['max'] * 1000:8.1f} {(row['request_bytes'] + row['response_bytes']) / 1024:9.1f}")
+        totals = {}
+        for row in rows:
+            count, seconds = totals.get(row["service"], (0, 0.0))
+            totals[row["service"]] = (count + row["count"], seconds + row["total"])
+        for service, (count, seconds) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{service} : {count} appel(s), {seconds:.3f} s cumulées")
+        return lines
+
+    def write_prometheus(self, path):
+        """
+        Écrit les métriques au format texte Prometheus (collecteur ``textfile`` de node_exporter).
+
+        Le fichier est remplacé atomiquement, comme l'attend le collecteur.
+        """
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        groups = self.endpoints()
+        metric("openstack_lab_http_requests_total", "counter", "HTTP requests sent to OpenStack.")
+        for (service, method, endpoint), samples in groups.items():
+            statuses = {}
+            for sample in samples:
+                statuses[sample.status] = statuses.get(sample.status, 0) + 1
+            for status, count in sorted(statuses.items()):
+                lines.append(f'openstack_lab_http_requests_total{{service="{_label(service)}",method="{method}",'
+                             f'endpoint="/{_label(endpoint)}",status="{status}"}} {count}')
+
+        metric("openstack_lab_http_request_duration_seconds", "summary", "Latency of the HTTP requests to OpenStack.")
+        for (service, method, endpoint), samples in groups.items():
+            labels = f'service="{_label(service)}",method="{method}",endpoint="/{_label(endpoint)}"'
+            latencies = sorted(sample.seconds for sample in samples)
+            for quantile in (0.5, 0.95, 1.0):
+                lines.append(f'openstack_lab_http_request_duration_seconds{{{labels},quantile="{quantile}"}} '
+                             f"{percentile(latencies, quantile):.6f}")
+            lines.append(f"openstack_lab_http_request_duration_seconds_sum{{{labels}}} {sum(latencies):.6f}")
+            lines.append(f"openstack_lab_http_request_duration_seconds_count{{{labels}}} {len(latencies)}")
+
+        for direction, field in (("request", "request_bytes"), ("response", "response_bytes")):
+            name = f"openstack_lab_http_{direction}_bytes_total"
+            metric(name, "counter", f"Bytes of the HTTP {direction}s exchanged with OpenStack.")
+            for (service, method, endpoint), samples in groups.items():
+                lines.append(f'{name}{{service="{_label(service)}",method="{method}",endpoint="/{_label(endpoint)}"}} '
+                             f"{sum(getattr(sample, field) for sample in samples)}")
+
+        with atomic_open(path) as f:
+            f.write("\n".join(lines) + "\n")
+
+    def write_trace(self, path):
+        """
+        Écrit les requêtes au format Trace Event (``chrome://tracing``, Perfetto).
+
+        Les requêtes simultanées sont placées sur des lignes distinctes, ce qui
+        montre le parallélisme effectif de l'exécution.
+        """
+        events = []
+        lanes = []
+        for (service, method, endpoint), samples in self.endpoints().items():
+            for sample in samples:
+                events.append((sample, service, f"{method} /{endpoint}"))
+        events.sort(key=lambda event: event[0].started)
+
+        trace = []
+        for sample, service, name in events:
+            end = sample.started + sample.seconds
+            lane = next((i for i, lane_end in enumerate(lanes) if lane_end <= sample.started), len(lanes))
+            if lane == len(lanes):
+                lanes.append(end)
+            else:
+                lanes[lane] = end
+            trace.append({
+                "name": name,
+                "cat": service,
+                "ph": "X",
+                "ts": round(sample.started * 1e6),
+                "dur": round(sample.seconds * 1e6),
+                "pid": 1,
+                "tid": lane,
+                "args": {"url": sample.url, "status": sample.status,
+                         "request_bytes": sample.request_bytes, "response_bytes": sample.response_bytes},
+            })
+        with atomic_open(path) as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+def make_recorder(timings=False, metrics_file=None, trace_file=None):
+    """
+    Retourne un ``Recorder`` si l'une des options d'instrumentation est demandée, None sinon.
+    """
+    return Recorder() if timings or metrics_file or trace_file else None
+
+
+def report(recorder, timings=False, metrics_file=None, trace_file=None):
+    """
+    Affiche le rapport de fin d'exécution et écrit les fichiers demandés.
+    """
+    if recorder is None:
+        return
+    if timings:
+        for line in recorder.summary_lines():
+            typer.echo(line)
+    if metrics_file:
+        recorder.write_prometheus(metrics_file)
+    if trace_file:
+        recorder.write_trace(trace_file)
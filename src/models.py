@@ -0,0 +1,268 @@
+import json
+import sys
+from abc import ABC, abstractmethod
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : repli sur le module json standard
+    orjson = None
+
+
+def loads(data):
+    """
+    Décode un document JSON (``bytes`` ou ``str``), avec orjson s'il est installé.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(obj):
+    # les modèles sont écrits sous la forme de leur ``to_dict``
+    return obj.to_dict() if isinstance(obj, Model) else str(obj)
+
+
+def dumps(obj):
+    """
+    Encode un objet en JSON compact (``str``), avec orjson s'il est installé.
+
+    Les modèles sont encodés avec ``to_dict`` ; les autres valeurs non
+    sérialisables (dates...) sont converties avec ``str``.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default).decode()
+    return json.dumps(obj, separators=(",", ":"), default=_default)
+
+
+def _intern(value):
+    # les identifiants de projet, statuts, réseaux... se répètent sur des milliers de ressources
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _project_id(data):
+    return _intern(data.get("project_id") or data.get("tenant_id"))
+
+
+class Model(ABC):
+    """
+    Base des modèles de ressources : attributs dans ``__slots__``, sans ``__dict__``.
+
+    Seuls les attributs utilisés par les scripts sont conservés ; ``from_dict``
+    construit le modèle à partir de la réponse de l'API (ou d'un ``to_dict``
+    relu dans un export) et ``to_dict`` retourne un dictionnaire de ces attributs.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **attributes):
+        for name in self.__slots__:
+            setattr(self, name, attributes.get(name))
+
+    @classmethod
+    @abstractmethod
+    def from_dict(cls, data):
+        """
+        Construit le modèle à partir d'une ressource de l'API ou de son ``to_dict``.
+        """
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r}, name={getattr(self, 'name', None)!r})"
+
+
+class Network(Model):
+    __slots__ = ("id", "name", "status", "admin_state_up", "external", "subnets", "project_id",
+                 "description", "revision_number", "updated_at")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data["id"],
+            name=data.get("name"),
+            status=_intern(data.get("status")),
+            admin_state_up=data.get("admin_state_up"),
+            external=data.get("router:external", data.get("external", False)),
+            subnets=tuple(data.get("subnets", ())),
+            project_id=_project_id(data),
+            description=data.get("description"),
+            revision_number=data.get("revision_number"),
+            updated_at=data.get("updated_at"),
+        )
+
+
+class Subnet(Model):
+    __slots__ = ("id", "name", "network_id", "cidr", "gateway_ip", "ip_version", "enable_dhcp",
+                 "project_id", "description", "revision_number", "updated_at")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data["id"],
+            name=data.get("name"),
+            network_id=_intern(data.get("network_id")),
+            cidr=data.get("cidr"),
+            gateway_ip=data.get("gateway_ip"),
+            ip_version=data.get("ip_version"),
+            enable_dhcp=data.get("enable_dhcp"),
+            project_id=_project_id(data),
+            description=data.get("description"),
+            revision_number=data.get("revision_number"),
+            updated_at=data.get("updated_at"),
+        )
+
+
+class Port(Model):
+    __slots__ = ("id", "name", "network_id", "device_id", "device_owner", "status", "admin_state_up",
+                 "fixed_ips", "project_id", "revision_number", "updated_at")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data["id"],
+            name=data.get("name"),
+            network_id=_intern(data.get("network_id")),
+            device_id=_intern(data.get("device_id")),
+            device_owner=_intern(data.get("device_owner")),
+            status=_intern(data.get("status")),
+            admin_state_up=data.get("admin_state_up"),
+            # (identifiant du sous-réseau, adresse IP)
+            fixed_ips=tuple((_intern(ip.get("subnet_id")), ip.get("ip_address")) if isinstance(ip, dict)
+                            else (_intern(ip[0]), ip[1]) for ip in data.get("fixed_ips", ())),
+            project_id=_project_id(data),
+            revision_number=data.get("revision_number"),
+            updated_at=data.get("updated_at"),
+        )
+
+
+class Server(Model):
+    __slots__ = ("id", "name", "status", "addresses", "image_id", "flavor_id", "project_id", "metadata",
+                 "updated")
+
+    @classmethod
+    def from_dict(cls, data):
+        image = data.get("image")
+        flavor = data.get("flavor")
+        return cls(
+            id=data["id"],
+            name=data.get("name"),
+            status=_intern(data.get("status")),
+            # {nom du réseau: (adresses IP...)}
+            addresses={
+                _intern(network): tuple(address.get("addr") if isinstance(address, dict) else address
+                                        for address in addresses)
+                for network, addresses in (data.get("addresses") or {}).items()
+            },
+            image_id=_intern(image.get("id") if isinstance(image, dict) else data.get("image_id")),
+            flavor_id=_intern(flavor.get("id") or flavor.get("original_name") if isinstance(flavor, dict)
+                              else data.get("flavor_id")),
+            project_id=_project_id(data),
+            metadata=data.get("metadata") or {},
+            updated=data.get("updated"),
+        )
+
+
+class Router(Model):
+    __slots__ = ("id", "name", "status", "admin_state_up", "external_network_id", "project_id",
+                 "description", "revision_number", "updated_at")
+
+    @classmethod
+    def from_dict(cls, data):
+        gateway = data.get("external_gateway_info") or {}
+        return cls(
+            id=data["id"],
+            name=data.get("name"),
+            status=_intern(data.get("status")),
+            admin_state_up=data.get("admin_state_up"),
+            external_network_id=_intern(gateway.get("network_id") or data.get("external_network_id")),
+            project_id=_project_id(data),
+            description=data.get("description"),
+            revision_number=data.get("revision_number"),
+            updated_at=data.get("updated_at"),
+        )
+
+
+class Image(Model):
+    __slots__ = ("id", "name", "status", "size", "min_disk", "min_ram")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data["id"],
+            name=data.get("name"),
+            status=_intern(data.get("status")),
+            size=data.get("size"),
+            min_disk=data.get("min_disk"),
+            min_ram=data.get("min_ram"),
+        )
+
+
+class Flavor(Model):
+    __slots__ = ("id", "name", "vcpus", "ram", "disk")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data["id"],
+            name=data.get("name"),
+            vcpus=data.get("vcpus"),
+            ram=data.get("ram"),
+            disk=data.get("disk"),
+        )
+
+
+# modèle de chaque type de ressource (clés de ``RESOURCES``)
+MODELS = {
+    "networks": Network,
+    "subnets": Subnet,
+    "ports": Port,
+    "servers": Server,
+    "server_details": Server,
+    "routers": Router,
+    "images": Image,
+    "flavors": Flavor,
+}
+
+# sections de l'export ``export_json`` : (type de ressource, clé de la collection)
+EXPORT_SECTIONS = {
+    "network": ("networks", "networks"),
+    "subnet": ("subnets", "subnets"),
+    "port": ("ports", "ports"),
+    "servers": ("servers", "servers"),
+    "router": ("routers", "routers"),
+}
+
+
+def decode(kind, items):
+    """
+    Convertit une liste de ressources de l'API en modèles.
+    Args:
+        kind: le type de ressource (networks, servers, routers...).
+        items: les ressources (dictionnaires, ou modèles déjà décodés, conservés tels quels).
+
+    Returns:
+        La liste des modèles.
+    """
+    model = MODELS[kind]
+    return [item if isinstance(item, model) else model.from_dict(item) for item in items]
+
+
+def decode_export(data):
+    """
+    Décode un export ``export_json`` (document JSON) en modèles.
+    Args:
+        data: le contenu du fichier (``bytes`` ou ``str``) ou l'export déjà décodé.
+
+    Returns:
+        Les modèles par type de ressource (``{"networks": [Network...], "servers": [...]}``).
+    """
+    snapshot = loads(data) if isinstance(data, (bytes, str)) else data
+    decoded = {}
+    for section, (kind, key) in EXPORT_SECTIONS.items():
+        if section in snapshot:
+            decoded[kind] = decode(kind, snapshot[section].get(key, []))
+    return decoded
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+import asyncio
+import json
+import os
+import time
+
+import typer
+
+from src.async_openstack import AsyncOpenStack
+from src.auth import AuthenticationError, TokenCache
+from src.pagination import DEFAULT_PAGE_SIZE
+from src.resilience import DEFAULT_RETRIES, Resilience
+from src.session import AsyncSessionPool, DEFAULT_MAX_CONNECTIONS, DEFAULT_TIMEOUT
+from src.snapshot import SECTIONS, write_snapshot
+
+app = typer.Typer()
+
+# durée maximale (secondes) de l'export d'un cloud
+DEFAULT_CLOUD_TIMEOUT = 120.0
+
+PROFILE_DEFAULTS = {
+    "port": "80",
+    "project": "admin",
+    "username": "admin",
+    "password": None,
+    "auth_url": None,
+    "interface": "public",
+    "region": None,
+    "timeout": None,
+    "page_size": DEFAULT_PAGE_SIZE,
+}
+
+
+def load_profiles(path):
+    """
+    Lit les profils des clouds (YAML ou JSON).
+
+    Le fichier contient une clé ``clouds`` : un profil par nom, avec ``ip`` et,
+    au besoin, ``port``, ``project``, ``username``, ``password`` (ou
+    ``password_env``, le nom d'une variable d'environnement), ``auth_url``,
+    ``interface``, ``region``, ``timeout`` et ``page_size``.
+    Args:
+        path: le chemin du fichier (``.json``, ``.yaml`` ou ``.yml``).
+
+    Returns:
+        Les profils normalisés, par nom de cloud.
+    """
+    with open(path) as f:
+        content = f.read()
+
+    if path.endswith(".json"):
+        raw = json.loads(content)
+    else:
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("PyYAML est nécessaire pour lire des profils YAML (pip install pyyaml)")
+        raw = yaml.safe_load(content)
+
+    profiles = {}
+    for name, profile in (raw or {}).get("clouds", {}).items():
+        if "ip" not in profile and "auth_url" not in profile:
+            raise ValueError(f"Le profil {name} doit définir ip ou auth_url")
+        profile = dict(PROFILE_DEFAULTS, **profile)
+        if profile.get("password_env"):
+            profile["password"] = os.environ.get(profile.pop("password_env"))
+        profile["port"] = str(profile["port"])
+        profiles[name] = profile
+    if not profiles:
+        raise ValueError(f"Aucun cloud défini dans {path}")
+    return profiles
+
+
+async def export_cloud(name, profile, timeout, pool_size=DEFAULT_MAX_CONNECTIONS, retries=DEFAULT_RETRIES,
+                       token_cache=None, transport=None):
+    """
+    Exporte un cloud avec sa propre session, en au plus ``timeout`` secondes.
+
+    Returns:
+        Le couple (export, statut) ; l'export est None si le cloud a échoué.
+    """
+    started = time.perf_counter()
+    status = {"region": profile["region"], "status": "ok"}
+    session = AsyncSessionPool(max_connections=pool_size, timeout=min(timeout, DEFAULT_TIMEOUT),
+                               transport=transport, resilience=Resilience(retries=retries))
+    client = AsyncOpenStack(profile.get("ip"), profile["port"], profile["project"], profile["username"],
+                            profile["password"], session=session, token_cache=token_cache,
+                            auth_url=profile["auth_url"], interface=profile["interface"],
+                            region=profile["region"], page_size=profile["page_size"])
+    snapshot = None
+    try:
+        snapshot = await asyncio.wait_for(client.export(), timeout)
+    except asyncio.TimeoutError:
+        status.update(status="timeout", error=f"export plus long que {timeout:g} s")
+    except AuthenticationError as e:
+        status.update(status="error", error=str(e))
+    except Exception as e:
+        status.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        await client.close()
+
+    status["seconds"] = round(time.perf_counter() - started, 3)
+    if snapshot is not None:
+        status["counts"] = {section: len(snapshot.get(section, {}).get(key, [])) for section, _, key in SECTIONS}
+    return snapshot, status
+
+
+def merge_snapshots(results, profiles):
+    """
+    Fusionne les exports des clouds en un seul export.
+
+    Chaque ressource reçoit les attributs ``cloud`` et ``region`` ; la clé
+    ``clouds`` donne le statut de chaque cloud (ok, error, timeout).
+    Args:
+        results: les couples (export, statut) par nom de cloud.
+        profiles: les profils par nom de cloud.
+
+    Returns:
+        L'export fusionné.
+    """
+    merged = {section: {key: []} for section, _, key in SECTIONS}
+    for name, (snapshot, _) in results.items():
+        if snapshot is None:
+            continue
+        region = profiles[name]["region"]
+        for section, _, key in SECTIONS:
+            merged[section][key].extend(dict(item.to_dict(), cloud=name, region=region)
+                                        for item in snapshot.get(section, {}).get(key, []))
+    merged["clouds"] = {name: status for name, (_, status) in results.items()}
+    return merged
+
+
+async def export_clouds(profiles, timeout=DEFAULT_CLOUD_TIMEOUT, **kwargs):
+    """
+    Exporte tous les clouds en parallèle ; un cloud lent ou en panne ne retarde pas les autres.
+    Args:
+        profiles: les profils par nom de cloud.
+        timeout: la durée maximale par défaut de l'export d'un cloud (le profil peut la remplacer).
+
+    Returns:
+        Les couples (export, statut) par nom de cloud.
+    """
+    names = list(profiles)
+    results = await asyncio.gather(*(
+        export_cloud(name, profiles[name], profiles[name]["timeout"] or timeout, **kwargs) for name in names))
+    return dict(zip(names, results))
+
+
+@app.command(help="Export several clouds and regions concurrently into one merged snapshot.")
+def export(
+    profiles_path: str = typer.Argument(..., help="Cloud profiles (YAML or JSON, see README)"),
+    cloud: list[str] = typer.Option(None, help="Only export these clouds (repeatable)"),
+    output: str = typer.Option("resultat.json", help="Path of the merged snapshot"),
+    timeout: float = typer.Option(DEFAULT_CLOUD_TIMEOUT, help="Maximum seconds per cloud (profiles can override it)"),
+    pool_size: int = typer.Option(DEFAULT_MAX_CONNECTIONS, help="Maximum HTTP connections per endpoint"),
+    retries: int = typer.Option(DEFAULT_RETRIES, help="Retries of idempotent requests on 429/5xx and network errors"),
+    token_cache: bool = typer.Option(True, help="Reuse cached Keystone tokens across runs"),
+):
+    """
+    Cette commande permet d'exporter plusieurs clouds et régions en parallèle dans un seul fichier.
+    Args:
+        profiles_path: le fichier des profils des clouds.
+        cloud: les clouds à exporter (tous par défaut).
+        output: le chemin de l'export fusionné.
+        timeout: la durée maximale de l'export d'un cloud.
+        pool_size: le nombre maximal de connexions HTTP par endpoint.
+        retries: le nombre maximal de nouvelles tentatives d'une requête.
+        token_cache: réutilise les tokens Keystone mis en cache entre deux exécutions.
+    """
+    try:
+        profiles = load_profiles(profiles_path)
+    except (OSError, ValueError) as e:
+        typer.echo(f"Erreur : {e}", err=True)
+        raise typer.Exit(1)
+    if cloud:
+        unknown = [name for name in cloud if name not in profiles]
+        if unknown:
+            raise typer.BadParameter(f"unknown cloud(s): {', '.join(unknown)}", param_hint="--cloud")
+        profiles = {name: profiles[name] for name in cloud}
+
+    results = asyncio.run(export_clouds(profiles, timeout, pool_size=pool_size, retries=retries,
+                                        token_cache=TokenCache() if token_cache else None))
+
+    for name, (_, status) in results.items():
+        detail = status.get("error") or ", ".join(f"{section} {count}" for section, count in status["counts"].items())
+        typer.echo(f"{name} ({status['region'] or 'toutes régions'}) : {status['status']} en {status['seconds']} s - {detail}")
+
+    succeeded = [name for name, (snapshot, _) in results.items() if snapshot is not None]
+    if not succeeded:
+        typer.echo("Aucun cloud exporté, l'export précédent est conservé.", err=True)
+        raise typer.Exit(1)
+
+    write_snapshot(output, merge_snapshots(results, profiles))
+    typer.echo(f"Export fusionné écrit dans {output} ({len(succeeded)}/{len(results)} cloud(s))")
+    if len(succeeded) < len(results):
+        # export partiel : écrit, mais signalé par le code de retour
+        raise typer.Exit(2)
+
+
+if __name__ == "__main__":
+    app()
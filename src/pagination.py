@@ -0,0 +1,121 @@
+from urllib.parse import parse_qs, urlsplit
+
+from src.models import loads
+
+# nombre d'éléments demandés par page (paramètre ``limit``)
+DEFAULT_PAGE_SIZE = 1000
+
+
+def next_marker(body, key):
+    """
+    Retourne le ``marker`` de la page suivante annoncée par une réponse, ou None.
+
+    Nova et Neutron annoncent la page suivante dans ``<key>_links``, Glance dans
+    ``next`` et Keystone dans ``links.next``. Seul le ``marker`` du lien est
+    conservé : la page suivante est demandée sur l'URL de l'endpoint du
+    catalogue, même si le lien pointe vers un nom d'hôte interne.
+    """
+    href = None
+    for link in body.get(f"{key}_links") or []:
+        if link.get("rel") == "next":
+            href = link.get("href")
+    if href is None and isinstance(body.get("next"), str):
+        href = body["next"]
+    if href is None and isinstance(body.get("links"), dict):
+        href = body["links"].get("next")
+    if not href:
+        return None
+
+    markers = parse_qs(urlsplit(href).query).get("marker")
+    return markers[-1] if markers else None
+
+
+def _page_params(params, page_size, marker):
+    page_params = dict(params or {})
+    if page_size:
+        page_params["limit"] = page_size
+    if marker is not None:
+        page_params["marker"] = marker
+    return page_params
+
+
+def _following_marker(body, key, items, page_size):
+    marker = next_marker(body, key)
+    # sans lien « next », une page pleine peut encore être suivie d'autres éléments
+    if marker is None and page_size and len(items) >= page_size and "id" in items[-1]:
+        marker = items[-1]["id"]
+    return marker
+
+
+def iter_pages(session, url, key, headers, params=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Parcourt les pages d'une collection OpenStack à la demande.
+
+    Args:
+        session: la session HTTP (``SessionPool``).
+        url: l'URL de la collection.
+        key: la clé de la collection dans la réponse (``servers``, ``networks``...).
+        headers: les en-têtes de la requête (token).
+        params: les paramètres de requête (filtres).
+        page_size: le nombre d'éléments par page (0 pour ne pas paginer).
+
+    Returns:
+        Un générateur de listes d'éléments, une liste par page.
+    """
+    marker = None
+    while True:
+        response = session.get(url, headers=headers, params=_page_params(params, page_size, marker))
+        response.raise_for_status()
+        body = response.json()
+        items = body.get(key, [])
+        if items:
+            yield items
+
+        marker = _following_marker(body, key, items, page_size)
+        if marker is None or not items:
+            return
+
+
+def iter_collection(session, url, key, headers, params=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Parcourt une collection OpenStack élément par élément, page après page.
+
+    Seule la page courante est gardée en mémoire. Voir ``iter_pages``.
+    """
+    for items in iter_pages(session, url, key, headers, params, page_size):
+        yield from items
+
+
+async def aiter_pages(session, url, key, headers, params=None, page_size=DEFAULT_PAGE_SIZE, decode=None):
+    """
+    Version asynchrone de ``iter_pages`` (``AsyncSessionPool``).
+
+    Avec ``decode`` (par exemple ``models.decode``), chaque page est convertie
+    dès sa réception : les dictionnaires de la réponse ne sont pas conservés.
+    """
+    marker = None
+    while True:
+        response = await session.get(url, headers=headers, params=_page_params(params, page_size, marker))
+        response.raise_for_status()
+        # les exports parcourent des milliers de ressources : décodage orjson si disponible
+        body = loads(response.content)
+        items = body.get(key, [])
+        marker = _following_marker(body, key, items, page_size)
+        if not items:
+            return
+        page = decode(items) if decode is not None else items
+        # la réponse décodée n'est pas gardée pendant que l'appelant consomme la page
+        body = items = None
+        yield page
+
+        if marker is None:
+            return
+
+
+async def aiter_collection(session, url, key, headers, params=None, page_size=DEFAULT_PAGE_SIZE, decode=None):
+    """
+    Version asynchrone de ``iter_collection`` (``AsyncSessionPool``).
+    """
+    async for items in aiter_pages(session, url, key, headers, params, page_size, decode):
+        for item in items:
+            yield item
@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import typer
+
+# quotas Neutron vérifiés : (attribut de ``Demand``, ressource du quota)
+NETWORK_QUOTAS = (("networks", "network"), ("subnets", "subnet"), ("ports", "port"), ("routers", "router"))
+
+# limites Nova vérifiées : (ressource, limite, consommation)
+COMPUTE_LIMITS = (
+    ("instances", "maxTotalInstances", "totalInstancesUsed"),
+    ("cores", "maxTotalCores", "totalCoresUsed"),
+    ("ram", "maxTotalRAMSize", "totalRAMUsed"),
+)
+
+
+class Demand:
+    """
+    Ressources qu'un provisionnement va consommer.
+
+    Attributes:
+        networks, subnets, ports, routers: le nombre de ressources Neutron créées
+            (un port par machine virtuelle, interface de routeur, passerelle et
+            sous-réseau avec DHCP).
+        servers: le nombre de machines virtuelles par nom de flavor.
+        images: les noms des images utilisées.
+    """
+
+    def __init__(self, networks=0, subnets=0, ports=0, routers=0, servers=None, images=()):
+        self.networks = networks
+        self.subnets = subnets
+        self.ports = ports
+        self.routers = routers
+        self.servers = dict(servers or {})
+        self.images = set(images)
+
+    def __bool__(self):
+        return bool(self.networks or self.subnets or self.ports or self.routers or self.servers or self.images)
+
+    def add_server(self, image, flavor, count=1):
+        self.servers[flavor] = self.servers.get(flavor, 0) + count
+        self.images.add(image)
+        self.ports += count
+
+    @classmethod
+    def from_plan(cls, plan):
+        """
+        Retourne la consommation des créations d'un plan.
+
+        Les suppressions du plan ne sont pas déduites : la vérification reste
+        prudente quand une ressource est remplacée.
+        """
+        demand = cls()
+        for action in plan.actions:
+            if action.op != "create":
+                continue
+            data = action.data
+            if action.kind == "network":
+                demand.networks += 1
+            elif action.kind == "subnet":
+                demand.subnets += 1
+                demand.ports += 1 if data["enable_dhcp"] else 0
+            elif action.kind == "router":
+                demand.routers += 1
+                demand.ports += 1 if data["external_network"] is not None else 0
+            elif action.kind == "interface":
+                demand.ports += 1
+            elif action.kind == "server":
+                demand.add_server(data["image"], data["flavor"], data["count"])
+        return demand
+
+
+class PreflightResult:
+    """
+    Résultat d'une vérification ``preflight``.
+
+    Attributes:
+        problems: les raisons pour lesquelles le provisionnement échouerait.
+        warnings: les vérifications impossibles (quota illisible...), non bloquantes.
+        usage: les lignes ``(ressource, demandé, utilisé, limite)`` des quotas vérifiés.
+    """
+
+    def __init__(self):
+        self.problems = []
+        self.warnings = []
+        self.usage = []
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def check(self, resource, requested, used, limit):
+        self.usage.append((resource, requested, used, limit))
+        if requested and limit is not None and limit >= 0 and used + requested > limit:
+            self.problems.append(f"Quota {resource} insuffisant : {requested} demandé(s), "
+                                 f"{used} utilisé(s) sur {limit}")
+
+    def lines(self):
+        for resource, requested, used, limit in self.usage:
+            if requested:
+                yield (f"{resource} : {requested} demandé(s), {used} utilisé(s) sur "
+                       f"{'illimité' if limit is None or limit < 0 else limit}")
+        for warning in self.warnings:
+            yield f"Attention : {warning}"
+        for problem in self.problems:
+            yield f"Erreur : {problem}"
+
+
+def _fetch(future, description, result):
+    try:
+        return future.result()
+    except (httpx.HTTPError, KeyError, ValueError) as e:
+        result.warnings.append(f"{description} non vérifié(s) ({type(e).__name__}: {e})")
+        return None
+
+
+def preflight(openstack, demand):
+    """
+    Vérifie, avant toute création, que le provisionnement tient dans les quotas du projet.
+
+    Les limites Nova (``/limits``), les quotas Neutron (``/quotas/<projet>/details``),
+    les flavors détaillées et les images demandées sont lus en parallèle, soit
+    environ un aller-retour. Le provisionnement échoue si une image ou une
+    flavor est introuvable, ou si la consommation actuelle plus la demande
+    dépasse une limite. Un quota illisible n'est qu'un avertissement.
+    Args:
+        openstack: le client ``OpenStack`` authentifié.
+        demand: la ``Demand`` du provisionnement.
+
+    Returns:
+        Un ``PreflightResult``.
+    """
+    result = PreflightResult()
+    with ThreadPoolExecutor(max_workers=3 + len(demand.images)) as executor:
+        limits = executor.submit(openstack.get_limits) if demand.servers else None
+        quotas = executor.submit(openstack.get_network_quotas)
+        flavors = executor.submit(lambda: list(openstack.query("flavor_details"))) if demand.servers else None
+        images = {name: executor.submit(openstack.get_image_id, name) for name in sorted(demand.images)}
+
+        for name, future in images.items():
+            try:
+                if future.result() is None:
+                    result.problems.append(f"Image {name} introuvable")
+            except httpx.HTTPError as e:
+                result.warnings.append(f"Image {name} non vérifiée ({type(e).__name__}: {e})")
+
+        flavors = _fetch(flavors, "Flavors", result) if flavors is not None else None
+        if flavors is not None:
+            by_name = {flavor.get("name"): flavor for flavor in flavors}
+            requested = {"instances": 0, "cores": 0, "ram": 0}
+            for name, count in sorted(demand.servers.items()):
+                flavor = by_name.get(name)
+                if flavor is None:
+                    result.problems.append(f"Flavor {name} introuvable")
+                    continue
+                requested["instances"] += count
+                requested["cores"] += count * flavor.get("vcpus", 0)
+                requested["ram"] += count * flavor.get("ram", 0)
+
+            absolute = _fetch(limits, "Limites Nova", result)
+            if absolute is not None:
+                for resource, limit_key, used_key in COMPUTE_LIMITS:
+                    result.check(resource, requested[resource], absolute.get(used_key, 0), absolute.get(limit_key))
+
+        quota = _fetch(quotas, "Quotas Neutron", result)
+        if quota is not None:
+            for attribute, resource in NETWORK_QUOTAS:
+                detail = quota.get(resource) or {}
+                used = detail.get("used", 0) + detail.get("reserved", 0)
+                result.check(resource, getattr(demand, attribute), used, detail.get("limit"))
+
+    return result
+
+
+def run_preflight(openstack, demand):
+    """
+    Exécute ``preflight`` et affiche son résultat ; quitte avec le code 1 si le provisionnement échouerait.
+    """
+    result = preflight(openstack, demand)
+    for line in result.lines():
+        typer.echo(line)
+    if not result.ok:
+        typer.echo("Vérification préalable en échec : aucune ressource n'a été créée.", err=True)
+        openstack.close()
+        raise typer.Exit(1)
+    return result
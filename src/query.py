@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+
+import json
+import time
+
+import typer
+
+from src.models import MODELS
+from src.reachability import Reachability
+from src.snapshot import load_models
+
+app = typer.Typer()
+
+# attributs indexés pour chaque type de ressource
+INDEXED_ATTRIBUTES = ("name", "status", "project_id")
+
+# colonnes affichées par défaut
+DEFAULT_COLUMNS = {
+    "networks": ("id", "name", "status", "external"),
+    "subnets": ("id", "name", "network_id", "cidr"),
+    "ports": ("id", "device_owner", "device_id", "status"),
+    "servers": ("id", "name", "status", "addresses"),
+    "routers": ("id", "name", "status", "external_network_id"),
+}
+
+
+class SnapshotIndex:
+    """
+    Index en mémoire d'un export ``export_json``, pour répondre aux requêtes sans l'API.
+
+    Les ressources sont indexées par identifiant, nom, statut, projet et réseau
+    (adresses des serveurs, ``network_id`` des sous-réseaux et des ports, réseau
+    externe des routeurs) ; un filtre est une recherche dans un dictionnaire et
+    plusieurs filtres sont combinés en partant de la liste la plus courte.
+
+    Args:
+        models: les modèles par type de ressource (``snapshot.load_models``).
+    """
+
+    def __init__(self, models):
+        self.models = models
+        self._by_id = {}
+        self._positions = {}
+        self._indexes = {}
+        self._by_network = {}
+
+        for kind, items in models.items():
+            self._by_id[kind] = {item.id: item for item in items}
+            self._positions[kind] = {item.id: position for position, item in enumerate(items)}
+            indexes = {attribute: {} for attribute in INDEXED_ATTRIBUTES if attribute in MODELS[kind].__slots__}
+            for item in items:
+                for attribute, index in indexes.items():
+                    index.setdefault(getattr(item, attribute), []).append(item)
+            self._indexes[kind] = indexes
+
+        # jointure avec les réseaux : les adresses des serveurs sont indexées par nom de réseau
+        network_ids = {}
+        for network in models.get("networks", []):
+            network_ids.setdefault(network.name, network.id)
+        for kind, items in models.items():
+            by_network = {}
+            for item in items:
+                for network_id in self._networks_of(kind, item, network_ids):
+                    by_network.setdefault(network_id, []).append(item)
+            self._by_network[kind] = by_network
+
+    @staticmethod
+    def _networks_of(kind, item, network_ids):
+        if kind == "servers":
+            return [network_ids.get(name, name) for name in item.addresses]
+        if kind == "routers":
+            return [item.external_network_id] if item.external_network_id else []
+        if kind == "networks":
+            return [item.id]
+        return [item.network_id]
+
+    @classmethod
+    def load(cls, path):
+        """
+        Construit l'index d'un fichier d'export (JSON ou NDJSON).
+        """
+        return cls(load_models(path))
+
+    def get(self, kind, key):
+        """
+        Retourne une ressource par identifiant ou, à défaut, par nom (None si elle est inconnue).
+        """
+        item = self._by_id.get(kind, {}).get(key)
+        if item is None:
+            matches = self._indexes.get(kind, {}).get("name", {}).get(key)
+            item = matches[0] if matches else None
+        return item
+
+    def select(self, kind, id=None, name=None, status=None, project_id=None, network=None):
+        """
+        Retourne les ressources qui vérifient tous les filtres donnés.
+        Args:
+            kind: le type de ressource (networks, subnets, ports, servers, routers).
+            id: l'identifiant de la ressource.
+            name: le nom de la ressource.
+            status: le statut (ACTIVE, DOWN, ERROR...), sans tenir compte de la casse.
+            project_id: l'identifiant du projet.
+            network: le nom ou l'identifiant d'un réseau.
+
+        Returns:
+            La liste des ressources, dans l'ordre de l'export.
+        """
+        if kind not in self.models:
+            raise KeyError(f"Type de ressource absent de l'export : {kind}")
+
+        indexes = self._indexes[kind]
+        candidates = []
+        if id is not None:
+            item = self._by_id[kind].get(id)
+            candidates.append([item] if item is not None else [])
+        for attribute, value in (("name", name), ("status", status), ("project_id", project_id)):
+            if value is None:
+                continue
+            if attribute == "status":
+                value = value.upper()
+            candidates.append(indexes.get(attribute, {}).get(value, []))
+        if network is not None:
+            network_item = self.get("networks", network)
+            network_id = network_item.id if network_item is not None else network
+            candidates.append(self._by_network[kind].get(network_id, []))
+
+        if not candidates:
+            return list(self.models[kind])
+
+        candidates.sort(key=len)
+        result = candidates[0]
+        for other in candidates[1:]:
+            keep = {item.id for item in other}
+            result = [item for item in result if item.id in keep]
+
+        positions = self._positions[kind]
+        return sorted(result, key=lambda item: positions[item.id])
+
+
+def _format(value):
+    if isinstance(value, dict):
+        return ",".join(f"{key}={'/'.join(map(str, addresses))}" for key, addresses in value.items())
+    if isinstance(value, (list, tuple)):
+        return ",".join(map(str, value))
+    return "" if value is None else str(value)
+
+
+@app.command(help="Query an export_json snapshot offline (filters and network joins).")
+def query(
+    kind: str = typer.Argument(..., help="Resource type: networks, subnets, ports, servers or routers"),
+    snapshot: str = typer.Option("resultat.json", help="Snapshot written by export_json (JSON or NDJSON)"),
+    id: str = typer.Option(None, help="Resource ID"),
+    name: str = typer.Option(None, help="Resource name"),
+    status: str = typer.Option(None, help="Resource status (ACTIVE, DOWN, ERROR...)"),
+    project: str = typer.Option(None, help="Project ID"),
+    network: str = typer.Option(None, help="Network name or ID (servers, subnets, ports, routers)"),
+    columns: str = typer.Option(None, help="Comma-separated attributes to print"),
+    output_json: bool = typer.Option(False, "--json", help="Print the results as JSON"),
+    count: bool = typer.Option(False, help="Only print the number of results"),
+):
+    """
+    Cette commande permet d'interroger un export sans appeler l'API OpenStack.
+    Args:
+        kind: le type de ressource.
+        snapshot: le chemin de l'export.
+        id: l'identifiant de la ressource.
+        name: le nom de la ressource.
+        status: le statut de la ressource.
+        project: l'identifiant du projet.
+        network: le nom ou l'identifiant d'un réseau.
+        columns: les attributs à afficher.
+        output_json: affiche les résultats en JSON.
+        count: n'affiche que le nombre de résultats.
+    """
+    started = time.perf_counter()
+    index = SnapshotIndex.load(snapshot)
+    loaded = time.perf_counter()
+    try:
+        results = index.select(kind, id=id, name=name, status=status, project_id=project, network=network)
+    except KeyError as e:
+        typer.echo(f"Erreur : {e.args[0]}", err=True)
+        raise typer.Exit(1)
+    elapsed = time.perf_counter() - loaded
+
+    if count:
+        typer.echo(len(results))
+        return
+    if output_json:
+        typer.echo(json.dumps([item.to_dict() for item in results], indent=4))
+        return
+
+    names = columns.split(",") if columns else DEFAULT_COLUMNS.get(kind, ("id", "name"))
+    for item in results:
+        typer.echo("\t".join(_format(getattr(item, column, None)) for column in names))
+    typer.echo(f"{len(results)} résultat(s) en {elapsed * 1000:.1f} ms "
+               f"(chargement de l'export : {(loaded - started) * 1000:.1f} ms)", err=True)
+
+
+@app.command(help="Check which VMs of an export_json snapshot can reach each other (L3), and why.")
+def reachability(
+    snapshot: str = typer.Option("resultat.json", help="Snapshot written by export_json (JSON or NDJSON)"),
+    vm: list[str] = typer.Option(None, help="Only check these VMs (name or ID, repeatable)"),
+    max_pairs: int = typer.Option(100, help="Print every pair up to this many, only the groups beyond"),
+    check: bool = typer.Option(False, help="Exit with status 1 if a pair cannot communicate"),
+):
+    """
+    Cette commande permet de vérifier hors ligne quelles machines virtuelles peuvent communiquer.
+    Args:
+        snapshot: le chemin de l'export.
+        vm: les machines virtuelles à vérifier (toutes par défaut).
+        max_pairs: le nombre maximal de paires affichées.
+        check: retourne le code 1 si une paire ne peut pas communiquer.
+    """
+    index = SnapshotIndex.load(snapshot)
+    if "subnets" not in index.models or "ports" not in index.models:
+        typer.echo("Erreur : l'export ne contient pas les sous-réseaux et les ports (relancer export_json)", err=True)
+        raise typer.Exit(1)
+    analysis = Reachability(index.models)
+
+    servers = analysis.servers
+    if vm:
+        servers = [index.get("servers", key) for key in vm]
+        missing = [key for key, server in zip(vm, servers) if server is None]
+        if missing:
+            typer.echo(f"Erreur : machine(s) virtuelle(s) inconnue(s) : {', '.join(missing)}", err=True)
+            raise typer.Exit(1)
+
+    unreachable = 0
+    pair_count = len(servers) * (len(servers) - 1) // 2
+    if pair_count <= max_pairs:
+        for a, b, reachable, reason in analysis.pairs(servers):
+            unreachable += not reachable
+            typer.echo(f"{'OK' if reachable else 'KO'}  {a.name} <-> {b.name} : {reason}")
+    else:
+        # au-delà, les groupes suffisent : deux machines d'un même groupe se joignent ;
+        # une machine à plusieurs interfaces apparaît dans le groupe de chacune
+        wanted = {server.id for server in servers}
+        for number, group in enumerate(analysis.groups(), 1):
+            group = [server for server in group if server.id in wanted]
+            if group:
+                names = ", ".join(server.name for server in group[:10])
+                typer.echo(f"Groupe {number} ({len(group)}) : {names}{', ...' if len(group) > 10 else ''}")
+        unreachable = pair_count - analysis.reachable_pairs(servers)
+
+    typer.echo(f"{pair_count - unreachable}/{pair_count} paires joignables")
+    if check and unreachable:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,297 @@
+import ipaddress
+from bisect import bisect_right
+from collections import Counter, deque
+
+# propriétaires des ports qui relient un routeur à un sous-réseau
+ROUTER_INTERFACE_OWNERS = ("network:router_interface", "network:router_interface_distributed",
+                           "network:ha_router_replicated_interface")
+ROUTER_GATEWAY_OWNER = "network:router_gateway"
+
+
+class SubnetRanges:
+    """
+    Recherche du sous-réseau contenant une adresse, sur des adresses encodées en entiers.
+
+    Les CIDR d'un réseau sont convertis en intervalles ``[première, dernière]``
+    triés ; une adresse est placée par recherche dichotomique (``bisect``), soit
+    O(log n) par adresse au lieu de tester chaque CIDR. Neutron interdit les
+    CIDR qui se chevauchent dans un même réseau.
+    """
+
+    def __init__(self, subnets):
+        ranges = {}
+        for subnet in subnets:
+            if not subnet.cidr:
+                continue
+            network = ipaddress.ip_network(subnet.cidr, strict=False)
+            ranges.setdefault((subnet.network_id, network.version), []).append(
+                (int(network.network_address), int(network.broadcast_address), subnet.id))
+        self._starts = {}
+        self._ranges = {}
+        for key, intervals in ranges.items():
+            intervals.sort()
+            self._starts[key] = [start for start, _, _ in intervals]
+            self._ranges[key] = intervals
+
+    def lookup(self, network_id, address):
+        """
+        Retourne l'identifiant du sous-réseau de ``network_id`` qui contient ``address``, ou None.
+        """
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+        key = (network_id, ip.version)
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        position = bisect_right(starts, int(ip)) - 1
+        if position < 0:
+            return None
+        _, end, subnet_id = self._ranges[key][position]
+        return subnet_id if int(ip) <= end else None
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, node):
+        root = node
+        while self.parent.setdefault(root, root) != root:
+            root = self.parent[root]
+        # compression du chemin
+        while node != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+
+class Reachability:
+    """
+    Analyse de la connectivité L3 entre les machines virtuelles d'un export.
+
+    Le graphe relie chaque machine virtuelle aux sous-réseaux de ses adresses
+    (appartenance au CIDR), et chaque routeur actif (``admin_state_up``) aux
+    sous-réseaux de ses interfaces et de sa passerelle. Deux machines peuvent
+    communiquer quand un de leurs sous-réseaux appartient à la même composante
+    connexe (union-find) ; le calcul est linéaire en nombre de ports et les
+    paires sont ensuite comparées en O(1).
+
+    Args:
+        models: les modèles par type de ressource (``snapshot.load_models``).
+    """
+
+    def __init__(self, models):
+        self.networks = {network.id: network for network in models.get("networks", [])}
+        self.subnets = {subnet.id: subnet for subnet in models.get("subnets", [])}
+        self.routers = {router.id: router for router in models.get("routers", [])}
+        self.servers = list(models.get("servers", []))
+        ports = models.get("ports", [])
+
+        network_ids = {}
+        for network in self.networks.values():
+            network_ids.setdefault(network.name, network.id)
+        ranges = SubnetRanges(self.subnets.values())
+
+        # état des ports des machines virtuelles, par (machine, adresse)
+        port_up = {}
+        for port in ports:
+            for _, address in port.fixed_ips:
+                port_up[(port.device_id, address)] = port.admin_state_up is not False
+
+        # sous-réseaux de chaque machine virtuelle ; ``blocked`` : machines hors service,
+        # ``problems`` : adresses inutilisables
+        self.vm_subnets = {}
+        self.blocked = {}
+        self.problems = {}
+        for server in self.servers:
+            subnets = []
+            problems = []
+            if server.status not in (None, "ACTIVE"):
+                self.blocked[server.id] = f"{server.name} is {server.status}"
+            for network_name, addresses in server.addresses.items():
+                network_id = network_ids.get(network_name, network_name)
+                for address in addresses:
+                    subnet_id = ranges.lookup(network_id, address)
+                    if subnet_id is None:
+                        problems.append(f"{server.name} address {address} is in no subnet of {network_name}")
+                    elif not port_up.get((server.id, address), True):
+                        problems.append(f"{server.name} port {address} is admin down")
+                    else:
+                        subnets.append(subnet_id)
+            if not server.addresses:
+                problems.append(f"{server.name} has no address")
+            self.vm_subnets[server.id] = subnets
+            self.problems[server.id] = problems
+
+        # liens routeur <-> sous-réseau : interfaces, puis passerelle
+        self.router_links = {router_id: set() for router_id in self.routers}
+        gateways = set()
+        for port in ports:
+            if port.device_id not in self.routers:
+                continue
+            if port.device_owner in ROUTER_INTERFACE_OWNERS or port.device_owner == ROUTER_GATEWAY_OWNER:
+                if port.admin_state_up is False:
+                    continue
+                if port.device_owner == ROUTER_GATEWAY_OWNER:
+                    gateways.add(port.device_id)
+                self.router_links[port.device_id].update(subnet_id for subnet_id, _ in port.fixed_ips)
+        for router in self.routers.values():
+            # export sans port de passerelle : tous les sous-réseaux du réseau externe
+            if router.id not in gateways and router.external_network_id:
+                self.router_links[router.id].update(
+                    subnet.id for subnet in self.subnets.values() if subnet.network_id == router.external_network_id)
+
+        # composantes connexes des sous-réseaux : par les routeurs actifs, et par
+        # tous les routeurs (pour signaler un routeur désactivé sur le chemin) ;
+        # un routeur relie ses sous-réseaux entre eux, les racines sont donc
+        # toujours des identifiants de sous-réseaux, comparables entre eux
+        self.components = UnionFind()
+        self.all_routers = UnionFind()
+        self._neighbours = {}
+        for router_id, subnet_ids in self.router_links.items():
+            active = self.routers[router_id].admin_state_up is not False
+            subnet_ids = sorted(subnet_ids)
+            for subnet_id in subnet_ids:
+                self.all_routers.union(subnet_ids[0], subnet_id)
+                if active:
+                    self.components.union(subnet_ids[0], subnet_id)
+                    self._neighbours.setdefault(subnet_id, []).append(router_id)
+
+    def _name(self, kind, resource_id):
+        item = {"subnet": self.subnets, "router": self.routers}[kind].get(resource_id)
+        return item.name if item is not None and item.name else resource_id
+
+    def _path(self, source, target):
+        # plus court chemin sous-réseau -> routeur -> sous-réseau (routeurs actifs)
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            subnet_id = queue.popleft()
+            if subnet_id == target:
+                break
+            for router_id in self._neighbours.get(subnet_id, ()):
+                for other in self.router_links[router_id]:
+                    if other not in previous:
+                        previous[other] = (subnet_id, router_id)
+                        queue.append(other)
+        routers = []
+        node = target
+        while previous.get(node) is not None:
+            node, router_id = previous[node]
+            routers.append(self._name("router", router_id))
+        return list(reversed(routers))
+
+    def check(self, a, b):
+        """
+        Indique si deux machines virtuelles peuvent communiquer, et pourquoi.
+        Args:
+            a: la première machine virtuelle (modèle ``Server``).
+            b: la seconde machine virtuelle.
+
+        Returns:
+            Le couple (joignable, raison).
+        """
+        blocked = [self.blocked[server.id] for server in (a, b) if server.id in self.blocked]
+        if blocked:
+            return False, "; ".join(blocked)
+
+        problems = self.problems[a.id] + self.problems[b.id]
+
+        subnets_a, subnets_b = self.vm_subnets[a.id], self.vm_subnets[b.id]
+        if not subnets_a or not subnets_b:
+            return False, "; ".join(problems) or "no usable address"
+
+        shared = set(subnets_a) & set(subnets_b)
+        if shared:
+            return True, f"same subnet {self._name('subnet', min(shared))}"
+
+        for subnet_a in subnets_a:
+            for subnet_b in subnets_b:
+                if self.components.find(subnet_a) == self.components.find(subnet_b):
+                    routers = " -> ".join(self._path(subnet_a, subnet_b))
+                    return True, (f"{self._name('subnet', subnet_a)} -> {routers} -> "
+                                  f"{self._name('subnet', subnet_b)}")
+
+        # composantes qui relieraient les deux machines si tous les routeurs étaient actifs
+        joined = {self.all_routers.find(subnet_a) for subnet_a in subnets_a} & \
+            {self.all_routers.find(subnet_b) for subnet_b in subnets_b}
+        down = sorted(
+            self._name("router", router_id) for router_id, router in self.routers.items()
+            if router.admin_state_up is False and self.router_links[router_id]
+            and self.all_routers.find(min(self.router_links[router_id])) in joined)
+        if down:
+            return False, f"router {', '.join(down)} is admin down"
+        names = sorted({self._name("subnet", subnet_id) for subnet_id in subnets_a + subnets_b})
+        return False, f"no router connects {', '.join(names)}"
+
+    def _vm_components(self, server):
+        # une machine ne route pas entre ses interfaces : chaque interface compte dans sa propre composante
+        if server.id in self.blocked:
+            return set()
+        return {self.components.find(subnet_id) for subnet_id in self.vm_subnets[server.id]}
+
+    def groups(self):
+        """
+        Regroupe les machines virtuelles par composante connexe (machines mutuellement joignables).
+
+        Une machine reliée à plusieurs composantes apparaît dans le groupe de chacune.
+
+        Returns:
+            La liste des groupes (listes de modèles ``Server``), plus grands d'abord ;
+            les machines sans adresse utilisable sont seules dans leur groupe.
+        """
+        groups = {}
+        for server in self.servers:
+            keys = sorted(self._vm_components(server)) or [("isolated", server.id)]
+            for key in keys:
+                groups.setdefault(key, []).append(server)
+        return sorted(groups.values(), key=len, reverse=True)
+
+    def reachable_pairs(self, servers=None):
+        """
+        Compte les paires de machines virtuelles joignables sans les parcourir.
+
+        Les paires sont comptées par composante ; une paire de machines qui
+        partagent plusieurs composantes n'est comptée qu'une fois.
+        Args:
+            servers: les machines virtuelles à compter (toutes si None).
+
+        Returns:
+            Le nombre de paires joignables.
+        """
+        servers = self.servers if servers is None else servers
+        sizes = Counter()
+        multi_homed = []
+        for server in servers:
+            components = self._vm_components(server)
+            sizes.update(components)
+            if len(components) > 1:
+                multi_homed.append(components)
+        count = sum(size * (size - 1) // 2 for size in sizes.values())
+        for i, a in enumerate(multi_homed):
+            for b in multi_homed[i + 1:]:
+                shared = len(a & b)
+                if shared > 1:
+                    count -= shared - 1
+        return count
+
+    def pairs(self, servers=None):
+        """
+        Parcourt les paires de machines virtuelles avec leur joignabilité.
+        Args:
+            servers: les machines virtuelles à comparer (toutes si None).
+
+        Returns:
+            Un générateur de tuples (a, b, joignable, raison).
+        """
+        servers = self.servers if servers is None else servers
+        for i, a in enumerate(servers):
+            for b in servers[i + 1:]:
+                reachable, reason = self.check(a, b)
+                yield a, b, reachable, reason
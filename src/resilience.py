@@ -0,0 +1,374 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+# méthodes rejouables sans risque de double effet
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# actions Neutron envoyées en PUT mais non idempotentes : rejouer un ajout réussi donne 400,
+# un retrait réussi 404 ; elles sont traitées comme un POST
+NON_IDEMPOTENT_ACTIONS = ("/add_router_interface", "/remove_router_interface")
+
+# statuts qui signalent une surcharge (réduction de la concurrence) ou une panne (disjoncteur)
+OVERLOAD_STATUSES = (429, 503)
+RETRY_STATUSES = (429, 502, 503, 504)
+FAILURE_STATUSES = (500, 502, 503, 504)
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_MAX_CONCURRENCY = 20
+DEFAULT_LATENCY_TARGET = 5.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+
+class CircuitOpenError(httpx.TransportError):
+    """
+    Levée sans envoyer la requête quand le disjoncteur de l'endpoint est ouvert.
+    """
+
+
+def retry_after(response):
+    """
+    Retourne le délai (secondes) demandé par l'en-tête ``Retry-After``, ou None.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AIMDLimiter:
+    """
+    Limite de requêtes simultanées ajustée en AIMD (augmentation additive, diminution multiplicative).
+
+    Chaque réponse normale augmente la limite de ``1 / limite`` (soit +1 par
+    fenêtre complète) ; une réponse 429 ou 503, ou une latence au-delà de
+    ``latency_target``, la multiplie par ``decrease``, au plus une fois par
+    aller-retour pour ne pas réagir plusieurs fois à la même surcharge.
+    Utilisable depuis des threads (``acquire``) ou une boucle asyncio (``acquire_async``).
+
+    Args:
+        maximum: la limite maximale (et initiale).
+        minimum: la limite minimale.
+        decrease: le facteur de diminution.
+        latency_target: la latence (secondes) au-delà de laquelle le service est considéré surchargé.
+    """
+
+    def __init__(self, maximum=DEFAULT_MAX_CONCURRENCY, minimum=1, decrease=0.5,
+                 latency_target=DEFAULT_LATENCY_TARGET):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.limit = float(maximum)
+        self.inflight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._async_condition = None
+
+    def _available(self):
+        return self.inflight < max(int(self.limit), self.minimum)
+
+    def _update(self, overloaded, latency):
+        now = time.monotonic()
+        if overloaded:
+            if now - self._last_decrease >= latency:
+                self.limit = max(self.limit * self.decrease, self.minimum)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.limit + 1 / self.limit, self.maximum)
+
+    def overloaded(self, status_code, latency):
+        """
+        Indique si une réponse signale une surcharge du service.
+        """
+        if status_code in OVERLOAD_STATUSES:
+            return True
+        return self.latency_target is not None and latency > self.latency_target
+
+    def acquire(self):
+        with self._condition:
+            self._condition.wait_for(self._available)
+            self.inflight += 1
+
+    def release(self, overloaded=False, latency=0.0):
+        with self._condition:
+            self.inflight -= 1
+            self._update(overloaded, latency)
+            self._condition.notify_all()
+
+    async def acquire_async(self):
+        if self._async_condition is None:
+            self._async_condition = asyncio.Condition()
+        async with self._async_condition:
+            await self._async_condition.wait_for(self._available)
+            self.inflight += 1
+
+    async def release_async(self, overloaded=False, latency=0.0):
+        async with self._async_condition:
+            self.inflight -= 1
+            self._update(overloaded, latency)
+            self._async_condition.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un endpoint : après ``failure_threshold`` échecs consécutifs
+    (erreur 5xx ou de transport), les requêtes échouent immédiatement pendant
+    ``reset_timeout`` secondes ; une seule requête d'essai est ensuite envoyée,
+    qui referme le disjoncteur si elle réussit.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """
+        Indique si une requête peut être envoyée (une seule à la fois en demi-ouverture).
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def release(self):
+        """
+        Libère la requête d'essai sans changer l'état : la requête a été interrompue
+        (annulation, exception inattendue) avant de réussir ou d'échouer.
+        """
+        with self._lock:
+            self._trial = False
+
+    def record(self, failed):
+        with self._lock:
+            self._trial = False
+            if not failed:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Resilience:
+    """
+    Politique de résilience partagée par les sessions d'un ``SessionPool``.
+
+    Elle regroupe, par endpoint (hôte, port et premier segment du chemin :
+    ``/compute``, ``/networking``...), une limite de concurrence AIMD et un
+    disjoncteur, ainsi que la politique de nouvelles tentatives : les méthodes
+    idempotentes sont rejouées après 429, 502, 503, 504 ou une erreur de
+    transport, avec un délai exponentiel aléatoire (« full jitter ») ou le
+    délai ``Retry-After`` du serveur. Un POST, comme l'ajout ou le retrait d'une
+    interface de routeur, n'est rejoué que sur 429 (requête refusée avant
+    traitement) ou vers Keystone (``/auth/tokens``).
+
+    Args:
+        retries: le nombre maximal de nouvelles tentatives (0 pour désactiver).
+        backoff: le délai de base (secondes) de la première nouvelle tentative.
+        max_backoff: le délai maximal entre deux tentatives.
+        max_concurrency: la limite maximale de requêtes simultanées par endpoint.
+        latency_target: la latence au-delà de laquelle la concurrence est réduite (None pour ignorer).
+        failure_threshold: le nombre d'échecs consécutifs qui ouvre le disjoncteur.
+        reset_timeout: la durée (secondes) d'ouverture du disjoncteur.
+        seed: la graine du générateur aléatoire des délais.
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, latency_target=DEFAULT_LATENCY_TARGET,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT, seed=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.random = random.Random(seed)
+        self.limiters = {}
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def endpoint(request):
+        """
+        Retourne la clé de l'endpoint d'une requête (hôte, port, premier segment du chemin).
+        """
+        url = request.url
+        return url.host, url.port, url.path.lstrip("/").split("/", 1)[0]
+
+    def limiter(self, key):
+        with self._lock:
+            if key not in self.limiters:
+                self.limiters[key] = AIMDLimiter(self.max_concurrency, latency_target=self.latency_target)
+            return self.limiters[key]
+
+    def breaker(self, key):
+        with self._lock:
+            if key not in self.breakers:
+                self.breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[key]
+
+    def retryable(self, request, status_code=None):
+        """
+        Indique si une requête peut être rejouée après ce statut (None : erreur de transport).
+        """
+        if status_code is not None and status_code not in RETRY_STATUSES:
+            return False
+        path = request.url.path
+        if request.method in IDEMPOTENT_METHODS and not path.endswith(NON_IDEMPOTENT_ACTIONS):
+            return True
+        if path.endswith("/auth/tokens"):
+            return True
+        return status_code == 429
+
+    def delay(self, attempt, response=None):
+        """
+        Retourne l'attente avant la tentative ``attempt + 1`` : ``Retry-After`` ou délai exponentiel aléatoire,
+        au plus ``max_backoff``.
+        """
+        if response is not None:
+            requested = retry_after(response)
+            if requested is not None:
+                return min(requested, self.max_backoff)
+        with self._lock:
+            return self.random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """
+    Transport httpx synchrone qui applique une politique ``Resilience`` autour d'un autre transport.
+    """
+
+    def __init__(self, transport, resilience):
+        self.transport = transport
+        self.resilience = resilience
+
+    def handle_request(self, request):
+        resilience = self.resilience
+        key = resilience.endpoint(request)
+        limiter, breaker = resilience.limiter(key), resilience.breaker(key)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit ouvert pour {request.url.host}/{key[2]}", request=request)
+            limiter.acquire()
+            started = time.monotonic()
+            response = failure = None
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                failure = e
+            finally:
+                latency = time.monotonic() - started
+                if response is not None:
+                    limiter.release(limiter.overloaded(response.status_code, latency), latency)
+                    breaker.record(failed=response.status_code in FAILURE_STATUSES)
+                elif failure is not None:
+                    limiter.release(overloaded=True, latency=latency)
+                    breaker.record(failed=True)
+                else:
+                    # requête interrompue : la place dans la limite et la requête d'essai sont libérées
+                    limiter.release(latency=latency)
+                    breaker.release()
+            if failure is not None:
+                if attempt >= resilience.retries or not resilience.retryable(request):
+                    raise failure
+                time.sleep(resilience.delay(attempt))
+                attempt += 1
+                continue
+
+            if attempt >= resilience.retries or not resilience.retryable(request, response.status_code):
+                return response
+            wait = resilience.delay(attempt, response)
+            response.close()
+            time.sleep(wait)
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Transport httpx asynchrone qui applique une politique ``Resilience`` autour d'un autre transport.
+    """
+
+    def __init__(self, transport, resilience):
+        self.transport = transport
+        self.resilience = resilience
+
+    async def handle_async_request(self, request):
+        resilience = self.resilience
+        key = resilience.endpoint(request)
+        limiter, breaker = resilience.limiter(key), resilience.breaker(key)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit ouvert pour {request.url.host}/{key[2]}", request=request)
+            await limiter.acquire_async()
+            started = time.monotonic()
+            response = failure = None
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                failure = e
+            finally:
+                latency = time.monotonic() - started
+                if response is not None:
+                    await limiter.release_async(limiter.overloaded(response.status_code, latency), latency)
+                    breaker.record(failed=response.status_code in FAILURE_STATUSES)
+                elif failure is not None:
+                    await limiter.release_async(overloaded=True, latency=latency)
+                    breaker.record(failed=True)
+                else:
+                    # requête interrompue : la place dans la limite et la requête d'essai sont libérées
+                    await limiter.release_async(latency=latency)
+                    breaker.release()
+            if failure is not None:
+                if attempt >= resilience.retries or not resilience.retryable(request):
+                    raise failure
+                await asyncio.sleep(resilience.delay(attempt))
+                attempt += 1
+                continue
+
+            if attempt >= resilience.retries or not resilience.retryable(request, response.status_code):
+                return response
+            wait = resilience.delay(attempt, response)
+            await response.aclose()
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    async def aclose(self):
+        await self.transport.aclose()
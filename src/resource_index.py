@@ -0,0 +1,132 @@
+import threading
+import time
+
+# durée de validité (secondes) d'une collection chargée dans l'index
+DEFAULT_TTL = 60
+
+# les images et les flavors changent rarement pendant une exécution
+DEFAULT_TTLS = {
+    "images": 3600,
+    "flavors": 3600,
+}
+
+
+class ResourceIndex:
+    """
+    Index en mémoire des ressources OpenStack d'une session.
+
+    Chaque type de ressource (``networks``, ``servers``, ``images``...) est
+    indexé par identifiant et par nom, ce qui rend les recherches O(1). Une
+    collection chargée reste valide ``ttl`` secondes ; le client met l'index à
+    jour lui-même quand il crée ou supprime une ressource, si bien que les
+    recherches répétées d'une même exécution ne coûtent aucun appel HTTP.
+
+    Args:
+        ttl: la durée de validité par défaut d'une collection, en secondes.
+        ttls: les durées de validité propres à certains types de ressources.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, ttls=None):
+        self.default_ttl = ttl
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+
+        self._by_id = {}
+        self._by_name = {}
+        self._loaded_at = {}
+        self._added_at = {}
+        self._lock = threading.RLock()
+
+    def ttl(self, kind):
+        return self.ttls.get(kind, self.default_ttl)
+
+    def is_fresh(self, kind, name=None):
+        """
+        Indique si la collection ``kind`` a été chargée depuis moins de ``ttl`` secondes.
+
+        Avec ``name``, la ressource de ce nom est aussi fraîche si elle a été
+        ajoutée (``add``) depuis moins de ``ttl`` secondes.
+        """
+        with self._lock:
+            loaded_at = self._loaded_at.get(kind)
+            if name is not None and name in self._by_name.get(kind, {}):
+                added_at = self._added_at.get(kind, {}).get(self._by_name[kind][name]["id"])
+                if added_at is not None and (loaded_at is None or added_at > loaded_at):
+                    loaded_at = added_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl(kind)
+
+    def load(self, kind, items):
+        """
+        Remplace le contenu de la collection ``kind`` par une liste complète de ressources.
+        """
+        by_id = {}
+        by_name = {}
+        for item in items:
+            by_id[item["id"]] = item
+            # en cas de doublon, le premier élément de la liste l'emporte
+            if item.get("name") is not None:
+                by_name.setdefault(item["name"], item)
+
+        with self._lock:
+            self._by_id[kind] = by_id
+            self._by_name[kind] = by_name
+            self._loaded_at[kind] = time.monotonic()
+            self._added_at[kind] = {}
+
+    def add(self, kind, item):
+        """
+        Ajoute (ou remplace) une ressource, par exemple après sa création.
+        """
+        with self._lock:
+            by_id = self._by_id.setdefault(kind, {})
+            by_name = self._by_name.setdefault(kind, {})
+            previous = by_id.get(item["id"])
+            if previous is not None and by_name.get(previous.get("name")) is previous:
+                del by_name[previous["name"]]
+            by_id[item["id"]] = item
+            self._added_at.setdefault(kind, {})[item["id"]] = time.monotonic()
+            if item.get("name") is not None:
+                by_name.setdefault(item["name"], item)
+
+    def remove(self, kind, resource_id):
+        """
+        Retire une ressource de l'index, par exemple après sa suppression.
+        """
+        with self._lock:
+            item = self._by_id.get(kind, {}).pop(resource_id, None)
+            self._added_at.get(kind, {}).pop(resource_id, None)
+            if item is None:
+                return
+            by_name = self._by_name.get(kind, {})
+            name = item.get("name")
+            if by_name.get(name) is item:
+                del by_name[name]
+                # une autre ressource du même nom peut prendre la place
+                for other in self._by_id[kind].values():
+                    if other.get("name") == name:
+                        by_name[name] = other
+                        break
+
+    def invalidate(self, kind=None):
+        """
+        Force le rechargement d'une collection (ou de toutes si ``kind`` est None).
+        """
+        with self._lock:
+            if kind is None:
+                self._loaded_at.clear()
+            else:
+                self._loaded_at.pop(kind, None)
+
+    def get(self, kind, resource_id):
+        with self._lock:
+            return self._by_id.get(kind, {}).get(resource_id)
+
+    def find(self, kind, name):
+        with self._lock:
+            return self._by_name.get(kind, {}).get(name)
+
+    def get_id(self, kind, name):
+        """
+        Retourne l'identifiant de la ressource ``name``, ou None si elle est inconnue.
+        """
+        item = self.find(kind, name)
+        return item["id"] if item is not None else None
@@ -0,0 +1,51 @@
+import re
+from collections import namedtuple
+
+# description d'une collection OpenStack :
+#   service_type : le type de service dans le catalogue
+#   path : le chemin de la collection
+#   key : la clé de la collection dans les réponses
+#   fields : le service accepte la projection ``fields=`` (Neutron)
+#   name_filter : le service accepte le filtre ``name=``
+ResourceType = namedtuple("ResourceType", "service_type path key fields name_filter")
+
+RESOURCES = {
+    "users": ResourceType("identity", "/users", "users", False, True),
+    "projects": ResourceType("identity", "/projects", "projects", False, True),
+    "networks": ResourceType("network", "/networks", "networks", True, True),
+    "subnets": ResourceType("network", "/subnets", "subnets", True, True),
+    "ports": ResourceType("network", "/ports", "ports", True, True),
+    "routers": ResourceType("network", "/routers", "routers", True, True),
+    "servers": ResourceType("compute", "/servers", "servers", False, True),
+    "server_details": ResourceType("compute", "/servers/detail", "servers", False, True),
+    "flavors": ResourceType("compute", "/flavors", "flavors", False, False),
+    "flavor_details": ResourceType("compute", "/flavors/detail", "flavors", False, False),
+    "images": ResourceType("image", "/images", "images", False, True),
+}
+
+
+def query_params(kind, filters=None, fields=None):
+    """
+    Construit les paramètres de requête d'une recherche côté serveur.
+
+    Args:
+        kind: le type de ressource (clé de ``RESOURCES``).
+        filters: les filtres ``{attribut: valeur}`` ; une liste de valeurs
+            donne un paramètre répété (``id=a&id=b``).
+        fields: les attributs à retourner (projection, Neutron seulement).
+
+    Returns:
+        Le dictionnaire des paramètres de requête.
+    """
+    resource = RESOURCES[kind]
+    params = {key: value for key, value in (filters or {}).items() if value is not None}
+
+    # Nova interprète le filtre ``name`` comme une expression régulière
+    if resource.service_type == "compute" and isinstance(params.get("name"), str):
+        params["name"] = f"^{re.escape(params['name'])}$"
+
+    if fields and resource.fields:
+        # l'identifiant sert de ``marker`` pour la pagination
+        params["fields"] = sorted(set(fields) | {"id"})
+
+    return params
@@ -0,0 +1,142 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_WORKERS = 4
+
+
+class GraphResult:
+    """
+    Résultat de l'exécution d'un ``TaskGraph``.
+
+    Attributes:
+        results: les valeurs retournées par les tâches réussies, par nom.
+        errors: les exceptions levées par les tâches en échec, par nom.
+        skipped: les tâches non exécutées car une de leurs dépendances a échoué.
+        timings: le début et la fin (``time.perf_counter``) de chaque tâche exécutée, par nom.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.skipped = set()
+        self.timings = {}
+
+    @property
+    def ok(self):
+        return not self.errors and not self.skipped
+
+
+class TaskGraph:
+    """
+    Graphe de tâches exécutées en parallèle selon leurs dépendances.
+
+    Une tâche est lancée dès que toutes ses dépendances ont réussi ; elle reçoit
+    leurs résultats en arguments, dans l'ordre de ``deps``. Les branches
+    indépendantes s'exécutent en parallèle (au plus ``max_workers`` à la fois),
+    et l'échec d'une tâche n'annule que les tâches qui en dépendent.
+
+    Exemple::
+
+        graph = TaskGraph()
+        graph.add("network", lambda: create_network("blue"))
+        graph.add("subnet", lambda network_id: create_subnet(network_id), deps=["network"])
+        result = graph.run(max_workers=4)
+    """
+
+    def __init__(self):
+        self.tasks = {}
+
+    def add(self, name, func, deps=()):
+        """
+        Ajoute une tâche au graphe.
+
+        Args:
+            name: le nom unique de la tâche.
+            func: la fonction à exécuter, appelée avec les résultats de ``deps``.
+            deps: les noms des tâches dont celle-ci dépend.
+        """
+        if name in self.tasks:
+            raise ValueError(f"La tâche {name} existe déjà")
+        self.tasks[name] = (func, tuple(deps))
+
+    def _dependents(self):
+        dependents = {name: [] for name in self.tasks}
+        for name, (_, deps) in self.tasks.items():
+            for dep in deps:
+                if dep not in self.tasks:
+                    raise ValueError(f"La tâche {name} dépend d'une tâche inconnue : {dep}")
+                dependents[dep].append(name)
+        return dependents
+
+    def _check_acyclic(self, dependents):
+        remaining = {name: len(deps) for name, (_, deps) in self.tasks.items()}
+        ready = [name for name, count in remaining.items() if count == 0]
+        visited = 0
+        while ready:
+            name = ready.pop()
+            visited += 1
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if visited != len(self.tasks):
+            raise ValueError("Le graphe de tâches contient un cycle")
+
+    def run(self, max_workers=DEFAULT_WORKERS):
+        """
+        Exécute toutes les tâches du graphe.
+
+        Args:
+            max_workers: le nombre maximal de tâches exécutées en même temps.
+
+        Returns:
+            Un ``GraphResult`` avec les résultats, les erreurs et les tâches ignorées.
+        """
+        dependents = self._dependents()
+        self._check_acyclic(dependents)
+
+        result = GraphResult()
+        remaining = {name: len(deps) for name, (_, deps) in self.tasks.items()}
+
+        def skip(name):
+            for dependent in dependents[name]:
+                if dependent not in result.skipped:
+                    result.skipped.add(dependent)
+                    skip(dependent)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+
+            def timed(name, func, args):
+                started = time.perf_counter()
+                try:
+                    return func(*args)
+                finally:
+                    result.timings[name] = (started, time.perf_counter())
+
+            def submit(name):
+                func, deps = self.tasks[name]
+                args = [result.results[dep] for dep in deps]
+                running[executor.submit(timed, name, func, args)] = name
+
+            for name, count in remaining.items():
+                if count == 0:
+                    submit(name)
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result.results[name] = future.result()
+                    except Exception as e:
+                        result.errors[name] = e
+                        skip(name)
+                        continue
+
+                    for dependent in dependents[name]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0 and dependent not in result.skipped:
+                            submit(dependent)
+
+        return result
@@ -2,27 +2,101 @@
 
 import typer
 from rich.progress import track
-import httpx
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.auth import REFRESH_MARGIN, AuthenticationError, TokenCache, TokenRefresher, auth_payload, parse_expires_at, token_body
+from src.catalog import ServiceCatalog, default_auth_url, default_endpoints
+from src.instrumentation import make_recorder, report
+from src.preflight import Demand, run_preflight
+from src.resilience import DEFAULT_MAX_CONCURRENCY, DEFAULT_RETRIES, Resilience
+from src.pagination import DEFAULT_PAGE_SIZE, iter_collection
+from src.resource_index import DEFAULT_TTL, ResourceIndex
+from src.resources import RESOURCES, query_params
+from src.scheduler import DEFAULT_WORKERS, TaskGraph
+from src.session import SessionPool, DEFAULT_MAX_CONNECTIONS, DEFAULT_TIMEOUT
+from src.snapshot import changes_since
 
 app = typer.Typer()
 
+# image et flavor des machines virtuelles de ``create_topology``
+TOPOLOGY_IMAGE = "cirros-0.5.2-x86_64-disk"
+TOPOLOGY_FLAVOR = "m1.tiny"
+
+# durée maximale (secondes) d'attente de la suppression d'une machine virtuelle
+DEFAULT_DELETE_TIMEOUT = 300.0
+
 
 # go to src/docker/containerized-devstack
 
+def _required(value, description):
+    """
+    Retourne ``value``, ou lève une erreur si la ressource n'a pas été trouvée.
+    """
+    if value is None:
+        raise RuntimeError(f"{description} introuvable")
+    return value
+
+
+def _nova_error(response):
+    """
+    Retourne le message d'une réponse d'erreur de Nova (``{"badRequest": {"message": ...}}``...).
+    """
+    try:
+        return next(iter(response.json().values()))["message"]
+    except (ValueError, StopIteration, KeyError, TypeError, AttributeError):
+        return f"Erreur HTTP {response.status_code} de Nova"
+
+
 class OpenStack:
-    def __init__(self, ip, port, name, username, password):
+    def __init__(self, ip, port, name, username, password, session=None, token_cache=None,
+                 auth_url=None, interface="public", region=None, index_ttl=DEFAULT_TTL,
+                 page_size=DEFAULT_PAGE_SIZE):
         self.ip = ip
         self.port = port
         self.username = username
         self.password = password
         self.name = name
 
+        # endpoints des services : catalogue Keystone, chemins DevStack par défaut sinon
+        self.auth_url = (auth_url or default_auth_url(ip, port)).rstrip("/")
+        self.interface = interface
+        self.region = region
+        self.catalog = None
+
+        # index des ressources par nom et identifiant, mis à jour à chaque création/suppression
+        self.index = ResourceIndex(ttl=index_ttl)
+
+        # taille des pages demandées lors du parcours des collections
+        self.page_size = page_size
+
+        # session HTTP partagée par toutes les requêtes (connexions persistantes)
+        self.session = session or SessionPool()
+
+        # cache persistant des tokens Keystone (désactivé si None)
+        self.token_cache = token_cache
+        self.token_expires_at = None
+        self._token_refresher = None
+
+        # identifiant du projet du token (quotas Neutron)
+        self.project_id = None
+
         self.token = self.auth_openstack()
 
-    def auth_openstack(self):
+    def auth_openstack(self, force=False):
         # Set the URL for the authentication API endpoint
-        url = f"http://{self.ip}:{self.port}/identity/v3/auth/tokens"
+        url = self.auth_url + "/auth/tokens"
+
+        # Reuse a cached token when it is still valid
+        cache_key = TokenCache.key(url, self.username, self.name)
+        if self.token_cache is not None and not force:
+            entry = self.token_cache.get(cache_key)
+            if entry is not None:
+                self.token_expires_at = entry["expires_at"]
+                self.project_id = entry.get("project_id")
+                self.catalog = self._build_catalog(entry.get("catalog"))
+                return entry["token"]
 
         # Set the headers for the API request
         headers = {
@@ -32,29 +106,157 @@ class OpenStack:
         print("Authentification à OpenStack...")
 
         # Set the body of the API request
-        data = {
-            "auth": {
-                "identity": {
-                    "methods": ["password"],
-                    "password": {
-                        "user": {
-                            "name": self.username,
-                            "domain": {"id": "default"},
-                            "password": self.password,
-                        }
-                    },
-                },
-                "scope": {"project": {"name": self.name, "domain": {"id": "default"}}},
-            }
-        }
+        data = auth_payload(self.username, self.password, self.name)
+
         # Send the API request and get the response
-        response = httpx.post(url, headers=headers, json=data)
+        response = self.session.post(url, headers=headers, json=data)
 
         if response.status_code != 201:
-            print("Erreur lors de l'authentification à OpenStack")
-            exit(1)
+            raise AuthenticationError(f"Erreur lors de l'authentification à OpenStack (HTTP {response.status_code})")
+
+        token = response.headers.get("X-Subject-Token")
+        body = token_body(response)
+        self.token_expires_at = parse_expires_at(body)
+        self.project_id = (body.get("token", {}).get("project") or {}).get("id")
+        self.catalog = self._build_catalog(body.get("token", {}).get("catalog"))
+
+        if self.token_cache is not None:
+            self.token_cache.set(cache_key, token, self.token_expires_at, catalog=self.catalog.entries,
+                                 project_id=self.project_id)
+
+        return token
+
+    def _build_catalog(self, entries):
+        fallback = default_endpoints(self.ip, self.port)
+        fallback["identity"] = self.auth_url
+        catalog = ServiceCatalog(entries, interface=self.interface, region=self.region, fallback=fallback)
+        # le catalogue permet à l'instrumentation d'attribuer chaque requête à son service
+        recorder = getattr(self.session, "recorder", None)
+        if recorder is not None:
+            recorder.catalog = catalog
+        return catalog
+
+    def url(self, service_type, path=""):
+        """
+        Retourne l'URL d'un chemin d'API à partir du catalogue des services.
+        Args:
+            service_type: le type de service (identity, compute, network, image).
+            path: le chemin relatif à l'endpoint du service.
+
+        Returns:
+            L'URL complète.
+        """
+        return self.catalog.url(service_type, path)
+
+    def start_token_refresh(self):
+        """
+        Renouvelle le token en arrière-plan avant son expiration (processus de longue durée).
+        """
+        def refresh():
+            self.token = self.auth_openstack(force=True)
+            return self.token_expires_at
+
+        margin = self.token_cache.margin if self.token_cache is not None else REFRESH_MARGIN
+        self._token_refresher = TokenRefresher(refresh, self.token_expires_at, margin=margin)
+        self._token_refresher.start()
+
+    def close(self):
+        """
+        Ferme les connexions HTTP ouvertes par le client.
+        """
+        if self._token_refresher is not None:
+            self._token_refresher.stop()
+        self.session.close()
+
+    def iter_resources(self, service_type, path, key, params=None, page_size=None):
+        """
+        Parcourt une collection page par page (``limit``/``marker`` et liens ``next``).
+        Args:
+            service_type: le type de service (identity, compute, network, image).
+            path: le chemin de la collection.
+            key: la clé de la collection dans la réponse.
+            params: les paramètres de requête (filtres).
+            page_size: le nombre d'éléments par page (taille du client par défaut).
+
+        Returns:
+            Un générateur des éléments de la collection.
+        """
+        return iter_collection(
+            self.session,
+            self.url(service_type, path),
+            key,
+            headers={"X-Auth-Token": self.token},
+            params=params,
+            page_size=self.page_size if page_size is None else page_size,
+        )
+
+    def query(self, kind, fields=None, page_size=None, **filters):
+        """
+        Recherche des ressources en laissant le serveur appliquer les filtres.
+        Args:
+            kind: le type de ressource (networks, subnets, ports, routers, servers, images...).
+            fields: les attributs à retourner (projection ``fields=``, Neutron seulement).
+            page_size: le nombre d'éléments par page.
+            filters: les filtres envoyés au serveur (``name=``, ``network_id=``, ``status=``...).
+
+        Returns:
+            Un générateur des ressources correspondantes.
+        """
+        resource = RESOURCES[kind]
+        # Keystone ne pagine pas ses collections
+        if resource.service_type == "identity":
+            page_size = 0
+        return self.iter_resources(
+            resource.service_type,
+            resource.path,
+            resource.key,
+            params=query_params(kind, filters, fields),
+            page_size=page_size,
+        )
+
+    def _find(self, kind, name, fields=None):
+        """
+        Cherche une ressource par nom : dans l'index, puis avec un filtre côté serveur.
+
+        Une ressource de l'index n'est retournée que si elle est fraîche (chargée ou
+        ajoutée depuis moins de ``ttl`` secondes) : une ressource supprimée ou
+        renommée hors du client n'est pas retournée au-delà du ``ttl``.
+        """
+        item = self.index.find(kind, name)
+        if self.index.is_fresh(kind, name):
+            return item
+        if item is not None:
+            # entrée périmée : retirée, puis relue ci-dessous
+            self.index.remove(kind, item["id"])
+
+        if not RESOURCES[kind].name_filter:
+            # collection sans filtre par nom : elle est chargée entièrement dans l'index
+            self.index.load(kind, self.query(kind))
+            return self.index.find(kind, name)
+
+        # le nom est vérifié localement au cas où le serveur ignorerait le filtre
+        item = next((item for item in self.query(kind, fields=fields, name=name) if item.get("name") == name), None)
+        if item is not None:
+            self.index.add(kind, item)
+        return item
+
+    def iter_users(self):
+        return self.query("users")
+
+    def iter_networks(self):
+        return self.query("networks")
 
-        return response.headers.get("X-Subject-Token")
+    def iter_vms(self):
+        return self.query("servers")
+
+    def iter_images(self):
+        return self.query("images")
+
+    def iter_flavors(self):
+        return self.query("flavors")
+
+    def iter_routers(self):
+        return self.query("routers")
 
     def list_users(self):
         """
@@ -63,19 +265,14 @@ class OpenStack:
         # requête pour récupérer la liste des utilisateurs
         print("Récupération de la liste des utilisateurs...")
         print(self.token)
-        url = f"http://{self.ip}:{self.port}/identity/v3/users"
-        headers = {"X-Auth-Token": self.token,
-                   "Content-Type": "application/json"}
-        response = httpx.get(url, headers=headers)
-        users = response.json()["users"]
-
-        if response.status_code != 200:
+        try:
+            users = list(self.iter_users())
+        except Exception:
             print("Erreur lors de la récupération de la liste des utilisateurs")
-            exit(1)
+            raise
 
         if len(users) == 0:
             print("Aucun utilisateur trouvé")
-            exit(1)
 
         print("Liste des utilisateurs :")
         for user in users:
@@ -95,22 +292,16 @@ class OpenStack:
         """
         # requête pour récupérer la liste des réseaux
         try:
-            networks_response = httpx.get(
-                f"http://{self.ip}:9696/networking/v2.0/networks.json", headers={"X-Auth-Token": self.token}
-            )
+            networks = {"networks": list(self.iter_networks())}
         except Exception:
             print("Erreur lors de la récupération de la liste des réseaux")
-            exit(1)
-
-        if networks_response.status_code != 200:
-            print("Erreur lors de la récupération de la liste des réseaux")
-            exit(1)
-
-        networks = networks_response.json()
+            raise
 
-        if len(networks) == 0:
+        if not networks["networks"]:
+            # un projet sans réseau n'est pas une erreur : la liste vide est retournée
             print("Aucun réseau trouvé")
-            exit(1)
+
+        self.index.load("networks", networks["networks"])
 
         typer.echo("Liste des réseaux :")
         for network in networks["networks"]:
@@ -155,8 +346,8 @@ class OpenStack:
             La liste des projets de l'instance OpenStack.
         """
         # requête pour récupérer la liste des projets
-        projects_response = httpx.get(
-            f"http://{self.ip}:{self.port}/identity/v3/projects", headers={"X-Auth-Token": self.token}
+        projects_response = self.session.get(
+            self.url("identity", "/projects"), headers={"X-Auth-Token": self.token}
         )
 
         projects = projects_response.json()
@@ -175,11 +366,9 @@ class OpenStack:
             La liste des machines virtuelles de l'instance OpenStack.
         """
         # requête pour récupérer la liste des machines virtuelles
-        vms_response = httpx.get(
-            f"http://{self.ip}:{self.port}/compute/v2.1/servers", headers={"X-Auth-Token": self.token}
-        )
+        vms = {"servers": list(self.iter_vms())}
+        self.index.load("servers", vms["servers"])
 
-        vms = vms_response.json()
         typer.echo("Liste des machines virtuelles :")
         if vms == []:
             typer.echo("Aucune machine virtuelle n'a été trouvée.")
@@ -199,11 +388,9 @@ class OpenStack:
             La liste des images de l'instance OpenStack.
         """
         # requête pour récupérer la liste des images
-        images_response = httpx.get(
-            f"http://{self.ip}:{self.port}/image/v2/images", headers={"X-Auth-Token": self.token}
-        )
+        images = {"images": list(self.iter_images())}
+        self.index.load("images", images["images"])
 
-        images = images_response.json()
         typer.echo("Liste des images :")
         for image in images['images']:
             typer.echo(image['name'])
@@ -219,11 +406,9 @@ class OpenStack:
             La liste des flavors de l'instance OpenStack.
         """
         # requête pour récupérer la liste des flavors
-        flavors_response = httpx.get(
-            f"http://{self.ip}:{self.port}/compute/v2.1/flavors", headers={"X-Auth-Token": self.token}
-        )
+        flavors = {"flavors": list(self.iter_flavors())}
+        self.index.load("flavors", flavors["flavors"])
 
-        flavors = flavors_response.json()
         typer.echo("Liste des flavors :")
         for flavor in flavors['flavors']:
             typer.echo(flavor['name'])
@@ -239,11 +424,9 @@ class OpenStack:
             La liste des routeurs de l'instance OpenStack.
         """
         # requête pour récupérer la liste des routeurs
-        routers_response = httpx.get(
-            f"http://{self.ip}:9696/networking/v2.0/routers", headers={"X-Auth-Token": self.token}
-        )
+        routers = {"routers": list(self.iter_routers())}
+        self.index.load("routers", routers["routers"])
 
-        routers = routers_response.json()
         typer.echo("Liste des routeurs :")
         for router in routers['routers']:
             typer.echo(router['name'])
@@ -263,14 +446,14 @@ class OpenStack:
         """
 
         # check if network already exists
-        for network in self.list_networks()["networks"]:
-            if network["name"] == name:
-                typer.echo(f"Le réseau {name} existe déjà.")
-                return network
+        network = self._find("networks", name)
+        if network is not None:
+            typer.echo(f"Le réseau {name} existe déjà.")
+            return network
 
         # requête pour créer un réseau
-        network_response = httpx.post(
-            f"http://{self.ip}:9696/networking/v2.0/networks",
+        network_response = self.session.post(
+            self.url("network", "/networks"),
             headers={"X-Auth-Token": self.token},
             json={
                 "network": {
@@ -279,6 +462,8 @@ class OpenStack:
             },
         )
         network = network_response.json()
+        if "network" in network:
+            self.index.add("networks", network["network"])
 
         typer.echo(f"Le réseau {name} a été créé avec succès.")
 
@@ -299,23 +484,81 @@ class OpenStack:
         """
 
         # requête pour créer un sous-réseau
-        subnet_response = httpx.put(
-            f"http://{self.ip}:9696/networking/v2.0/networks",
+        subnet_response = self.session.post(
+            self.url("network", "/subnets"),
             headers={"X-Auth-Token": self.token},
             json={
-                "network": {
-                    "ipv4_address_scope": cidr,
+                "subnet": {
+                    "name": name,
                     "network_id": network_id,
-                    "subnets": [name]
+                    "cidr": cidr,
+                    "ip_version": 4,
                 }
             },
         )
         subnet = subnet_response.json()
+        if "subnet" not in subnet:
+            typer.echo(f"Erreur lors de la création du sous-réseau {name}")
+            return subnet
+        self.index.add("subnets", subnet["subnet"])
 
         typer.echo(f"Le sous-réseau {name} a été créé avec succès.")
 
         return subnet
 
+    def create_networks(self, names):
+        """
+        Cette commande permet de créer plusieurs réseaux en une seule requête.
+
+        Les réseaux existants sont cherchés en une requête (filtre ``name``
+        répété) ; les autres sont créés par une création en lot de Neutron.
+        Args:
+            names: les noms des réseaux.
+
+        Returns:
+            Les réseaux (existants ou créés), par nom.
+        """
+        networks = {}
+        for network in self.query("networks", fields=["id", "name"], name=list(names)):
+            self.index.add("networks", network)
+            networks.setdefault(network["name"], network)
+
+        missing = [name for name in dict.fromkeys(names) if name not in networks]
+        for network in self.create_resources("networks", [{"name": name} for name in missing]):
+            networks[network["name"]] = network
+
+        typer.echo(f"{len(missing)} réseau(x) créé(s), {len(networks) - len(missing)} existant(s).")
+
+        return networks
+
+    def create_subnets(self, subnets):
+        """
+        Cette commande permet de créer plusieurs sous-réseaux en une seule requête.
+        Args:
+            subnets: les sous-réseaux ``{"name", "cidr", "network_id"}`` (les autres attributs
+                de Neutron sont transmis tels quels).
+
+        Returns:
+            Les sous-réseaux créés.
+        """
+        subnets = [dict({"ip_version": 4}, **subnet) for subnet in subnets]
+        created = self.create_resources("subnets", subnets)
+
+        typer.echo(f"{len(created)} sous-réseau(x) créé(s).")
+
+        return created
+
+    def create_ports(self, ports):
+        """
+        Cette commande permet de créer plusieurs ports en une seule requête.
+        Args:
+            ports: les ports ``{"network_id", ...}`` (``name``, ``fixed_ips``, ``device_id``...).
+
+        Returns:
+            Les ports créés.
+        """
+        return self.create_resources("ports", ports)
+
     def create_router(self, name, external_network_id, subnet_id):
         """
         Cette commande permet de créer un routeur dans une instance OpenStack.
@@ -330,14 +573,14 @@ class OpenStack:
             Le routeur créé.
         """
         # routeur déjà existant
-        for router in self.list_routers()["routers"]:
-            if router["name"] == name:
-                typer.echo(f"Le routeur {name} existe déjà.")
-                return router
+        router = self._find("routers", name)
+        if router is not None:
+            typer.echo(f"Le routeur {name} existe déjà.")
+            return router
 
         # requête pour créer un routeur
-        router_response = httpx.post(
-            f"http://{self.ip}:9696/networking/v2.0/routers",
+        router_response = self.session.post(
+            self.url("network", "/routers"),
             headers={"X-Auth-Token": self.token},
             json={
                 "router": {
@@ -354,11 +597,12 @@ class OpenStack:
             },
         )
         router = router_response.json()
+        self.index.add("routers", router["router"])
 
         # requête pour attacher un sous-réseau au routeur
         print(router)
-        httpx.put(
-            f"http://{self.ip}:9696/networking/v2.0/routers/{router['router']['id']}/add_router_interface",
+        self.session.put(
+            self.url("network", f"/routers/{router['router']['id']}/add_router_interface"),
             headers={"X-Auth-Token": self.token},
             json={"subnet_id": subnet_id},
         )
@@ -367,7 +611,7 @@ class OpenStack:
 
         return router
 
-    def create_vm(self, name, image_id, flavor_id, network_id):
+    def create_vm(self, name, image_id, flavor_id, network_id, metadata=None):
         """
         Cette commande permet de créer une machine virtuelle dans une instance OpenStack.
         Args:
@@ -377,22 +621,25 @@ class OpenStack:
             image_id: l'identifiant de l'image à utiliser pour la machine virtuelle.
             flavor_id: l'identifiant du type de machine virtuelle à créer.
             network_id: l'identifiant du réseau dans lequel créer la machine virtuelle.
+            metadata: les métadonnées de la machine virtuelle.
 
         Returns:
             La machine virtuelle créée.
         """
+        server = {
+            "name": name,
+            "imageRef": image_id,
+            "flavorRef": flavor_id,
+            "networks": [{"uuid": network_id}],
+        }
+        if metadata:
+            server["metadata"] = metadata
+
         # requête pour créer une machine virtuelle
-        vm_response = httpx.post(
-            f"http://{self.ip}:{self.port}/compute/v2.1/servers",
+        vm_response = self.session.post(
+            self.url("compute", "/servers"),
             headers={"X-Auth-Token": self.token},
-            json={
-                "server": {
-                    "name": name,
-                    "imageRef": image_id,
-                    "flavorRef": flavor_id,
-                    "networks": [{"uuid": network_id}],
-                }
-            },
+            json={"server": server},
         )
         vm = vm_response.json()
 
@@ -401,10 +648,148 @@ class OpenStack:
             typer.echo(vm["badRequest"]["message"])
             return vm
 
+        # la réponse de Nova ne contient pas le nom de la machine virtuelle
+        self.index.add("servers", dict(vm["server"], name=name))
+
         typer.echo(f"La machine virtuelle {name} a été créée avec succès.")
 
         return vm
 
+    def boot_vms(self, name, image_id, flavor_id, network_id, count, metadata=None):
+        """
+        Cette commande permet de créer plusieurs machines virtuelles identiques en une seule requête.
+
+        La requête utilise la création multiple de Nova (``min_count``/``max_count``) ;
+        Nova nomme les machines ``<name>-1`` à ``<name>-<count>``.
+        Args:
+            name: le nom de base des machines virtuelles.
+            image_id: l'identifiant de l'image.
+            flavor_id: l'identifiant du type de machine virtuelle.
+            network_id: l'identifiant du réseau.
+            count: le nombre de machines virtuelles à créer.
+            metadata: les métadonnées des machines virtuelles.
+
+        Returns:
+            Les identifiants des machines virtuelles créées.
+        """
+        server = {
+            "name": name,
+            "imageRef": image_id,
+            "flavorRef": flavor_id,
+            "networks": [{"uuid": network_id}],
+            "min_count": count,
+            "max_count": count,
+            "return_reservation_id": True,
+        }
+        if metadata:
+            server["metadata"] = metadata
+
+        vm_response = self.session.post(
+            self.url("compute", "/servers"),
+            headers={"X-Auth-Token": self.token},
+            json={"server": server},
+        )
+        if vm_response.is_error:
+            raise RuntimeError(_nova_error(vm_response))
+        body = vm_response.json()
+
+        # les serveurs d'une même requête partagent le même identifiant de réservation
+        servers = list(self.query("servers", reservation_id=body["reservation_id"]))
+        for server in servers:
+            self.index.add("servers", server)
+
+        # identifiants dans l'ordre des noms ``<name>-1`` à ``<name>-<count>``
+        position = {f"{name}-{i}": i for i in range(1, count + 1)}
+        servers.sort(key=lambda server: position.get(server.get("name"), count + 1))
+
+        typer.echo(f"{len(servers)} machines virtuelles {name} ont été créées avec succès.")
+
+        return [server["id"] for server in servers]
+
+    def create_vms(self, specs, max_workers=DEFAULT_WORKERS):
+        """
+        Cette commande permet de créer un lot de machines virtuelles.
+
+        Les demandes qui partagent l'image, la flavor et le réseau sont regroupées
+        et créées par une seule requête multiple, quel que soit leur nom ; les
+        machines dont le nom donné par Nova (``<nom>-<i>``) ne correspond pas à
+        la demande sont ensuite renommées. Les groupes sont créés en parallèle.
+        Args:
+            specs: les demandes ``{"name", "image_id", "flavor_id", "network_id", "count"}``
+                (``count`` vaut 1 par défaut ; plusieurs machines d'une demande sont
+                nommées ``<name>-1`` à ``<name>-<count>``).
+            max_workers: le nombre maximal de requêtes envoyées en parallèle.
+
+        Returns:
+            Les identifiants des machines virtuelles créées, par nom demandé.
+        """
+        groups = {}
+        for spec in specs:
+            key = (spec["image_id"], spec["flavor_id"], spec["network_id"])
+            groups.setdefault(key, []).append((spec["name"], spec.get("count", 1)))
+
+        def boot(key, requests):
+            image_id, flavor_id, network_id = key
+            # la demande la plus nombreuse donne son nom à la requête : ses machines ne sont pas renommées
+            requests = sorted(requests, key=lambda request: -request[1])
+            names = [(name, f"{name}-{i}" if count > 1 else name)
+                     for name, count in requests for i in range(1, count + 1)]
+            if len(names) == 1:
+                vm = self.create_vm(names[0][1], image_id, flavor_id, network_id)
+                if "server" not in vm:
+                    raise RuntimeError(f"Échec de la création de la machine virtuelle {names[0][1]}")
+                return [(names[0][0], vm["server"]["id"])]
+
+            base = requests[0][0]
+            server_ids = self.boot_vms(base, image_id, flavor_id, network_id, len(names))
+            for i, ((_, wanted), server_id) in enumerate(zip(names, server_ids), 1):
+                if wanted != f"{base}-{i}":
+                    self.update_resource("servers", server_id, {"name": wanted})
+            return [(name, server_id) for (name, _), server_id in zip(names, server_ids)]
+
+        created = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(boot, key, requests): requests for key, requests in groups.items()}
+            for future, requests in futures.items():
+                try:
+                    for name, server_id in future.result():
+                        created.setdefault(name, []).append(server_id)
+                except Exception as e:
+                    names = ", ".join(name for name, _ in requests)
+                    print(f"Erreur lors de la création des machines virtuelles {names} : {e}")
+
+        return created
+
+    def get_limits(self):
+        """
+        Cette commande permet de récupérer les limites et la consommation du projet dans Nova.
+
+        Returns:
+            Les limites absolues (``maxTotalInstances``, ``totalInstancesUsed``,
+            ``maxTotalCores``, ``maxTotalRAMSize``... ; -1 pour illimité).
+        """
+        response = self.session.get(self.url("compute", "/limits"), headers={"X-Auth-Token": self.token})
+        response.raise_for_status()
+        return response.json()["limits"]["absolute"]
+
+    def get_network_quotas(self):
+        """
+        Cette commande permet de récupérer les quotas Neutron du projet et leur consommation.
+
+        Returns:
+            Les quotas par ressource (``network``, ``subnet``, ``port``, ``router``...) :
+            ``{"limit", "used", "reserved"}`` (limite -1 pour illimité).
+        """
+        if self.project_id is None:
+            # token mis en cache par une version qui ne conservait pas le projet
+            self.token = self.auth_openstack(force=True)
+        response = self.session.get(
+            self.url("network", f"/quotas/{self.project_id}/details"),
+            headers={"X-Auth-Token": self.token},
+        )
+        response.raise_for_status()
+        return response.json()["quota"]
+
     def get_image_id(self, image_name):
         """
         Cette commande permet de récupérer l'identifiant d'une image.
@@ -416,14 +801,8 @@ class OpenStack:
         Returns:
             L'identifiant de l'image.
         """
-        # requête pour récupérer la liste des images
-        images_response = httpx.get(
-            f"http://{self.ip}:{self.port}/image/v2/images", headers={"X-Auth-Token": self.token}
-        )
-        images = images_response.json()
-        for image in images["images"]:
-            if image["name"] == image_name:
-                return image["id"]
+        image = self._find("images", image_name)
+        return image["id"] if image is not None else None
 
     def get_flavor_id(self, flavor_name):
         """
@@ -436,14 +815,8 @@ class OpenStack:
         Returns:
             L'identifiant du type de machine virtuelle.
         """
-        # requête pour récupérer la liste des types de machine virtuelle
-        flavors_response = httpx.get(
-            f"http://{self.ip}:{self.port}/compute/v2.1/flavors", headers={"X-Auth-Token": self.token}
-        )
-        flavors = flavors_response.json()
-        for flavor in flavors["flavors"]:
-            if flavor["name"] == flavor_name:
-                return flavor["id"]
+        flavor = self._find("flavors", flavor_name)
+        return flavor["id"] if flavor is not None else None
 
     def get_network_id(self, network_name):
         """
@@ -456,14 +829,8 @@ class OpenStack:
         Returns:
             L'identifiant du réseau.
         """
-        # requête pour récupérer la liste des réseaux
-        networks_response = httpx.get(
-            f"http://{self.ip}:9696/networking/v2.0/networks", headers={"X-Auth-Token": self.token}
-        )
-        networks = networks_response.json()
-        for network in networks["networks"]:
-            if network["name"] == network_name:
-                return network["id"]
+        network = self._find("networks", network_name, fields=["id", "name"])
+        return network["id"] if network is not None else None
 
     def get_subnet_id(self, network_id):
         """
@@ -471,15 +838,13 @@ class OpenStack:
         Args:
             ip: l'adresse IP de l'instance OpenStack.
             token: le token d'authentification de l'instance OpenStack.
-            subnet_name: le nom du sous-réseau.
+            network_id: l'identifiant du réseau du sous-réseau.
 
         Returns:
-            L'identifiant du sous-réseau.
+            L'identifiant du premier sous-réseau du réseau.
         """
-        subnets_obj = self.list_subnets()
-        for network in subnets_obj:
-            if network["network_id"] == network_id:
-                return network["subnets"][0]
+        subnet = next(self.query("subnets", fields=["id"], network_id=network_id), None)
+        return subnet["id"] if subnet is not None else None
 
     def get_vm_id(self, vm_name):
         """
@@ -492,14 +857,8 @@ class OpenStack:
         Returns:
             L'identifiant de la machine virtuelle.
         """
-        # requête pour récupérer la liste des machines virtuelles
-        vms_response = httpx.get(
-            f"http://{self.ip}:{self.port}/compute/v2.1/servers", headers={"X-Auth-Token": self.token}
-        )
-        vms = vms_response.json()
-        for vm in vms["servers"]:
-            if vm["name"] == vm_name:
-                return vm["id"]
+        vm = self._find("servers", vm_name)
+        return vm["id"] if vm is not None else None
 
     def get_vm_ip(self, vm_id):
         """
@@ -513,8 +872,8 @@ class OpenStack:
             L'adresse IP de la machine virtuelle.
         """
         # requête pour récupérer les informations d'une machine virtuelle
-        vm_response = httpx.get(
-            f"http://{self.ip}:{self.port}/compute/v2.1/servers/{vm_id}",
+        vm_response = self.session.get(
+            self.url("compute", f"/servers/{vm_id}"),
             headers={"X-Auth-Token": self.token},
         )
         vm = vm_response.json()
@@ -531,14 +890,187 @@ class OpenStack:
         Returns:
             L'identifiant du routeur.
         """
-        # requête pour récupérer la liste des routeurs
-        routers_response = httpx.get(
-            f"http://{self.ip}:9696/networking/v2.0/routers", headers={"X-Auth-Token": self.token}
+        router = self._find("routers", router_name, fields=["id", "name"])
+        return router["id"] if router is not None else None
+
+    def delete_vm(self, vm_id):
+        """
+        Cette commande permet de supprimer une machine virtuelle.
+        Args:
+            vm_id: l'identifiant de la machine virtuelle.
+        """
+        self.session.delete(self.url("compute", f"/servers/{vm_id}"), headers={"X-Auth-Token": self.token})
+        self.index.remove("servers", vm_id)
+
+    def delete_router(self, router_id):
+        """
+        Cette commande permet de supprimer un routeur.
+        Args:
+            router_id: l'identifiant du routeur.
+        """
+        self.session.delete(self.url("network", f"/routers/{router_id}"), headers={"X-Auth-Token": self.token})
+        self.index.remove("routers", router_id)
+
+    def delete_subnet(self, subnet_id):
+        """
+        Cette commande permet de supprimer un sous-réseau.
+        Args:
+            subnet_id: l'identifiant du sous-réseau.
+        """
+        self.session.delete(self.url("network", f"/subnets/{subnet_id}"), headers={"X-Auth-Token": self.token})
+
+    def delete_network(self, network_id):
+        """
+        Cette commande permet de supprimer un réseau.
+        Args:
+            network_id: l'identifiant du réseau.
+        """
+        self.session.delete(self.url("network", f"/networks/{network_id}"), headers={"X-Auth-Token": self.token})
+        self.index.remove("networks", network_id)
+
+    def create_resource(self, kind, attributes):
+        """
+        Crée une ressource d'une collection (``POST <collection>``) et l'ajoute à l'index.
+        Args:
+            kind: le type de ressource (networks, subnets, routers, servers...).
+            attributes: les attributs de la ressource.
+
+        Returns:
+            La ressource créée.
+        """
+        resource = RESOURCES[kind]
+        singular = resource.key[:-1]
+        response = self.session.post(
+            self.url(resource.service_type, resource.path),
+            headers={"X-Auth-Token": self.token},
+            json={singular: attributes},
+        )
+        response.raise_for_status()
+        # Nova ne retourne pas tous les attributs demandés (le nom par exemple)
+        item = dict(attributes, **response.json()[singular])
+        self.index.add(kind, item)
+        return item
+
+    def create_resources(self, kind, items):
+        """
+        Crée plusieurs ressources Neutron d'une même collection en une seule requête
+        (``POST <collection>`` avec la clé au pluriel) et les ajoute à l'index.
+
+        Neutron crée le lot entièrement ou pas du tout, et retourne les ressources
+        dans l'ordre de la demande.
+        Args:
+            kind: le type de ressource (networks, subnets ou ports).
+            items: les attributs des ressources.
+
+        Returns:
+            Les ressources créées.
+        """
+        items = list(items)
+        if not items:
+            return []
+        resource = RESOURCES[kind]
+        if resource.service_type != "network":
+            raise ValueError(f"La création en lot n'est pas possible pour {kind}")
+        response = self.session.post(
+            self.url(resource.service_type, resource.path),
+            headers={"X-Auth-Token": self.token},
+            json={resource.key: items},
+        )
+        response.raise_for_status()
+        created = response.json()[resource.key]
+        for item in created:
+            self.index.add(kind, item)
+        return created
+
+    def update_resource(self, kind, resource_id, attributes):
+        """
+        Modifie les attributs d'une ressource (``PUT <collection>/<id>``).
+        Args:
+            kind: le type de ressource.
+            resource_id: l'identifiant de la ressource.
+            attributes: les attributs à modifier.
+
+        Returns:
+            La ressource modifiée.
+        """
+        resource = RESOURCES[kind]
+        singular = resource.key[:-1]
+        response = self.session.put(
+            self.url(resource.service_type, f"{resource.path}/{resource_id}"),
+            headers={"X-Auth-Token": self.token},
+            json={singular: attributes},
+        )
+        response.raise_for_status()
+        item = response.json()[singular]
+        self.index.add(kind, item)
+        return item
+
+    def delete_resource(self, kind, resource_id):
+        """
+        Supprime une ressource (``DELETE <collection>/<id>``) ; une ressource déjà absente est ignorée.
+        Args:
+            kind: le type de ressource.
+            resource_id: l'identifiant de la ressource.
+        """
+        resource = RESOURCES[kind]
+        response = self.session.delete(
+            self.url(resource.service_type, f"{resource.path}/{resource_id}"),
+            headers={"X-Auth-Token": self.token},
+        )
+        if response.status_code != 404:
+            response.raise_for_status()
+        self.index.remove(kind, resource_id)
+
+    def wait_for_deletion(self, server_ids, since=None, timeout=DEFAULT_DELETE_TIMEOUT, max_interval=2.0):
+        """
+        Attend la disparition de machines virtuelles dont la suppression est asynchrone.
+
+        Nova répond à ``DELETE`` avant d'avoir supprimé le serveur et libéré ses
+        ports ; le sous-réseau et le réseau ne peuvent être supprimés qu'ensuite.
+        Chaque lecture est une seule liste ``changes-since``, quel que soit le
+        nombre de serveurs : Nova y retourne les serveurs supprimés avec le statut
+        ``DELETED``, et un serveur absent de la liste n'existe plus. Les lectures
+        ont un intervalle croissant (0,1 s, doublé jusqu'à ``max_interval``).
+        Args:
+            server_ids: les identifiants des machines virtuelles supprimées.
+            since: la valeur ``changes-since`` antérieure aux suppressions (par défaut, maintenant moins une marge).
+            timeout: la durée maximale d'attente, en secondes.
+            max_interval: l'intervalle maximal entre deux lectures.
+        """
+        pending = set(server_ids)
+        since = since or changes_since(time.time())
+        deadline = time.monotonic() + timeout
+        interval = 0.1
+        while pending:
+            present = {server["id"] for server in self.query("server_details", **{"changes-since": since})
+                       if server.get("status") != "DELETED"}
+            pending &= present
+            if not pending:
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"machine(s) virtuelle(s) {', '.join(sorted(pending))} toujours présente(s) "
+                                   f"après {timeout:g} s")
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            interval = min(interval * 2, max_interval)
+
+    def router_interface(self, router_id, subnet_id, action="add"):
+        """
+        Attache (``add``) ou détache (``remove``) un sous-réseau d'un routeur.
+        Args:
+            router_id: l'identifiant du routeur.
+            subnet_id: l'identifiant du sous-réseau.
+            action: ``add`` ou ``remove``.
+
+        Returns:
+            La description de l'interface retournée par Neutron.
+        """
+        response = self.session.put(
+            self.url("network", f"/routers/{router_id}/{action}_router_interface"),
+            headers={"X-Auth-Token": self.token},
+            json={"subnet_id": subnet_id},
         )
-        routers = routers_response.json()
-        for router in routers["routers"]:
-            if router["name"] == router_name:
-                return router["id"]
+        response.raise_for_status()
+        return response.json()
 
     def create_topology(self,
                         blue_network_name,
@@ -553,7 +1085,8 @@ class OpenStack:
                         public_subnet_name,
                         public_subnet_cidr,
                         public_vm3_name,
-                        router_name
+                        router_name,
+                        max_workers=DEFAULT_WORKERS,
                         ):
         """
         Cette commande permet de créer une topologie avec 2 réseaux, 2 sous-réseaux, 2 machines virtuelles et 1 routeur.
@@ -571,79 +1104,80 @@ class OpenStack:
             public_subnet_cidr: le CIDR du sous-réseau public.
             public_vm3_name: le nom de la machine virtuelle publique.
             router_name: le nom du routeur.
+            max_workers: le nombre maximal de ressources créées en parallèle.
 
         Returns:
-            La topologie créée.
+            Le résultat de l'exécution du graphe de création (identifiants par tâche).
         """
 
-        print("Creating networks...")
-
-        # # Create blue network
-        print("Created blue network")
-        self.create_network(blue_network_name)
-        blue_network_id = self.get_network_id(blue_network_name)
-        print("Created blue network")
-
-        # Create blue subnet
-        print("Created blue subnet")
-        self.create_subnet(blue_subnet_name, blue_subnet_cidr, blue_network_id)
-        blue_subnet_id = self.get_subnet_id(blue_subnet_name)
-
-        # Create red network
-        print("Created red network")
-        self.create_network(red_network_name)
-        red_network_id = self.get_network_id(red_network_name)
-        print("Created red network")
-
-        # Create red subnet
-        print("Created red subnet")
-        red_subnet_id = self.create_subnet(red_subnet_name, red_subnet_cidr, red_network_id)
-        print("Created red subnet")
-
-        # Create public network
-        print("Created public network")
-        self.create_network("public")
-        public_network_id = self.get_network_id("public")
-        print("Created public network")
-
-        # Create public subnet
-        print("Created public subnet")
-        subnet = self.create_subnet("public", "0.0.0.0/24", public_network_id)
-        public_subnet_id = self.get_subnet_id(public_network_id)
-        print("Created public subnet")
-
-        print("Creating router...")
-        # Create router
-        print("Created router")
-        self.create_router(router_name, public_network_id, public_subnet_id)
-        router_id = self.get_router_id(router_name)
-        print("Created router")
-
-        print("Creating VMs...")
-
         # Create instance
-        image_name = 'cirros-0.5.2-x86_64-disk'
-        flavor_name = 'm1.tiny'
-        network_name = 'private'
-
-        print("Created blue VM")
-        self.create_vm(blue_vm1_name, self.get_image_id(image_name), self.get_flavor_id(flavor_name), blue_network_id)
-        blue_vm_id = self.get_vm_id(blue_vm1_name)
-        print("Created blue VM")
+        image_name = TOPOLOGY_IMAGE
+        flavor_name = TOPOLOGY_FLAVOR
 
-        # Create red VM
-        print("Created red VM")
-        self.create_vm(blue_vm1_name, self.get_image_id(image_name), self.get_flavor_id(flavor_name), red_network_id)
-        red_vm_id = self.get_vm_id(blue_vm1_name)
-        print("Created red VM")
-
-        # Create public VM
-        print("Created public VM")
-        self.create_vm("public", self.get_image_id(image_name), self.get_flavor_id(flavor_name), public_network_id)
-        public_vm_id = self.get_vm_id("public")
-        print("Created public VM")
+        branches = {
+            "blue": (blue_network_name, blue_subnet_name, blue_subnet_cidr, blue_vm1_name),
+            "red": (red_network_name, red_subnet_name, red_subnet_cidr, red_vm2_name),
+            "public": (public_network_name, public_subnet_name, public_subnet_cidr, public_vm3_name),
+        }
 
-        print("Created topology")
+        def networks_task():
+            # les trois réseaux en une requête de recherche et une création en lot
+            networks = self.create_networks([network_name for network_name, _, _, _ in branches.values()])
+            print("Created networks")
+            return {color: _required(networks.get(network_name), f"Réseau {network_name}")["id"]
+                    for color, (network_name, _, _, _) in branches.items()}
+
+        def subnets_task(network_ids):
+            # un seul sous-réseau par réseau : seuls les réseaux sans sous-réseau en reçoivent un
+            subnet_ids = {}
+            for subnet in self.query("subnets", fields=["id", "network_id"], network_id=list(network_ids.values())):
+                subnet_ids.setdefault(subnet["network_id"], subnet["id"])
+            missing = [color for color, network_id in network_ids.items() if network_id not in subnet_ids]
+            created = self.create_subnets([
+                {"name": branches[color][1], "cidr": branches[color][2], "network_id": network_ids[color]}
+                for color in missing
+            ])
+            for subnet in created:
+                subnet_ids[subnet["network_id"]] = subnet["id"]
+            print("Created subnets")
+            return {color: subnet_ids[network_id] for color, network_id in network_ids.items()}
+
+        def vm_task(color):
+            vm_name = branches[color][3]
+
+            def create(image_id, flavor_id, network_ids, subnet_ids):
+                self.create_vm(vm_name, image_id, flavor_id, network_ids[color])
+                print(f"Created {vm_name} VM")
+                return _required(self.get_vm_id(vm_name), f"Machine virtuelle {vm_name}")
+            return create
+
+        def router_task(network_ids, subnet_ids):
+            self.create_router(router_name, network_ids["public"], subnet_ids["public"])
+            print("Created router")
+            return _required(self.get_router_id(router_name), f"Routeur {router_name}")
+
+        # Les réseaux puis les sous-réseaux sont créés en lot (une requête chacun) ;
+        # les machines virtuelles, le routeur et les recherches de l'image et du
+        # flavor s'exécutent en parallèle.
+        graph = TaskGraph()
+        graph.add("image", lambda: _required(self.get_image_id(image_name), f"Image {image_name}"))
+        graph.add("flavor", lambda: _required(self.get_flavor_id(flavor_name), f"Flavor {flavor_name}"))
+        graph.add("networks", networks_task)
+        graph.add("subnets", subnets_task, deps=["networks"])
+        for color in branches:
+            graph.add(f"{color}_vm", vm_task(color), deps=["image", "flavor", "networks", "subnets"])
+        graph.add("router", router_task, deps=["networks", "subnets"])
+
+        result = graph.run(max_workers=max_workers)
+
+        for name, error in result.errors.items():
+            print(f"Erreur lors de la tâche {name} : {error}")
+        for name in sorted(result.skipped):
+            print(f"Tâche {name} annulée (dépendance en échec)")
+
+        print("Created topology" if result.ok else "Topology partially created")
+
+        return result
 
 
 @app.command(
@@ -686,6 +1220,38 @@ def create_topology(
         "public_vm3", help="Name of the second blue VM", show_default=True),
     router_name: str = typer.Argument(
         "router", help="Name of the router", show_default=True),
+    pool_size: int = typer.Option(
+        DEFAULT_MAX_CONNECTIONS, help="Maximum HTTP connections per endpoint", show_default=True),
+    timeout: float = typer.Option(
+        DEFAULT_TIMEOUT, help="HTTP timeout in seconds", show_default=True),
+    http2: bool = typer.Option(
+        False, help="Use HTTP/2 (requires the h2 package)", show_default=True),
+    token_cache: bool = typer.Option(
+        True, help="Reuse cached Keystone tokens across runs", show_default=True),
+    auth_url: str = typer.Option(
+        None, help="Keystone URL (defaults to http://IP:PORT/identity/v3)", envvar="OS_AUTH_URL"),
+    interface: str = typer.Option(
+        "public", help="Service catalog interface", envvar="OS_INTERFACE", show_default=True),
+    region: str = typer.Option(
+        None, help="Service catalog region", envvar="OS_REGION_NAME"),
+    cache_ttl: float = typer.Option(
+        DEFAULT_TTL, help="Seconds a listed collection is reused for name lookups", show_default=True),
+    page_size: int = typer.Option(
+        DEFAULT_PAGE_SIZE, help="Number of items requested per page when listing", show_default=True),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, help="Maximum number of resources provisioned concurrently", show_default=True),
+    timings: bool = typer.Option(
+        False, help="Print request count and p50/p95/max latency per endpoint at the end", show_default=True),
+    metrics_file: str = typer.Option(
+        None, help="Write the request metrics to this Prometheus textfile"),
+    trace_file: str = typer.Option(
+        None, help="Write every request to this JSON trace (chrome://tracing, Perfetto)"),
+    retries: int = typer.Option(
+        DEFAULT_RETRIES, help="Retries of idempotent requests on 429/5xx and network errors", show_default=True),
+    max_concurrency: int = typer.Option(
+        DEFAULT_MAX_CONCURRENCY, help="Maximum concurrent requests per service (adaptive)", show_default=True),
+    skip_preflight: bool = typer.Option(
+        False, help="Skip the quota, image and flavor check before provisioning", show_default=True),
 ):
     """
     Cette commande permet de créer une topologie avec 2 réseaux, 2 sous-réseaux, 2 machines virtuelles et 1 routeur.
@@ -708,9 +1274,36 @@ def create_topology(
         public_subnet_cidr: le CIDR du sous-réseau public.
         public_vm3_name: le nom de la machine virtuelle public.
         router_name: le nom du routeur.
+        pool_size: le nombre maximal de connexions HTTP par endpoint.
+        timeout: le délai maximal d'une requête HTTP, en secondes.
+        http2: utilise HTTP/2 pour les sessions.
+        token_cache: réutilise les tokens Keystone mis en cache entre deux exécutions.
+        auth_url: l'URL de Keystone.
+        interface: l'interface des endpoints du catalogue (public, internal, admin).
+        region: la région des endpoints du catalogue.
+        cache_ttl: la durée de validité (secondes) de l'index des ressources.
+        page_size: le nombre d'éléments demandés par page.
+        workers: le nombre maximal de ressources créées en parallèle.
+        timings: affiche les statistiques des requêtes par endpoint.
+        metrics_file: le fichier de métriques Prometheus à écrire.
+        trace_file: le fichier de trace JSON à écrire.
+        retries: le nombre maximal de nouvelles tentatives d'une requête.
+        max_concurrency: le nombre maximal de requêtes simultanées par service.
+        skip_preflight: ne vérifie pas les quotas, l'image et le flavor avant la création.
         """
-    openstack = OpenStack(openstack_ip, openstack_port,
-                          project_name, username, password)
+    recorder = make_recorder(timings, metrics_file, trace_file)
+    session = SessionPool(max_connections=pool_size, timeout=timeout, http2=http2, recorder=recorder,
+                          resilience=Resilience(retries=retries, max_concurrency=max_concurrency))
+    try:
+        openstack = OpenStack(openstack_ip, openstack_port,
+                              project_name, username, password, session=session,
+                              token_cache=TokenCache() if token_cache else None,
+                              auth_url=auth_url, interface=interface, region=region,
+                              index_ttl=cache_ttl, page_size=page_size)
+    except AuthenticationError as e:
+        typer.echo(f"Erreur : {e}", err=True)
+        session.close()
+        raise typer.Exit(1)
     # openstack.list_projects()
     # openstack.list_users()
     # openstack.list_vms()
@@ -718,8 +1311,13 @@ def create_topology(
     # openstack.list_images()
     # openstack.list_networks()
     # openstack.list_subnets()
+    if not skip_preflight:
+        # 3 réseaux et sous-réseaux (un port DHCP chacun), 1 routeur (passerelle et interface), 3 VM
+        demand = Demand(networks=3, subnets=3, routers=1, ports=3 + 2)
+        demand.add_server(TOPOLOGY_IMAGE, TOPOLOGY_FLAVOR, count=3)
+        run_preflight(openstack, demand)
     print("Creating topology...")
-    openstack.create_topology(
+    result = openstack.create_topology(
         blue_network_name,
         blue_subnet_name,
         blue_subnet_cidr,
@@ -733,7 +1331,13 @@ def create_topology(
         public_subnet_cidr,
         public_vm3_name,
         router_name,
+        max_workers=workers,
     )
+    openstack.close()
+    report(recorder, timings, metrics_file, trace_file)
+
+    if not result.ok:
+        raise typer.Exit(1)
 
 
 if __name__ == "__main__":
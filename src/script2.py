@@ -1,79 +1,72 @@
 #!/usr/bin/env python
 
-import json
+import asyncio
+import time
 import typer
-import httpx
 from rich.progress import track
 
+from src.async_openstack import AsyncOpenStack
+from src.auth import AuthenticationError, TokenCache
+from src.instrumentation import make_recorder, report
+from src.resilience import DEFAULT_MAX_CONCURRENCY, DEFAULT_RETRIES, Resilience
+from src.pagination import DEFAULT_PAGE_SIZE
+from src.session import AsyncSessionPool, DEFAULT_MAX_CONNECTIONS, DEFAULT_TIMEOUT
+from src.snapshot import (FORMATS, changes_since, export_incremental, load_snapshot, save_state, stream_export,
+                          write_snapshot)
+
 app = typer.Typer()
 
 
 class OpenStack:
-    def __init__(self, ip, port, name, username, password):
+    """
+    Client OpenStack synchrone : fine enveloppe autour de ``AsyncOpenStack``.
+
+    Chaque méthode exécute la coroutine correspondante dans une boucle asyncio
+    propre au client, ce qui garde les sessions HTTP ouvertes d'un appel à l'autre.
+    """
+
+    def __init__(self, ip, port, name, username, password, session=None, token_cache=None,
+                 auth_url=None, interface="public", region=None, page_size=DEFAULT_PAGE_SIZE):
         self.ip = ip
         self.port = port
         self.username = username
         self.password = password
         self.name = name
 
-        self.token = self.auth_openstack()
+        self._loop = asyncio.new_event_loop()
+        self.client = AsyncOpenStack(ip, port, name, username, password,
+                                     session=session, token_cache=token_cache,
+                                     auth_url=auth_url, interface=interface, region=region,
+                                     page_size=page_size)
 
-    def auth_openstack(self):
-        # Set the URL for the authentication API endpoint
-        url = f"http://{self.ip}:{self.port}/identity/v3/auth/tokens"
-
-        # Set the headers for the API request
-        headers = {
-            "Content-Type": "application/json",
-        }
-
-        print("Authentification à OpenStack...")
-
-        # Set the body of the API request
-        data = {
-            "auth": {
-                "identity": {
-                    "methods": ["password"],
-                    "password": {
-                        "user": {
-                            "name": self.username,
-                            "domain": {"id": "default"},
-                            "password": self.password,
-                        }
-                    },
-                },
-                "scope": {"project": {"name": self.name, "domain": {"id": "default"}}},
-            }
-        }
-        # Send the API request and get the response
-        response = httpx.post(url, headers=headers, json=data)
+        try:
+            self.token = self.auth_openstack()
+        except AuthenticationError:
+            self.close()
+            raise
 
-        if response.status_code != 201:
-            print("Erreur lors de l'authentification à OpenStack")
-            exit(1)
+    def _run(self, coroutine):
+        return self._loop.run_until_complete(coroutine)
 
-        return response.headers.get("X-Subject-Token")
+    def auth_openstack(self):
+        return self._run(self.client.auth_openstack())
+
+    def close(self):
+        """
+        Ferme les connexions HTTP ouvertes par le client.
+        """
+        self._run(self.client.close())
+        self._loop.close()
 
     def list_users(self):
         """
         Récupère la liste des utilisateurs à partir d'un endpoint OpenStack.
         """
-        # requête pour récupérer la liste des utilisateurs
         print("Récupération de la liste des utilisateurs...")
-        print(self.token)
-        url = f"http://{self.ip}:{self.port}/identity/v3/users"
-        headers = {"X-Auth-Token": self.token,
-                   "Content-Type": "application/json"}
-        response = httpx.get(url, headers=headers)
-        users = response.json()["users"]
-
-        if response.status_code != 200:
-            print("Erreur lors de la récupération de la liste des utilisateurs")
-            exit(1)
+        users = self._run(self.client.list_users())
 
         if len(users) == 0:
             print("Aucun utilisateur trouvé")
-            exit(1)
 
         print("Liste des utilisateurs :")
         for user in users:
@@ -84,31 +77,15 @@ class OpenStack:
     def list_networks(self):
         """
         Cette commande permet de récupérer la liste des réseaux d'une instance OpenStack.
-        Args:
-            ip: l'adresse IP de l'instance OpenStack.
-            token: le token d'authentification de l'instance OpenStack.
 
         Returns:
             La liste des réseaux de l'instance OpenStack.
         """
-        # requête pour récupérer la liste des réseaux
-        try:
-            networks_response = httpx.get(
-                f"http://{self.ip}:9696/networking/v2.0/networks.json", headers={"X-Auth-Token": self.token}
-            )
-        except Exception:
-            print("Erreur lors de la récupération de la liste des réseaux")
-            exit(1)
-
-        if networks_response.status_code != 200:
-            print("Erreur lors de la récupération de la liste des réseaux")
-            exit(1)
+        networks = self._run(self.client.list_networks())
 
-        networks = networks_response.json()
-
-        if len(networks) == 0:
+        if not networks["networks"]:
+            # un projet sans réseau n'est pas une erreur : la liste vide est retournée
             print("Aucun réseau trouvé")
-            exit(1)
 
         typer.echo("Liste des réseaux :")
         for network in networks["networks"]:
@@ -120,9 +97,6 @@ class OpenStack:
     def list_subnets(self):
         """
         Cette commande permet de récupérer la liste des sous-réseaux d'une instance OpenStack.
-        Args:
-            ip: l'adresse IP de l'instance OpenStack.
-            token: le token d'authentification de l'instance OpenStack.
 
         Returns:
             La liste des sous-réseaux de l'instance OpenStack.
@@ -145,19 +119,8 @@ class OpenStack:
     def list_projects(self):
         """
         Cette commande permet de récupérer la liste des projets d'une instance OpenStack.
-        Args:
-            ip: l'adresse IP de l'instance OpenStack.
-            token: le token d'authentification de l'instance OpenStack.
-
-        Returns:
-            La liste des projets de l'instance OpenStack.
         """
-        # requête pour récupérer la liste des projets
-        projects_response = httpx.get(
-            f"http://{self.ip}:{self.port}/identity/v3/projects", headers={"X-Auth-Token": self.token}
-        )
-
-        projects = projects_response.json()
+        projects = self._run(self.client.list_projects())
         typer.echo("Liste des projets :")
         for project in projects["projects"]:
             typer.echo(project["name"])
@@ -165,19 +128,11 @@ class OpenStack:
     def list_vms(self):
         """
         Cette commande permet de récupérer la liste des machines virtuelles d'une instance OpenStack.
-        Args:
-            ip: l'adresse IP de l'instance OpenStack.
-            token: le token d'authentification de l'instance OpenStack.
 
         Returns:
             La liste des machines virtuelles de l'instance OpenStack.
         """
-        # requête pour récupérer la liste des machines virtuelles
-        vms_response = httpx.get(
-            f"http://{self.ip}:{self.port}/compute/v2.1/servers", headers={"X-Auth-Token": self.token}
-        )
-
-        vms = vms_response.json()
+        vms = self._run(self.client.list_vms())
         typer.echo("Liste des machines virtuelles :")
         if vms == []:
             typer.echo("Aucune machine virtuelle n'a été trouvée.")
@@ -189,19 +144,8 @@ class OpenStack:
     def list_images(self):
         """
         Cette commande permet de récupérer la liste des images d'une instance OpenStack.
-        Args:
-            ip: l'adresse IP de l'instance OpenStack.
-            token: le token d'authentification de l'instance OpenStack.
-
-        Returns:
-            La liste des images de l'instance OpenStack.
         """
-        # requête pour récupérer la liste des images
-        images_response = httpx.get(
-            f"http://{self.ip}:{self.port}/image/v2/images", headers={"X-Auth-Token": self.token}
-        )
-
-        images = images_response.json()
+        images = self._run(self.client.list_images())
         typer.echo("Liste des images :")
         for image in images['images']:
             typer.echo(image['name'])
@@ -209,19 +153,8 @@ class OpenStack:
     def list_flavors(self):
         """
         Cette commande permet de récupérer la liste des flavors d'une instance OpenStack.
-        Args:
-            ip: l'adresse IP de l'instance OpenStack.
-            token: le token d'authentification de l'instance OpenStack.
-
-        Returns:
-            La liste des flavors de l'instance OpenStack.
         """
-        # requête pour récupérer la liste des flavors
-        flavors_response = httpx.get(
-            f"http://{self.ip}:{self.port}/compute/v2.1/flavors", headers={"X-Auth-Token": self.token}
-        )
-
-        flavors = flavors_response.json()
+        flavors = self._run(self.client.list_flavors())
         typer.echo("Liste des flavors :")
         for flavor in flavors['flavors']:
             typer.echo(flavor['name'])
@@ -229,19 +162,11 @@ class OpenStack:
     def list_routers(self):
         """
         Cette commande permet de récupérer la liste des routeurs d'une instance OpenStack.
-        Args:
-            ip: l'adresse IP de l'instance OpenStack.
-            token: le token d'authentification de l'instance OpenStack.
 
         Returns:
             La liste des routeurs de l'instance OpenStack.
         """
-        # requête pour récupérer la liste des routeurs
-        routers_response = httpx.get(
-            f"http://{self.ip}:9696/networking/v2.0/routers", headers={"X-Auth-Token": self.token}
-        )
-
-        routers = routers_response.json()
+        routers = self._run(self.client.list_routers())
 
         print(routers)
 
@@ -251,6 +176,33 @@ class OpenStack:
 
         return routers
 
+    def export(self):
+        """
+        Récupère en parallèle les réseaux, les machines virtuelles et les routeurs.
+
+        Returns:
+            Le dictionnaire exporté par ``export_json``.
+        """
+        return self._run(self.client.export())
+
+    def export_incremental(self, snapshot, since):
+        """
+        Met à jour un export précédent avec les seules ressources modifiées depuis ``since``.
+
+        Returns:
+            Le couple (export mis à jour, nombre de ressources relues par section).
+        """
+        return self._run(export_incremental(self.client, snapshot, since))
+
+    def stream_export(self, path):
+        """
+        Exporte les réseaux, les machines virtuelles et les routeurs en NDJSON, page par page.
+
+        Returns:
+            Le nombre de ressources exportées par section.
+        """
+        return self._run(stream_export(self.client, path))
+
 @app.command()
 def export_json(
     ip: str = typer.Argument(
@@ -289,34 +241,130 @@ def export_json(
         envvar="OS_PROJECT_NAME",
         show_default=True,
     ),
+    pool_size: int = typer.Option(
+        DEFAULT_MAX_CONNECTIONS,
+        help="Maximum HTTP connections per endpoint",
+        show_default=True,
+    ),
+    timeout: float = typer.Option(
+        DEFAULT_TIMEOUT,
+        help="HTTP timeout in seconds",
+        show_default=True,
+    ),
+    http2: bool = typer.Option(
+        False,
+        help="Use HTTP/2 (requires the h2 package)",
+        show_default=True,
+    ),
+    token_cache: bool = typer.Option(
+        True,
+        help="Reuse cached Keystone tokens across runs",
+        show_default=True,
+    ),
+    auth_url: str = typer.Option(
+        None,
+        help="Keystone URL (defaults to http://IP:PORT/identity/v3)",
+        envvar="OS_AUTH_URL",
+    ),
+    interface: str = typer.Option(
+        "public",
+        help="Service catalog interface",
+        envvar="OS_INTERFACE",
+        show_default=True,
+    ),
+    region: str = typer.Option(
+        None,
+        help="Service catalog region",
+        envvar="OS_REGION_NAME",
+    ),
+    page_size: int = typer.Option(
+        DEFAULT_PAGE_SIZE,
+        help="Number of items requested per page when listing",
+        show_default=True,
+    ),
+    incremental: bool = typer.Option(
+        False,
+        help="Only fetch resources changed since the previous export and merge them into it",
+        show_default=True,
+    ),
+    output_format: str = typer.Option(
+        "json",
+        "--format",
+        help="Export format: json (one document) or ndjson (one resource per line, streamed)",
+        show_default=True,
+    ),
+    output: str = typer.Option(
+        None,
+        help="Path of the exported file (defaults to resultat.json or resultat.ndjson)",
+    ),
+    timings: bool = typer.Option(
+        False,
+        help="Print request count and p50/p95/max latency per endpoint at the end",
+        show_default=True,
+    ),
+    metrics_file: str = typer.Option(
+        None,
+        help="Write the request metrics to this Prometheus textfile",
+    ),
+    trace_file: str = typer.Option(
+        None,
+        help="Write every request to this JSON trace (chrome://tracing, Perfetto)",
+    ),
+    retries: int = typer.Option(
+        DEFAULT_RETRIES,
+        help="Retries of idempotent requests on 429/5xx and network errors",
+        show_default=True,
+    ),
+    max_concurrency: int = typer.Option(
+        DEFAULT_MAX_CONCURRENCY,
+        help="Maximum concurrent requests per service (adaptive)",
+        show_default=True,
+    ),
 ):
     """Export OpenStack topology to JSON file"""
 
+    if output_format not in FORMATS:
+        raise typer.BadParameter(f"format must be one of {', '.join(FORMATS)}", param_hint="--format")
+    output = output or f"resultat.{output_format}"
+
     # Création de l'instance OpenStack
-    openstack = OpenStack(ip, port, project_name, username, password)
-
-    # Récupération des informations
-    network_dict = openstack.list_networks()
-    servers_list = openstack.list_vms()
-    router_dict = openstack.list_routers()
-
-    # Création du dictionnaire contenant toutes les informations
-    result_dict = {
-        "network": network_dict,
-        "servers": servers_list,
-        "router": router_dict,
-    }
-
-    # Conversion en JSON et affichage
-    result_json = json.dumps(
-        result_dict, indent=4, sort_keys=True, default=str
-    )
-
-    # Ecriture du JSON dans un fichier texte
-    with open("resultat.json", "w") as f:
-        json.dump(result_dict, f)
-
-    return result_json
+    recorder = make_recorder(timings, metrics_file, trace_file)
+    session = AsyncSessionPool(max_connections=pool_size, timeout=timeout, http2=http2, recorder=recorder,
+                               resilience=Resilience(retries=retries, max_concurrency=max_concurrency))
+    try:
+        openstack = OpenStack(ip, port, project_name, username, password, session=session,
+                              token_cache=TokenCache() if token_cache else None,
+                              auth_url=auth_url, interface=interface, region=region,
+                              page_size=page_size)
+    except AuthenticationError as e:
+        typer.echo(f"Erreur : {e}", err=True)
+        raise typer.Exit(1)
+
+    # Export précédent et date de sa dernière mise à jour (mode incrémental)
+    snapshot, state = load_snapshot(output) if incremental else (None, None)
+    started_at = time.time()
+
+    # Récupération des informations (réseaux, machines virtuelles et routeurs en parallèle) ;
+    # la boucle et les sessions HTTP sont fermées même si l'export échoue
+    try:
+        if snapshot is not None:
+            result_dict, fetched = openstack.export_incremental(snapshot, state["changes_since"])
+            print("Ressources relues : " + ", ".join(f"{section} {count}" for section, count in fetched.items()))
+            write_snapshot(output, result_dict, output_format)
+        elif output_format == "ndjson":
+            # écriture au fil des pages : la mémoire ne dépend pas de la taille du cloud
+            counts = openstack.stream_export(output)
+            print("Ressources exportées : " + ", ".join(f"{section} {count}" for section, count in counts.items()))
+        else:
+            write_snapshot(output, openstack.export(), output_format)
+    finally:
+        openstack.close()
+
+    # Date de l'export, point de départ du prochain export incrémental
+    save_state(output, {"changes_since": changes_since(started_at)})
+    report(recorder, timings, metrics_file, trace_file)
+
+    return output
 
 if __name__ == "__main__":
     app()
@@ -1,10 +1,41 @@
-import httpx
 import typer
 from rich.progress import track
 import os
 
+from src.auth import TokenCache, auth_payload, parse_expires_at, token_body
+from src.catalog import ServiceCatalog, default_auth_url, default_endpoints
+from src.pagination import iter_collection
+from src.session import SessionPool
+
 app = typer.Typer()
 
+# session HTTP partagée par toutes les commandes (connexions persistantes)
+session = SessionPool()
+
+
+def service_catalog(ip, port, token):
+    """
+    Retourne le catalogue des services associé à un token.
+
+    Le catalogue enregistré avec le token dans le cache est utilisé en priorité ;
+    sinon il est demandé une seule fois à Keystone (``GET /v3/auth/catalog``).
+    L'interface et la région viennent de ``OS_INTERFACE`` et ``OS_REGION_NAME``,
+    comme pour ``script1`` et ``script2``.
+    """
+    auth_url = os.environ.get("OS_AUTH_URL") or default_auth_url(ip, port)
+    interface = os.environ.get("OS_INTERFACE") or "public"
+    region = os.environ.get("OS_REGION_NAME") or None
+    fallback = default_endpoints(ip, port)
+    fallback["identity"] = auth_url
+
+    entry = TokenCache().find(token)
+    if entry is not None and entry.get("catalog"):
+        return ServiceCatalog(entry["catalog"], interface=interface, region=region, fallback=fallback)
+
+    response = session.get(f"{auth_url}/auth/catalog", headers={"X-Auth-Token": token})
+    entries = response.json().get("catalog") if response.status_code == 200 else None
+    return ServiceCatalog(entries, interface=interface, region=region, fallback=fallback)
+
 
 @app.command(help="Authentifie l'instance OpenStack.")
 def auth_openstack(
@@ -38,6 +69,11 @@ def auth_openstack(
         envvar="OS_PROJECT_NAME",
         show_default=True
     ),
+    auth_url: str = typer.Option(
+        None,
+        help="Keystone URL (defaults to http://IP:PORT/identity/v3)",
+        envvar="OS_AUTH_URL",
+    ),
 ):
     """Authentifie l'instance OpenStack.
     Args:
@@ -45,12 +81,21 @@ def auth_openstack(
         username: le nom de l'administrateur.
         password: le mot de passe de l'administrateur.
         name: le nom du projet.
+        auth_url: l'URL de Keystone.
 
     Returns:
         Le token d'authentification de l'instance OpenStack.
     """
     # Set the URL for the authentication API endpoint
-    url = f"http://{ip}:{port}/v3/auth/tokens"
+    url = (auth_url or default_auth_url(ip, port)).rstrip("/") + "/auth/tokens"
+
+    # Reuse the cached token when it is still valid
+    token_cache = TokenCache()
+    cache_key = TokenCache.key(url, username, name)
+    entry = token_cache.get(cache_key)
+    if entry is not None:
+        os.environ["OPENSTACK_TOKEN"] = entry["token"]
+        return entry["token"]
 
     # Set the headers for the API request
     headers = {
@@ -58,28 +103,19 @@ def auth_openstack(
     }
 
     # Set the body of the API request
-    data = {
-        "auth": {
-            "identity": {
-                "methods": ["password"],
-                "password": {
-                    "user": {
-                        "name": username,
-                        "domain": {"id": "default"},
-                        "password": password,
-                    }
-                },
-            },
-            "scope": {"project": {"name": name, "domain": {"id": "default"}}},
-        }
-    }
+    data = auth_payload(username, password, name)
+
     # Send the API request and get the response
-    response = httpx.post(url, headers=headers, json=data)
+    response = session.post(url, headers=headers, json=data)
+    token = response.headers.get("X-Subject-Token")
+    body = token_body(response)
 
-    # save token into environment variable
-    os.environ["OPENSTACK_TOKEN"] = response.headers.get("X-Subject-Token")
+    # save token into environment variable and into the persistent cache (with the service catalog)
+    os.environ["OPENSTACK_TOKEN"] = token
+    token_cache.set(cache_key, token, parse_expires_at(body),
+                    catalog=body.get("token", {}).get("catalog"))
 
-    return response.headers.get("X-Subject-Token")
+    return token
 
 
 @app.command(
@@ -109,10 +145,10 @@ def list_users(
     Récupère la liste des utilisateurs à partir d'un endpoint OpenStack.
     """
     # requête pour récupérer la liste des utilisateurs
-    url = f"{ip}:{port}/v3/users"
+    url = service_catalog(ip, port, token).url("identity", "/users")
     headers = {"X-Auth-Token": token}
-    response = httpx.get(url, headers=headers)
-    users = response.json()["users"]
+    # Keystone ne pagine pas ses collections
+    users = iter_collection(session, url, "users", headers, page_size=0)
 
     print("Liste des utilisateurs :")
     for user in track(users, description="Récupération des utilisateurs"):
@@ -150,13 +186,13 @@ def list_vms(
         La liste des machines virtuelles de l'instance OpenStack.
     """
     # requête pour récupérer la liste des machines virtuelles
-    vms_response = httpx.get(
-        f"http://{ip}:{port}/compute/v2.1/servers", headers={"X-Auth-Token": token}
+    vms = iter_collection(
+        session, service_catalog(ip, port, token).url("compute", "/servers"), "servers",
+        headers={"X-Auth-Token": token},
     )
-    vms = vms_response.json()
     typer.echo("Liste des machines virtuelles :")
     for vm in track(vms, description="Récupération des machines virtuelles"):
-        typer.echo(vm[0])
+        typer.echo(vm["name"])
 
 @app.command(help="Liste les instances virtuelles d'une instance OpenStack.")
 def list_networks(
@@ -189,10 +225,10 @@ def list_networks(
         La liste des réseaux de l'instance OpenStack.
     """
     # requête pour récupérer la liste des réseaux
-    networks_response = httpx.get(
-        f"http://{ip}:{port}/network/v2.0/networks", headers={"X-Auth-Token": token}
+    networks = iter_collection(
+        session, service_catalog(ip, port, token).url("network", "/networks"), "networks",
+        headers={"X-Auth-Token": token},
     )
-    networks = networks_response.json()["networks"]
     typer.echo("Liste des réseaux :")
     for network in track(networks, description="Récupération des réseaux"):
         typer.echo(network["name"])
@@ -228,10 +264,10 @@ def list_subnets(
         La liste des sous-réseaux de l'instance OpenStack.
     """
     # requête pour récupérer la liste des sous-réseaux
-    subnets_response = httpx.get(
-        f"http://{ip}:{port}/network/v2.0/subnets", headers={"X-Auth-Token": token}
+    subnets = iter_collection(
+        session, service_catalog(ip, port, token).url("network", "/subnets"), "subnets",
+        headers={"X-Auth-Token": token},
     )
-    subnets = subnets_response.json()["subnets"]
     typer.echo("Liste des sous-réseaux :")
     for subnet in track(subnets, description="Récupération des sous-réseaux"):
         typer.echo(subnet["name"])
@@ -0,0 +1,174 @@
+import threading
+
+import httpx
+
+from src.resilience import AsyncResilientTransport, ResilientTransport
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+
+class SessionPool:
+    """
+    Regroupe les sessions HTTP persistantes utilisées par le client OpenStack.
+
+    Une session (``httpx.Client``) est créée par endpoint (schéma, hôte, port)
+    puis réutilisée par toutes les requêtes suivantes : Keystone, Nova, Neutron
+    et Glance gardent ainsi leurs connexions ouvertes (keep-alive) au lieu de
+    refaire une connexion TCP à chaque appel.
+
+    Args:
+        max_connections: nombre maximal de connexions simultanées par endpoint.
+        max_keepalive_connections: nombre de connexions gardées ouvertes au repos.
+        keepalive_expiry: durée (secondes) avant de fermer une connexion inactive.
+        timeout: délai maximal (secondes) de lecture, écriture et attente du pool.
+        connect_timeout: délai maximal (secondes) d'établissement d'une connexion.
+        http2: active HTTP/2 (nécessite le paquet ``h2``).
+        transport: transport httpx à utiliser à la place du transport réseau.
+        recorder: l'enregistreur des requêtes (``instrumentation.Recorder``), désactivé si None.
+        resilience: la politique de limitation et de nouvelles tentatives
+            (``resilience.Resilience``) partagée par les sessions, désactivée si None.
+    """
+
+    def __init__(
+        self,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+        timeout=DEFAULT_TIMEOUT,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        http2=False,
+        transport=None,
+        recorder=None,
+        resilience=None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2
+        self.transport = transport
+        self.recorder = recorder
+        self.resilience = resilience
+
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def endpoint_key(url):
+        """
+        Retourne la clé (schéma, hôte, port) identifiant l'endpoint d'une URL.
+        """
+        url = httpx.URL(url)
+        return url.scheme, url.host, url.port
+
+    def client(self, url):
+        """
+        Retourne la session associée à l'endpoint de l'URL, en la créant au besoin.
+        """
+        key = self.endpoint_key(url)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = self._build_client()
+        return client
+
+    def _build_transport(self):
+        if self.resilience is None:
+            return self.transport
+        transport = self.transport or httpx.HTTPTransport(limits=self.limits, http2=self.http2)
+        return ResilientTransport(transport, self.resilience)
+
+    def _build_client(self):
+        return httpx.Client(
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=self.http2,
+            transport=self._build_transport(),
+            event_hooks=self.recorder.event_hooks() if self.recorder is not None else None,
+        )
+
+    def get(self, url, **kwargs):
+        return self.client(url).get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.client(url).post(url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.client(url).put(url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.client(url).delete(url, **kwargs)
+
+    def close(self):
+        """
+        Ferme toutes les sessions ouvertes.
+        """
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncSessionPool(SessionPool):
+    """
+    Version asynchrone de ``SessionPool`` construite sur ``httpx.AsyncClient``.
+
+    Les sessions doivent être utilisées et fermées dans la même boucle asyncio
+    que celle qui les a créées.
+    """
+
+    def _build_transport(self):
+        if self.resilience is None:
+            return self.transport
+        transport = self.transport or httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+        return AsyncResilientTransport(transport, self.resilience)
+
+    def _build_client(self):
+        return httpx.AsyncClient(
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=self.http2,
+            transport=self._build_transport(),
+            event_hooks=self.recorder.async_event_hooks() if self.recorder is not None else None,
+        )
+
+    async def get(self, url, **kwargs):
+        return await self.client(url).get(url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.client(url).post(url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.client(url).put(url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.client(url).delete(url, **kwargs)
+
+    async def close(self):
+        """
+        Ferme toutes les sessions ouvertes.
+        """
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
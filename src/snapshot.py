@@ -0,0 +1,291 @@
+import asyncio
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from src.models import MODELS, decode, decode_export, dumps, loads
+
+# marge (secondes) retirée de l'heure du dernier export pour ``changes-since`` :
+# couvre le décalage d'horloge avec Nova, un serveur vu deux fois est simplement remplacé
+CHANGES_SINCE_MARGIN = 60
+
+# formats d'export : un document JSON, ou une ressource par ligne (NDJSON)
+FORMATS = ("json", "ndjson")
+
+# sections de l'export : (section, type de ressource, clé de la collection)
+SECTIONS = (
+    ("network", "networks", "networks"),
+    ("subnet", "subnets", "subnets"),
+    ("port", "ports", "ports"),
+    ("servers", "server_details", "servers"),
+    ("router", "routers", "routers"),
+)
+
+# nombre d'identifiants demandés par requête (``id=a&id=b...``) pour garder des URL courtes
+ID_BATCH_SIZE = 100
+
+def state_path(path):
+    """
+    Retourne le chemin du fichier d'état associé à un export (``resultat.json.state``).
+    """
+    return path + ".state"
+
+
+def export_format(path):
+    """
+    Retourne le format d'un export d'après l'extension de son fichier.
+    """
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "json"
+
+
+@contextmanager
+def atomic_open(path):
+    """
+    Ouvre en écriture un fichier temporaire renommé en ``path`` à la fermeture.
+
+    Un lecteur voit soit l'ancien export complet, soit le nouveau ; en cas
+    d'erreur, le fichier temporaire est supprimé et l'ancien export est conservé.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def ndjson_line(section, item):
+    return dumps({"section": section, "resource": item}) + "\n"
+
+
+def read_ndjson(f):
+    """
+    Reconstruit un export (``{"network": {"networks": [...]}, ...}``) à partir de ses lignes NDJSON.
+    """
+    snapshot = {section: {key: []} for section, _, key in SECTIONS}
+    keys = {section: key for section, _, key in SECTIONS}
+    for line in f:
+        if line.strip():
+            record = loads(line)
+            snapshot[record["section"]][keys[record["section"]]].append(record["resource"])
+    return snapshot
+
+
+def write_snapshot(path, snapshot, output_format="json"):
+    """
+    Écrit un export en une seule sérialisation, de façon atomique.
+    Args:
+        path: le chemin de l'export.
+        snapshot: l'export (``{"network": ..., "subnet": ..., "port": ..., "servers": ..., "router": ...}``).
+        output_format: ``json`` ou ``ndjson``.
+    """
+    with atomic_open(path) as f:
+        if output_format == "ndjson":
+            for section, _, key in SECTIONS:
+                for item in snapshot.get(section, {}).get(key, []):
+                    f.write(ndjson_line(section, item))
+        else:
+            f.write(dumps(snapshot))
+
+
+async def stream_export(client, path):
+    """
+    Exporte le cloud en NDJSON sans garder les collections en mémoire.
+
+    Les trois collections sont parcourues en parallèle et chaque ressource est
+    écrite dès que sa page arrive : la mémoire utilisée ne dépend que de la
+    taille des pages. Le fichier est renommé en ``path`` une fois complet.
+    Args:
+        client: le client ``AsyncOpenStack``.
+        path: le chemin de l'export.
+
+    Returns:
+        Le nombre de ressources exportées par section.
+    """
+    if client.token is None:
+        await client.auth_openstack()
+
+    counts = {}
+    with atomic_open(path) as f:
+        async def copy(section, kind):
+            counts[section] = 0
+            # mêmes ressources compactes que l'export JSON (``AsyncOpenStack.export``)
+            async for item in client.query(kind, models=True):
+                f.write(ndjson_line(section, item))
+                counts[section] += 1
+
+        await asyncio.gather(*(copy(section, kind) for section, kind, _ in SECTIONS))
+
+    return counts
+
+
+def load_models(path):
+    """
+    Lit un export (JSON ou NDJSON) sous forme de modèles typés (``src.models``).
+
+    Un export NDJSON est décodé ligne par ligne, sans reconstruire l'export complet.
+    Args:
+        path: le chemin de l'export.
+
+    Returns:
+        Les modèles par type de ressource (``{"networks": [Network...], "servers": [...]}``).
+    """
+    with open(path, "rb") as f:
+        if export_format(path) != "ndjson":
+            return decode_export(f.read())
+
+        kinds = {section: kind for section, kind, _ in SECTIONS}
+        models = {kind: [] for kind in kinds.values()}
+        for line in f:
+            if line.strip():
+                record = loads(line)
+                kind = kinds[record["section"]]
+                models[kind].append(MODELS[kind].from_dict(record["resource"]))
+    # les serveurs de l'export viennent de ``/servers/detail``
+    models["servers"] = models.pop("server_details")
+    return models
+
+
+def decode_snapshot(snapshot):
+    """
+    Convertit les ressources d'un export (``{"network": {"networks": [...]}, ...}``) en modèles.
+
+    Les ressources déjà décodées sont conservées telles quelles.
+    """
+    return {section: {key: decode(kind, snapshot.get(section, {}).get(key, []))} for section, kind, key in SECTIONS}
+
+
+def load_snapshot(path):
+    """
+    Lit un export précédent (JSON ou NDJSON) et son fichier d'état.
+    Args:
+        path: le chemin de l'export.
+
+    Returns:
+        Le couple (export en modèles, état), ou (None, None) si l'un des deux est absent ou illisible.
+    """
+    try:
+        with open(path, "rb") as f:
+            snapshot = read_ndjson(f) if export_format(path) == "ndjson" else loads(f.read())
+        with open(state_path(path)) as f:
+            state = json.load(f)
+        snapshot = decode_snapshot(snapshot)
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return None, None
+    if "changes_since" not in state:
+        return None, None
+    return snapshot, state
+
+
+def save_state(path, state):
+    """
+    Écrit le fichier d'état d'un export.
+    """
+    with open(state_path(path), "w") as f:
+        json.dump(state, f)
+
+
+def changes_since(started_at, margin=CHANGES_SINCE_MARGIN):
+    """
+    Retourne la valeur ``changes-since`` (ISO 8601, UTC) du prochain export incrémental.
+    Args:
+        started_at: l'heure (timestamp) du début de l'export courant.
+        margin: la marge retirée pour couvrir le décalage d'horloge.
+    """
+    moment = datetime.fromtimestamp(started_at, timezone.utc) - timedelta(seconds=margin)
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _revision(item):
+    return item.revision_number, item.updated_at
+
+
+def changed_ids(previous_items, current_items):
+    """
+    Retourne les identifiants des ressources nouvelles ou modifiées depuis l'export précédent.
+
+    Une ressource est modifiée quand son ``revision_number`` ou son ``updated_at``
+    a changé ; une ressource sans l'un ni l'autre est toujours relue.
+    """
+    previous = {item.id: _revision(item) for item in previous_items}
+    changed = []
+    for item in current_items:
+        revision = _revision(item)
+        if revision == (None, None) or previous.get(item.id) != revision:
+            changed.append(item.id)
+    return changed
+
+
+def merge_servers(previous_items, changed_items):
+    """
+    Applique à la liste précédente les serveurs modifiés retournés par ``changes-since``.
+
+    Nova retourne aussi les serveurs supprimés (statut ``DELETED``), qui sont retirés.
+    """
+    merged = {item.id: item for item in previous_items}
+    for item in changed_items:
+        if item.status == "DELETED":
+            merged.pop(item.id, None)
+        else:
+            merged[item.id] = item
+    return list(merged.values())
+
+
+async def _neutron_delta(client, kind, previous_items):
+    # une requête légère (identifiant et révision) pour toute la collection
+    current = await client._list(kind, models=True, fields=["revision_number", "updated_at"])
+    changed = changed_ids(previous_items, current)
+
+    batches = [changed[i:i + ID_BATCH_SIZE] for i in range(0, len(changed), ID_BATCH_SIZE)]
+    fetched = {}
+    for items in await asyncio.gather(*(client._list(kind, models=True, id=batch) for batch in batches)):
+        fetched.update((item.id, item) for item in items)
+
+    # les ressources absentes de la collection courante ont été supprimées
+    previous = {item.id: item for item in previous_items}
+    merged = []
+    for item in current:
+        item = fetched.get(item.id) or previous.get(item.id)
+        if item is not None:
+            merged.append(item)
+    return merged, len(changed)
+
+
+async def export_incremental(client, snapshot, since):
+    """
+    Met à jour un export précédent en ne relisant que ce qui a changé.
+
+    Les serveurs modifiés depuis ``since`` sont demandés à Nova avec
+    ``changes-since`` ; pour Neutron, une requête ``fields=`` ne retourne que les
+    identifiants et révisions, puis seules les ressources nouvelles ou modifiées
+    sont relues. Les suppressions sont appliquées à l'export.
+    Args:
+        client: le client ``AsyncOpenStack``.
+        snapshot: l'export précédent.
+        since: la valeur ``changes-since`` enregistrée avec l'export précédent.
+
+    Returns:
+        Le couple (export mis à jour, en modèles, nombre de ressources relues par section).
+    """
+    if client.token is None:
+        await client.auth_openstack()
+
+    snapshot = decode_snapshot(snapshot)
+    neutron = [(section, kind, key) for section, kind, key in SECTIONS if kind != "server_details"]
+    changed_servers, *deltas = await asyncio.gather(
+        client._list("server_details", models=True, **{"changes-since": since}),
+        *(_neutron_delta(client, kind, snapshot.get(section, {}).get(key, [])) for section, kind, key in neutron),
+    )
+
+    updated = {"servers": {"servers": merge_servers(snapshot.get("servers", {}).get("servers", []), changed_servers)}}
+    fetched = {"servers": len(changed_servers)}
+    for (section, _, key), (items, count) in zip(neutron, deltas):
+        updated[section] = {key: items}
+        fetched[section] = count
+
+    return {section: updated[section] for section, _, _ in SECTIONS}, fetched
@@ -1,9 +1,37 @@
+import asyncio
+import io
+import json
+import os
+import time
+import urllib.request
+
+import httpx
 import pytest
 from unittest.mock import patch
+from src.async_openstack import AsyncOpenStack
+from src.auth import AuthenticationError, TokenCache
+from src.benchmark import TOPOLOGY, check_budgets, run_case
+from src.catalog import ServiceCatalog
+from src.daemon import Exporter, metrics_server, watch
+from src.fake_openstack import FakeOpenStack
+from src.instrumentation import Recorder, url_template
+from src.models import Network, Port, Router, Server, Subnet, dumps, loads
+from src.multicloud import PROFILE_DEFAULTS, export_cloud, merge_snapshots
+from src.pagination import iter_collection
+from src.preflight import Demand, preflight
+from src.query import SnapshotIndex
+from src.reachability import Reachability
+from src.resilience import CircuitOpenError, Resilience
+from src.resources import query_params
+from src.scheduler import TaskGraph
 from src.script1 import create_topology, OpenStack
+from src.session import AsyncSessionPool, SessionPool
+from src.snapshot import export_incremental, load_models, read_ndjson, stream_export, write_snapshot
+from src.topology import (apply_plan, destroy_topology, generate_spec, load_spec, normalize_spec, phase_report,
+                          plan_destroy, plan_topology, read_state, WAIT_SERVERS)
 
 
-@patch('httpx.post')
+@patch('httpx.Client.post')
 def test_auth_openstack(mock_post):
     mock_post.return_value.status_code = 201
     mock_post.return_value.headers = {'X-Subject-Token': 'fake_token'}
@@ -12,8 +40,8 @@ def test_auth_openstack(mock_post):
     assert openstack.token == 'fake_token'
 
 
-@patch('httpx.post')
-@patch('httpx.get')
+@patch('httpx.Client.post')
+@patch('httpx.Client.get')
 def test_list_users(mock_get, mock_post):
     mock_get.return_value.status_code = 200
     mock_get.return_value.json.return_value = {
@@ -29,8 +57,8 @@ def test_list_users(mock_get, mock_post):
     assert users[1]['name'] == 'test_user_2'
 
 
-@patch('httpx.post')
-@patch('httpx.get')
+@patch('httpx.Client.post')
+@patch('httpx.Client.get')
 def test_list_networks(mock_get, mock_post):
     mock_get.return_value.status_code = 200
     mock_get.return_value.json.return_value = {'networks': [{'name': 'test_network_1', 'id': 'network_1_id'},
@@ -48,8 +76,8 @@ def test_list_networks(mock_get, mock_post):
     assert networks['networks'][1]['id'] == 'network_2_id'
 
 
-@patch('httpx.post')
-@patch('httpx.get')
+@patch('httpx.Client.post')
+@patch('httpx.Client.get')
 def test_list_subnets(mock_get, mock_post):
     mock_get.return_value.status_code = 200
     mock_get.return_value.json.return_value = {'networks': [{'name': 'test_network_1', 'id': 'network_1_id', 'subnets': ['subnet_1_id']},
@@ -67,3 +95,889 @@ def test_list_subnets(mock_get, mock_post):
     assert subnets[1]['network_id'] == 'network_2_id'
     assert subnets[1]['subnets'][0] == 'subnet_1_id'
     assert subnets[1]['subnets'][1] == 'subnet_2_id'
+
+
+def test_session_pool_reuses_client_per_endpoint():
+    session = SessionPool()
+
+    compute = session.client('http://10.0.0.1:80/compute/v2.1/servers')
+    image = session.client('http://10.0.0.1:80/image/v2/images')
+    network = session.client('http://10.0.0.1:9696/networking/v2.0/networks')
+
+    assert compute is image
+    assert compute is not network
+    session.close()
+
+
+def test_async_export_fans_out_concurrently():
+    in_flight = {'current': 0, 'max': 0}
+
+    async def handler(request):
+        if request.method == 'POST':
+            return httpx.Response(201, headers={'X-Subject-Token': 'fake_token'})
+        in_flight['current'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['current'])
+        await asyncio.sleep(0.05)
+        in_flight['current'] -= 1
+        if request.url.path.endswith('/servers/detail'):
+            return httpx.Response(200, json={'servers': []})
+        if request.url.path.endswith('/routers'):
+            return httpx.Response(200, json={'routers': []})
+        return httpx.Response(200, json={'networks': []})
+
+    async def export():
+        session = AsyncSessionPool(transport=httpx.MockTransport(handler))
+        openstack = AsyncOpenStack('10.0.0.1', '5000', 'test', 'user', 'pass', session=session)
+        result = await openstack.export()
+        await openstack.close()
+        return result
+
+    result = asyncio.run(export())
+
+    assert in_flight['max'] == 5
+    assert result == {'network': {'networks': []},
+                      'subnet': {'subnets': []},
+                      'port': {'ports': []},
+                      'servers': {'servers': []},
+                      'router': {'routers': []}}
+
+
+@patch('httpx.Client.post')
+def test_token_cache_reused_across_clients(mock_post, tmp_path):
+    mock_post.return_value.status_code = 201
+    mock_post.return_value.headers = {'X-Subject-Token': 'fake_token'}
+    mock_post.return_value.json.return_value = {
+        'token': {'expires_at': '2999-01-01T00:00:00.000000Z'}}
+    token_cache = TokenCache(path=str(tmp_path / 'tokens.json'))
+
+    first = OpenStack('10.0.0.1', '5000', 'test', 'user', 'pass', token_cache=token_cache)
+    second = OpenStack('10.0.0.1', '5000', 'test', 'user', 'pass', token_cache=token_cache)
+
+    assert first.token == second.token == 'fake_token'
+    assert mock_post.call_count == 1
+    assert os.stat(token_cache.path).st_mode & 0o777 == 0o600
+
+
+def test_service_catalog_selects_interface_and_region():
+    catalog = ServiceCatalog([
+        {'type': 'network', 'endpoints': [
+            {'interface': 'public', 'region': 'RegionOne', 'url': 'http://one:9696/'},
+            {'interface': 'public', 'region': 'RegionTwo', 'url': 'http://two:9696/'},
+            {'interface': 'internal', 'region': 'RegionTwo', 'url': 'http://internal:9696/'}]},
+        {'type': 'compute', 'endpoints': [
+            {'interface': 'public', 'region': 'RegionTwo', 'url': 'http://two/compute/v2.1'}]},
+    ], region='RegionTwo', fallback={'image': 'http://fallback/image/v2'})
+
+    assert catalog.url('network', '/networks') == 'http://two:9696/v2.0/networks'
+    assert catalog.url('compute', '/servers') == 'http://two/compute/v2.1/servers'
+    assert catalog.url('image', '/images') == 'http://fallback/image/v2/images'
+
+
+@patch('httpx.Client.post')
+@patch('httpx.Client.get')
+def test_get_ids_use_resource_index(mock_get, mock_post):
+    mock_post.return_value.status_code = 201
+    mock_post.return_value.headers = {'X-Subject-Token': 'fake_token'}
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {
+        'images': [{'name': 'cirros', 'id': 'image_1_id'}, {'name': 'ubuntu', 'id': 'image_2_id'}]}
+
+    openstack = OpenStack('10.0.0.1', '5000', 'test', 'user', 'pass')
+
+    assert openstack.get_image_id('cirros') == 'image_1_id'
+    assert openstack.get_image_id('cirros') == 'image_1_id'
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.kwargs['params']['name'] == 'cirros'
+
+    assert openstack.get_image_id('ubuntu') == 'image_2_id'
+    assert mock_get.call_count == 2
+
+    openstack.index.invalidate('images')
+    openstack.index.load('images', [{'name': 'cirros', 'id': 'image_1_id'}])
+    assert openstack.get_image_id('missing') is None
+    assert mock_get.call_count == 2
+
+
+@patch('httpx.Client.post')
+@patch('httpx.Client.get')
+def test_resource_index_hits_expire_with_ttl(mock_get, mock_post):
+    mock_post.return_value.status_code = 201
+    mock_post.return_value.headers = {'X-Subject-Token': 'fake_token'}
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {'images': [{'name': 'cirros', 'id': 'image_1_id'}]}
+
+    openstack = OpenStack('10.0.0.1', '5000', 'test', 'user', 'pass')
+    assert openstack.get_image_id('cirros') == 'image_1_id'
+
+    # l'image a été supprimée hors du client : l'entrée de l'index expire avec le ttl
+    mock_get.return_value.json.return_value = {'images': []}
+    assert openstack.get_image_id('cirros') == 'image_1_id'
+    assert mock_get.call_count == 1
+
+    openstack.index.ttls['images'] = 0
+    assert openstack.get_image_id('cirros') is None
+    assert mock_get.call_count == 2
+    assert openstack.index.find('images', 'cirros') is None
+
+
+@patch('httpx.Client.post')
+@patch('httpx.Client.get')
+def test_query_pushes_filters_and_fields(mock_get, mock_post):
+    mock_post.return_value.status_code = 201
+    mock_post.return_value.headers = {'X-Subject-Token': 'fake_token'}
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {'subnets': [{'id': 'subnet_1_id'}]}
+
+    openstack = OpenStack('10.0.0.1', '5000', 'test', 'user', 'pass')
+
+    assert openstack.get_subnet_id('network_1_id') == 'subnet_1_id'
+    params = mock_get.call_args.kwargs['params']
+    assert params['network_id'] == 'network_1_id'
+    assert params['fields'] == ['id']
+
+    assert query_params('servers', {'name': 'vm.1'}) == {'name': '^vm\\.1$'}
+
+
+def test_iter_collection_follows_next_links():
+    requests = []
+
+    def handler(request):
+        requests.append(dict(request.url.params))
+        marker = request.url.params.get('marker')
+        if marker is None:
+            return httpx.Response(200, json={
+                'servers': [{'id': 'vm_1'}, {'id': 'vm_2'}],
+                'servers_links': [{'rel': 'next', 'href': 'http://internal/servers?limit=2&marker=vm_2'}]})
+        if marker == 'vm_2':
+            return httpx.Response(200, json={'servers': [{'id': 'vm_3'}]})
+        return httpx.Response(200, json={'servers': []})
+
+    session = SessionPool(transport=httpx.MockTransport(handler))
+    pages = iter_collection(session, 'http://10.0.0.1/compute/v2.1/servers', 'servers', {}, page_size=2)
+
+    assert [server['id'] for server in pages] == ['vm_1', 'vm_2', 'vm_3']
+    assert requests == [{'limit': '2'}, {'limit': '2', 'marker': 'vm_2'}]
+
+
+def test_task_graph_runs_independent_branches_and_skips_dependents():
+    graph = TaskGraph()
+    graph.add('network', lambda: 'network_id')
+    graph.add('subnet', lambda network_id: f'{network_id}/subnet', deps=['network'])
+    graph.add('broken', lambda: 1 / 0)
+    graph.add('vm', lambda subnet_id, broken: 'vm_id', deps=['subnet', 'broken'])
+    graph.add('image', lambda: 'image_id')
+
+    result = graph.run(max_workers=2)
+
+    assert result.results == {'network': 'network_id', 'subnet': 'network_id/subnet', 'image': 'image_id'}
+    assert list(result.errors) == ['broken']
+    assert result.skipped == {'vm'}
+    assert not result.ok
+
+
+def test_create_vms_uses_multi_create_for_identical_servers():
+    fake = FakeOpenStack(seed=1)
+    image, flavor = fake.add_image('cirros'), fake.add_flavor('m1.tiny')
+    fake.populate(networks=1)
+    network_id = next(iter(fake.collections['networks']))
+    session = SessionPool(transport=fake.transport())
+    openstack = OpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+
+    created = openstack.create_vms([
+        {'name': 'db', 'image_id': image['id'], 'flavor_id': flavor['id'], 'network_id': network_id},
+        {'name': 'web', 'image_id': image['id'], 'flavor_id': flavor['id'], 'network_id': network_id, 'count': 3},
+    ])
+
+    names = {server['id']: server['name'] for server in fake.collections['servers'].values()}
+    assert sorted(names[server_id] for server_id in created['web']) == ['web-1', 'web-2', 'web-3']
+    assert [names[server_id] for server_id in created['db']] == ['db']
+    # une seule création multiple, puis le renommage de la machine db
+    assert fake.calls['POST compute/servers'] == 1
+    assert fake.calls['PUT compute/servers'] == 1
+    assert openstack.get_vm_id('web-2') == created['web'][1]
+
+
+def test_boot_vms_reports_nova_errors():
+    def handler(request):
+        if request.url.path.endswith('/auth/tokens'):
+            return httpx.Response(201, headers={'X-Subject-Token': 'fake_token'}, json={})
+        return httpx.Response(409, json={'conflictingRequest': {'message': 'Instance is locked', 'code': 409}})
+
+    session = SessionPool(transport=httpx.MockTransport(handler))
+    openstack = OpenStack('10.0.0.1', '5000', 'test', 'user', 'pass', session=session)
+
+    with pytest.raises(RuntimeError, match='Instance is locked'):
+        openstack.boot_vms('web', 'image', 'flavor', 'net', 3)
+
+
+LAB_SPEC = {
+    'name': 'lab',
+    'networks': [{'name': 'blue', 'subnets': [{'name': 'blue_subnet', 'cidr': '10.0.0.0/24'}]},
+                 {'name': 'public', 'external': True,
+                  'subnets': [{'name': 'public_subnet', 'cidr': '172.24.4.0/24'}]}],
+    'routers': [{'name': 'router', 'external_network': 'public', 'interfaces': ['blue_subnet']}],
+    'servers': [{'name': 'web', 'network': 'blue', 'count': 2}],
+}
+
+
+def empty_state(**collections):
+    state = {kind: [] for kind in ('networks', 'subnets', 'routers', 'ports', 'server_details')}
+    state['images'] = [{'id': 'image_id', 'name': 'cirros-0.5.2-x86_64-disk'}]
+    state['flavors'] = [{'id': 'flavor_id', 'name': 'm1.tiny'}]
+    state.update(collections)
+    return state
+
+
+def test_plan_topology_reports_minimal_delta():
+    spec = normalize_spec(LAB_SPEC)
+
+    plan = plan_topology(spec, empty_state())
+    assert [(a.op, a.kind, a.name) for a in plan.actions] == [
+        ('create', 'network', 'blue'), ('create', 'network', 'public'),
+        ('create', 'subnet', 'blue_subnet'), ('create', 'subnet', 'public_subnet'),
+        ('create', 'router', 'router'), ('create', 'interface', 'router:blue_subnet'),
+        ('create', 'server', 'web')]
+    # les réseaux et les sous-réseaux sont créés en lot : une requête par type
+    assert plan.calls == 6
+
+    converged = empty_state(
+        networks=[{'id': 'blue_id', 'name': 'blue'},
+                  {'id': 'public_id', 'name': 'public', 'router:external': True},
+                  {'id': 'old_id', 'name': 'old', 'description': 'openstack-lab:lab'},
+                  {'id': 'other_id', 'name': 'other'}],
+        subnets=[{'id': 'blue_subnet_id', 'name': 'blue_subnet', 'network_id': 'blue_id', 'cidr': '10.0.0.0/24'},
+                 {'id': 'public_subnet_id', 'name': 'public_subnet', 'network_id': 'public_id',
+                  'cidr': '172.24.4.0/24'}],
+        routers=[{'id': 'router_id', 'name': 'router',
+                  'external_gateway_info': {'network_id': 'public_id'}}],
+        ports=[{'device_id': 'router_id', 'fixed_ips': [{'subnet_id': 'blue_subnet_id'}]}],
+        server_details=[{'id': f'web_{i}', 'name': f'web-{i}', 'addresses': {'blue': []},
+                         'image': {'id': 'image_id'}, 'flavor': {'id': 'flavor_id'}} for i in (1, 2)])
+
+    assert plan_topology(spec, converged).actions == []
+    pruned = plan_topology(spec, converged, prune=True)
+    assert [(a.op, a.kind, a.name) for a in pruned.actions] == [('delete', 'network', 'old')]
+
+    # le réseau externe partagé n'est pas modifié s'il n'est pas géré par la topologie
+    converged['networks'][1] = {'id': 'public_id', 'name': 'public'}
+    with pytest.raises(ValueError, match="n'est pas géré"):
+        plan_topology(spec, converged)
+    converged['networks'][1]['description'] = 'openstack-lab:lab'
+    assert [(a.op, a.kind) for a in plan_topology(spec, converged).actions] == [('update', 'network')]
+
+    # DevStack : ``public`` existe avec son propre sous-réseau, celui de la spécification n'est pas créé
+    devstack = empty_state(
+        networks=[{'id': 'public_id', 'name': 'public', 'router:external': True, 'subnets': ['devstack_id']}],
+        subnets=[{'id': 'devstack_id', 'name': 'public-subnet', 'network_id': 'public_id',
+                  'cidr': '172.24.4.0/24'}])
+    assert ('create', 'subnet', 'public_subnet') not in [
+        (a.op, a.kind, a.name) for a in plan_topology(spec, devstack).actions]
+    lab = load_spec('topologies/lab.yaml')
+    assert [a.name for a in plan_topology(lab, devstack).actions if a.kind == 'subnet'] == [
+        'blue_subnet', 'red_subnet']
+
+
+def test_apply_plan_runs_only_planned_calls():
+    calls = []
+
+    def handler(request):
+        if request.url.path.endswith('/auth/tokens'):
+            return httpx.Response(201, headers={'X-Subject-Token': 'fake_token'}, json={})
+        body = json.loads(request.content) if request.content else {}
+        calls.append((request.method, request.url.path.rsplit('/', 1)[-1], body))
+        if request.url.path.endswith('_router_interface'):
+            return httpx.Response(200, json={'subnet_id': body['subnet_id']})
+        if request.method == 'GET':
+            return httpx.Response(200, json={'servers': [{'id': 'web_1_id', 'name': 'web-1'},
+                                                         {'id': 'web_2_id', 'name': 'web-2'}]})
+        if 'server' in body:
+            return httpx.Response(202, json={'reservation_id': 'r-1'})
+        key, attributes = next(iter(body.items()))
+        if isinstance(attributes, list):
+            return httpx.Response(201, json={key: [dict(item, id=f"{item['name']}_id") for item in attributes]})
+        return httpx.Response(201, json={key: dict(attributes, id=f"{attributes['name']}_id")})
+
+    session = SessionPool(transport=httpx.MockTransport(handler))
+    openstack = OpenStack('10.0.0.1', '5000', 'test', 'user', 'pass', session=session)
+    spec = normalize_spec(LAB_SPEC)
+    state = empty_state(networks=[{'id': 'public_id', 'name': 'public', 'router:external': True}],
+                        subnets=[{'id': 'public_subnet_id', 'name': 'public_subnet',
+                                  'network_id': 'public_id', 'cidr': '172.24.4.0/24'}])
+    plan = plan_topology(spec, state)
+
+    result = apply_plan(openstack, plan, spec, state, max_workers=4)
+
+    assert result.ok
+    assert len(calls) == plan.calls == 6
+    order = [path for _, path, _ in calls]
+    assert order.index('networks') < order.index('subnets') < order.index('add_router_interface')
+    subnet = next(body['subnets'][0] for _, path, body in calls if path == 'subnets')
+    assert subnet['network_id'] == 'blue_id'
+    assert subnet['description'] == 'openstack-lab:lab'
+    server = next(body['server'] for _, path, body in calls if path == 'servers' and body)
+    assert server['metadata'] == {'openstack-lab': 'lab'}
+    assert server['max_count'] == 2
+
+
+def test_export_incremental_fetches_only_changes():
+    requests = []
+
+    async def handler(request):
+        if request.method == 'POST':
+            return httpx.Response(201, headers={'X-Subject-Token': 'fake_token'})
+        params = request.url.params
+        requests.append((request.url.path.rsplit('/', 1)[-1], str(params)))
+        if request.url.path.endswith('/servers/detail'):
+            assert params['changes-since'] == '2026-01-01T00:00:00Z'
+            return httpx.Response(200, json={'servers': [
+                {'id': 'vm_1', 'status': 'DELETED'}, {'id': 'vm_3', 'status': 'ACTIVE'}]})
+        if not request.url.path.endswith('/networks'):
+            return httpx.Response(200, json={})
+        if 'fields' in params:
+            return httpx.Response(200, json={'networks': [
+                {'id': 'net_1', 'revision_number': 1}, {'id': 'net_2', 'revision_number': 5}]})
+        assert params.get_list('id') == ['net_2']
+        return httpx.Response(200, json={'networks': [{'id': 'net_2', 'name': 'renamed', 'revision_number': 5}]})
+
+    snapshot = {
+        'network': {'networks': [{'id': 'net_1', 'name': 'blue', 'revision_number': 1},
+                                 {'id': 'net_2', 'name': 'red', 'revision_number': 4},
+                                 {'id': 'net_3', 'name': 'gone', 'revision_number': 2}]},
+        'servers': {'servers': [{'id': 'vm_1'}, {'id': 'vm_2'}]},
+        'router': {'routers': [{'id': 'router_1', 'revision_number': 1}]},
+    }
+
+    async def export():
+        session = AsyncSessionPool(transport=httpx.MockTransport(handler))
+        openstack = AsyncOpenStack('10.0.0.1', '5000', 'test', 'user', 'pass', session=session)
+        result = await export_incremental(openstack, snapshot, '2026-01-01T00:00:00Z')
+        await openstack.close()
+        return result
+
+    result, fetched = asyncio.run(export())
+
+    assert [n.name for n in result['network']['networks']] == ['blue', 'renamed']
+    assert [s.id for s in result['servers']['servers']] == ['vm_2', 'vm_3']
+    assert result['router'] == {'routers': []}
+    assert fetched == {'network': 1, 'subnet': 0, 'port': 0, 'servers': 2, 'router': 0}
+    assert len(requests) == 6
+
+
+def test_stream_export_writes_ndjson_atomically(tmp_path):
+    async def handler(request):
+        if request.method == 'POST':
+            return httpx.Response(201, headers={'X-Subject-Token': 'fake_token'})
+        if request.url.path.endswith('/servers/detail'):
+            if request.url.params.get('marker') is None:
+                return httpx.Response(200, json={'servers': [{'id': 'vm_1'}, {'id': 'vm_2'}]})
+            return httpx.Response(200, json={'servers': [{'id': 'vm_3'}]})
+        if request.url.path.endswith('/routers'):
+            return httpx.Response(200, json={'routers': []})
+        return httpx.Response(200, json={'networks': [{'id': 'net_1'}]})
+
+    path = str(tmp_path / 'resultat.ndjson')
+
+    async def export():
+        session = AsyncSessionPool(transport=httpx.MockTransport(handler))
+        openstack = AsyncOpenStack('10.0.0.1', '5000', 'test', 'user', 'pass', session=session, page_size=2)
+        counts = await stream_export(openstack, path)
+        await openstack.close()
+        return counts
+
+    assert asyncio.run(export()) == {'network': 1, 'subnet': 0, 'port': 0, 'servers': 3, 'router': 0}
+    assert os.listdir(tmp_path) == ['resultat.ndjson']
+    with open(path) as f:
+        snapshot = read_ndjson(f)
+    assert [server['id'] for server in snapshot['servers']['servers']] == ['vm_1', 'vm_2', 'vm_3']
+    assert [network['id'] for network in snapshot['network']['networks']] == ['net_1']
+
+
+def test_json_and_ndjson_exports_write_the_same_records(tmp_path):
+    fake = FakeOpenStack(seed=1)
+    fake.populate(networks=3, routers=1, servers=20)
+
+    async def export_both():
+        session = AsyncSessionPool(transport=fake.async_transport())
+        client = AsyncOpenStack('fake', '80', 'admin', 'admin', 'password', session=session, page_size=7)
+        write_snapshot(str(tmp_path / 'resultat.json'), await client.export())
+        await stream_export(client, str(tmp_path / 'resultat.ndjson'))
+        await client.close()
+
+    asyncio.run(export_both())
+    with open(tmp_path / 'resultat.json') as f:
+        exported = json.load(f)
+    with open(tmp_path / 'resultat.ndjson') as f:
+        streamed = read_ndjson(f)
+    assert streamed == exported
+    assert len(streamed['servers']['servers']) == 20
+
+
+def test_models_use_slots_and_intern_repeated_strings(tmp_path):
+    snapshot = {
+        'network': {'networks': [{'id': 'net_1', 'name': 'blue', 'router:external': False,
+                                  'tenant_id': ''.join(['proj', 'ect'])}]},
+        'servers': {'servers': [
+            {'id': f'vm_{i}', 'name': f'vm-{i}', 'status': 'ACTIVE', 'tenant_id': ''.join(['proj', 'ect']),
+             'addresses': {'blue': [{'addr': f'10.0.0.{i}'}]}, 'image': {'id': 'image_id'},
+             'flavor': {'id': 'flavor_id'}, 'OS-EXT-STS:task_state': None} for i in range(2)]},
+        'router': {'routers': []},
+    }
+
+    for name in ('resultat.json', 'resultat.ndjson'):
+        path = str(tmp_path / name)
+        write_snapshot(path, snapshot, 'ndjson' if name.endswith('ndjson') else 'json')
+        models = load_models(path)
+
+        first, second = models['servers']
+        assert isinstance(first, Server) and not hasattr(first, '__dict__')
+        assert first.addresses == {'blue': ('10.0.0.0',)}
+        assert first.project_id is second.project_id is models['networks'][0].project_id
+        assert models['routers'] == []
+
+    with patch('src.models.orjson', None):
+        assert loads(dumps(snapshot)) == snapshot
+
+    # un export écrit à partir des modèles (export du client) se relit à l'identique
+    path = str(tmp_path / 'models.json')
+    write_snapshot(path, {'servers': {'servers': models['servers']}, 'port': {'ports': [
+        Port.from_dict({'id': 'p1', 'device_id': 'vm_1', 'fixed_ips': [{'subnet_id': 's1', 'ip_address': '10.0.0.1'}]})]}})
+    reloaded = load_models(path)
+    assert reloaded['servers'] == models['servers']
+    assert reloaded['ports'][0].fixed_ips == (('s1', '10.0.0.1'),)
+
+
+def test_snapshot_index_filters_and_joins_offline():
+    index = SnapshotIndex({
+        'networks': [Network.from_dict({'id': 'net_1', 'name': 'blue'}),
+                     Network.from_dict({'id': 'net_2', 'name': 'red'})],
+        'servers': [Server.from_dict({'id': f'vm_{i}', 'name': f'vm-{i}', 'status': status, 'tenant_id': 'p1',
+                                      'addresses': {network: [{'addr': f'10.0.0.{i}'}]}})
+                    for i, (status, network) in enumerate([('ACTIVE', 'blue'), ('ERROR', 'blue'),
+                                                           ('ACTIVE', 'red')])],
+        'routers': [Router.from_dict({'id': 'r1', 'name': 'router', 'status': 'DOWN',
+                                      'external_gateway_info': {'network_id': 'net_2'}})],
+    })
+
+    assert [s.name for s in index.select('servers', network='blue')] == ['vm-0', 'vm-1']
+    assert [s.name for s in index.select('servers', network='net_1', status='active')] == ['vm-0']
+    assert [s.name for s in index.select('servers', project_id='p1', status='ACTIVE')] == ['vm-0', 'vm-2']
+    assert [r.name for r in index.select('routers', status='DOWN')] == ['router']
+    assert index.select('routers', network='red')[0].id == 'r1'
+    assert index.get('servers', 'vm-2').id == 'vm_2'
+    with pytest.raises(KeyError):
+        index.select('ports')
+
+
+def test_reachability_through_routers_and_cidrs():
+    def vm(name, network, address, status='ACTIVE'):
+        return Server.from_dict({'id': name, 'name': name, 'status': status,
+                                 'addresses': {network: [{'addr': address}]}})
+
+    def interface(router_id, subnet_id, owner='network:router_interface'):
+        return Port.from_dict({'id': f'{router_id}-{subnet_id}', 'device_id': router_id, 'device_owner': owner,
+                               'fixed_ips': [{'subnet_id': subnet_id}]})
+
+    models = {
+        'networks': [Network.from_dict({'id': n, 'name': n}) for n in ('blue', 'red', 'public', 'lonely')],
+        'subnets': [Subnet.from_dict({'id': f'{n}_subnet', 'name': f'{n}_subnet', 'network_id': n, 'cidr': cidr})
+                    for n, cidr in (('blue', '10.0.0.0/24'), ('red', '192.168.1.0/24'),
+                                    ('public', '172.24.4.0/24'), ('lonely', '10.0.0.0/24'))],
+        'ports': [interface('router', 'blue_subnet'), interface('router', 'red_subnet'),
+                  interface('router', 'public_subnet', 'network:router_gateway'),
+                  interface('spare', 'lonely_subnet')],
+        'servers': [vm('blue_vm1', 'blue', '10.0.0.5'), vm('red_vm2', 'red', '192.168.1.7'),
+                    vm('public_vm3', 'public', '172.24.4.9'), vm('lonely_vm', 'lonely', '10.0.0.5'),
+                    vm('broken_vm', 'blue', '10.0.0.6', status='ERROR')],
+        'routers': [Router.from_dict({'id': 'router', 'name': 'router', 'admin_state_up': True}),
+                    Router.from_dict({'id': 'spare', 'name': 'spare', 'admin_state_up': False})],
+    }
+    analysis = Reachability(models)
+    servers = {server.name: server for server in models['servers']}
+
+    reachable, reason = analysis.check(servers['blue_vm1'], servers['red_vm2'])
+    assert reachable and reason == 'blue_subnet -> router -> red_subnet'
+    assert analysis.check(servers['red_vm2'], servers['public_vm3'])[0]
+    assert analysis.check(servers['blue_vm1'], servers['lonely_vm']) == (
+        False, 'no router connects blue_subnet, lonely_subnet')
+    assert analysis.check(servers['blue_vm1'], servers['broken_vm']) == (False, 'broken_vm is ERROR')
+    assert [len(group) for group in analysis.groups()] == [3, 1, 1]
+
+    models['routers'][0].admin_state_up = False
+    assert Reachability(models).check(servers['blue_vm1'], servers['red_vm2']) == (
+        False, 'router router is admin down')
+
+
+def test_reachability_keeps_multi_homed_vms_on_each_component():
+    models = {
+        'networks': [Network.from_dict({'id': n, 'name': n}) for n in ('n1', 'n2', 'n3')],
+        'subnets': [Subnet.from_dict({'id': s, 'name': s, 'network_id': n, 'cidr': cidr})
+                    for s, n, cidr in (('s1', 'n1', '10.0.1.0/24'), ('s2', 'n2', '10.0.2.0/24'),
+                                       ('s3', 'n3', '10.0.3.0/24'))],
+        'ports': [Port.from_dict({'id': f'r1-{s}', 'device_id': 'r1', 'device_owner': 'network:router_interface',
+                                  'fixed_ips': [{'subnet_id': s}]}) for s in ('s1', 's2')],
+        'servers': [Server.from_dict({'id': name, 'name': name, 'status': 'ACTIVE', 'addresses': addresses})
+                    for name, addresses in (
+                        ('multi', {'n1': [{'addr': '10.0.1.5'}], 'n3': [{'addr': '10.0.3.5'}]}),
+                        ('routed', {'n2': [{'addr': '10.0.2.5'}]}),
+                        ('unrouted', {'n3': [{'addr': '10.0.3.6'}]}))],
+        'routers': [Router.from_dict({'id': 'r1', 'name': 'r1', 'admin_state_up': True})],
+    }
+    analysis = Reachability(models)
+    servers = {server.name: server for server in models['servers']}
+
+    # « multi » joint les deux autres, qui ne se joignent pas : il ne route pas entre ses interfaces
+    assert not analysis.check(servers['routed'], servers['unrouted'])[0]
+    assert sorted(sorted(server.name for server in group) for group in analysis.groups()) == [
+        ['multi', 'routed'], ['multi', 'unrouted']]
+    assert analysis.reachable_pairs() == sum(reachable for _, _, reachable, _ in analysis.pairs()) == 2
+
+
+def test_fake_openstack_paginates_and_converges():
+    fake = FakeOpenStack(seed=1, max_page_size=50)
+    fake.populate(networks=3, routers=1, servers=120)
+
+    client = AsyncOpenStack('fake', '80', 'admin', 'admin', 'password',
+                            session=AsyncSessionPool(transport=fake.async_transport()))
+    snapshot = asyncio.run(client.export())
+    assert len(snapshot['servers']['servers']) == 120
+    assert len(snapshot['port']['ports']) == 121
+    assert fake.calls['GET compute/servers'] == 3
+
+    openstack = OpenStack('fake', '80', 'admin', 'admin', 'password',
+                          session=SessionPool(transport=fake.transport()))
+    spec = normalize_spec(LAB_SPEC)
+    state = read_state(openstack, max_workers=4)
+    assert apply_plan(openstack, plan_topology(spec, state), spec, state, max_workers=4).ok
+    assert plan_topology(spec, read_state(openstack, max_workers=4)).actions == []
+
+
+def test_fake_openstack_injects_latency_and_errors():
+    fake = FakeOpenStack(latency={'network': 0.05}, error_rate={'image': 1.0}, seed=1)
+    session = SessionPool(transport=fake.transport())
+    openstack = OpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+
+    started = time.perf_counter()
+    openstack.list_networks()
+    assert time.perf_counter() - started >= 0.05
+    assert session.get(openstack.url('image', '/images')).status_code == 503
+
+
+def test_benchmark_counts_requests_and_checks_budgets():
+    result = run_case('get_vm_id', 10, memory=False)
+    assert result['requests'] == 1
+    assert result['endpoints'] == {'GET compute/servers': 1}
+    assert result['bytes'] > 0
+
+    budgets = {'cases': {'get_vm_id@10': {'requests': 1, 'seconds': 1.0},
+                         'list_vms@10': {'requests': 1, 'seconds': 0.001}}}
+    results = {'get_vm_id@10': result,
+               'list_vms@10': {'requests': 2, 'seconds': 0.2}}
+    failures = check_budgets(results, budgets)
+    assert len(failures) == 2
+    assert all(failure.startswith('list_vms@10') for failure in failures)
+
+
+def test_recorder_reports_latency_per_endpoint(tmp_path):
+    fake = FakeOpenStack(seed=1, max_page_size=50)
+    fake.populate(networks=2, servers=60)
+    recorder = Recorder()
+    session = AsyncSessionPool(transport=fake.async_transport(), recorder=recorder)
+    client = AsyncOpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+    asyncio.run(client.export())
+
+    rows = {(row['service'], row['method'], row['endpoint']): row for row in recorder.summary()}
+    assert rows[('identity', 'POST', '/identity/v3/auth/tokens')]['count'] == 1
+    servers = rows[('compute', 'GET', '/compute/v2.1/servers/detail')]
+    assert servers['count'] == 2
+    assert servers['p50'] <= servers['p95'] <= servers['max']
+    assert servers['response_bytes'] > 0
+
+    recorder.write_prometheus(tmp_path / 'metrics.prom')
+    metrics = (tmp_path / 'metrics.prom').read_text()
+    assert ('openstack_lab_http_requests_total{service="network",method="GET",'
+            'endpoint="/networking/v2.0/ports",status="200"} 2') in metrics
+    recorder.write_trace(tmp_path / 'trace.json')
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert len(events) == len(recorder.samples)
+    assert url_template('/compute/v2.1/servers/6f1c1b5e-1d2a-4c3b-9a8e-0123456789ab') == '/compute/v2.1/servers/{id}'
+
+
+def test_resilient_transport_adapts_to_throttling_and_retries():
+    fake = FakeOpenStack(seed=1, latency=0.01, concurrency_limit={'compute': 2}, retry_after=0)
+    resilience = Resilience(retries=20, backoff=0.001, max_concurrency=8, seed=1)
+    session = AsyncSessionPool(transport=fake.async_transport(), resilience=resilience)
+
+    async def burst():
+        url = 'http://fake-openstack/compute/v2.1/flavors'
+        responses = await asyncio.gather(*(session.get(url) for _ in range(30)))
+        await session.close()
+        return responses
+
+    responses = asyncio.run(burst())
+
+    assert all(response.status_code == 200 for response in responses)
+    assert fake.calls['GET compute/flavors'] > 30
+    limiter = resilience.limiter(('fake-openstack', None, 'compute'))
+    assert limiter.limit < 8
+
+
+def test_circuit_breaker_fails_fast_and_post_is_not_retried():
+    fake = FakeOpenStack(seed=1, error_rate={'image': 1.0, 'network': 1.0})
+    resilience = Resilience(retries=5, backoff=0, failure_threshold=3, reset_timeout=60)
+    session = SessionPool(transport=fake.transport(), resilience=resilience)
+
+    response = session.post('http://fake-openstack:9696/networking/v2.0/networks', json={'network': {}})
+    assert response.status_code == 503
+    assert fake.calls['POST network/networks'] == 1
+
+    interface = httpx.Request('PUT', 'http://fake-openstack:9696/networking/v2.0/routers/r1/add_router_interface')
+    assert not resilience.retryable(interface, 503) and not resilience.retryable(interface)
+    assert resilience.retryable(interface, 429)
+    assert resilience.retryable(httpx.Request('PUT', 'http://fake-openstack:9696/networking/v2.0/routers/r1'), 503)
+
+    with pytest.raises(CircuitOpenError):
+        session.get('http://fake-openstack/image/v2/images')
+    assert fake.calls['GET image/images'] == 3
+    assert resilience.breaker(('fake-openstack', None, 'image')).state == 'open'
+
+
+def test_resilience_caps_retry_after_and_releases_interrupted_trials():
+    resilience = Resilience(max_backoff=2)
+    request = httpx.Request('GET', 'http://fake-openstack/image/v2/images')
+    assert resilience.delay(0, httpx.Response(503, headers={'Retry-After': '3600'}, request=request)) == 2
+
+    class Interrupted(httpx.BaseTransport):
+        def handle_request(self, request):
+            raise KeyboardInterrupt
+
+    breaker = resilience.breaker(resilience.endpoint(request))
+    breaker.opened_at = time.monotonic() - resilience.reset_timeout
+    session = SessionPool(transport=Interrupted(), resilience=resilience)
+    with pytest.raises(KeyboardInterrupt):
+        session.get('http://fake-openstack/image/v2/images')
+    # la requête d'essai interrompue ne bloque pas le disjoncteur en demi-ouverture
+    assert breaker.state == 'half-open' and breaker.allow()
+
+
+def test_script1_raises_authentication_error():
+    fake = FakeOpenStack(seed=1, error_rate={'identity': 1.0})
+    session = SessionPool(transport=fake.transport(), resilience=Resilience(retries=0))
+    with pytest.raises(AuthenticationError, match='HTTP 503'):
+        OpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+
+
+def test_exporter_streams_changes_and_serves_cached_metrics():
+    fake = FakeOpenStack(seed=1)
+    fake.populate(networks=2, routers=1, servers=5)
+    session = AsyncSessionPool(transport=fake.async_transport())
+    client = AsyncOpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+    exporter = Exporter(client, min_interval=1, max_interval=8)
+
+    async def refresh_twice():
+        first = await exporter.refresh()
+        server = next(iter(fake.collections['servers']))
+        await client.session.delete(client.url('compute', f'/servers/{server}'))
+        second = await exporter.refresh()
+        third = await exporter.refresh()
+        await client.close()
+        return first, second, third
+
+    first, second, third = asyncio.run(refresh_twice())
+
+    assert len([event for event in first if event['section'] == 'servers']) == 5
+    assert {(event['event'], event['section']) for event in second} == {('removed', 'servers'), ('removed', 'port')}
+    assert third == [] and exporter.interval == 1.5
+
+    server = metrics_server(exporter, port=0)
+    calls = sum(fake.calls.values())
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        metrics = urllib.request.urlopen(url + '/metrics').read().decode()
+        state = json.loads(urllib.request.urlopen(url + '/state').read())
+    finally:
+        server.shutdown()
+    assert 'openstack_lab_servers{status="ACTIVE"} 4' in metrics
+    assert 'openstack_lab_router_interfaces{router="router-0",status="ACTIVE"} 1' in metrics
+    assert len(state['servers']['servers']) == 4
+    assert sum(fake.calls.values()) == calls
+
+
+
+def test_exporter_keeps_serving_its_cache_when_keystone_fails():
+    fake = FakeOpenStack(seed=1)
+    fake.populate(networks=2, routers=1, servers=3)
+    session = AsyncSessionPool(transport=fake.async_transport(), resilience=Resilience(retries=0))
+    client = AsyncOpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+    exporter = Exporter(client, min_interval=0.01, max_interval=0.02)
+
+    async def keystone_outage():
+        await exporter.refresh()
+        cached = exporter.state()
+        fake.error_rate = {'identity': 1.0}
+        # le token expiré est renouvelé en tâche de fond dès le démarrage de la boucle
+        client.token_expires_at = time.time() - 1
+        watcher = asyncio.ensure_future(watch(exporter, stream=io.StringIO()))
+        await asyncio.sleep(0.1)
+        # un rafraîchissement qui doit s'authentifier échoue sans arrêter la boucle
+        client.token = None
+        await asyncio.sleep(0.1)
+        running = not watcher.done()
+        watcher.cancel()
+        await client.close()
+        return cached, running
+
+    cached, running = asyncio.run(keystone_outage())
+
+    assert running
+    assert exporter.state() == cached
+    assert exporter.counters['refresh_errors'] >= 1
+    with pytest.raises(AuthenticationError):
+        asyncio.run(AsyncOpenStack('fake', '80', 'admin', 'admin', 'password', session=AsyncSessionPool(
+            transport=fake.async_transport(), resilience=Resilience(retries=0))).auth_openstack())
+
+def test_export_clouds_tags_resources_and_tolerates_failures():
+    clouds = {'east': FakeOpenStack(seed=1), 'west': FakeOpenStack(seed=2, latency=5.0),
+              'down': FakeOpenStack(seed=3, error_rate={'identity': 1.0})}
+    clouds['east'].populate(networks=2, servers=3)
+    clouds['west'].populate(networks=2, servers=4)
+    profiles = {name: dict(PROFILE_DEFAULTS, ip=name, region=f'region-{name}') for name in clouds}
+
+    async def run():
+        results = await asyncio.gather(*(
+            export_cloud(name, profiles[name], timeout=0.5, retries=0, transport=fake.async_transport())
+            for name, fake in clouds.items()))
+        return dict(zip(clouds, results))
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    assert time.perf_counter() - started < 2
+
+    merged = merge_snapshots(results, profiles)
+    assert merged['clouds']['east']['status'] == 'ok'
+    assert merged['clouds']['west']['status'] == 'timeout'
+    assert merged['clouds']['down']['status'] == 'error'
+    assert merged['clouds']['down']['error'].startswith("Erreur lors de l'authentification")
+    servers = merged['servers']['servers']
+    assert len(servers) == 3
+    assert {(server['cloud'], server['region']) for server in servers} == {('east', 'region-east')}
+
+
+def test_topology_bulk_creates_networks_and_subnets():
+    fake = FakeOpenStack(seed=1)
+    session = SessionPool(transport=fake.transport())
+    openstack = OpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+    openstack.auth_openstack()
+    names = [f'net{i}' for i in range(20)]
+    spec = normalize_spec({
+        'name': 'bulk',
+        'networks': [{'name': name, 'subnets': [{'name': f'{name}_subnet', 'cidr': f'10.{i}.0.0/24'}]}
+                     for i, name in enumerate(names)],
+    })
+
+    state = read_state(openstack)
+    plan = plan_topology(spec, state)
+    result = apply_plan(openstack, plan, spec, state)
+
+    assert result.ok
+    assert plan.calls == 2
+    assert fake.calls['POST network/networks'] == 1
+    assert fake.calls['POST network/subnets'] == 1
+    subnets = fake.collections['subnets'].values()
+    networks = {item['id']: item['name'] for item in fake.collections['networks'].values()}
+    assert sorted(networks[subnet['network_id']] + '_subnet' for subnet in subnets) == sorted(
+        subnet['name'] for subnet in subnets)
+    assert plan_topology(spec, read_state(openstack)).actions == []
+
+
+def test_fake_bulk_create_rolls_back_side_effects():
+    fake = FakeOpenStack(seed=1)
+    session = SessionPool(transport=fake.transport())
+    openstack = OpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+    openstack.auth_openstack()
+    network = openstack.create_resources('networks', [{'name': 'blue'}])[0]
+
+    # le second sous-réseau chevauche le premier : le lot entier est refusé
+    with pytest.raises(httpx.HTTPStatusError):
+        openstack.create_resources('subnets', [{'network_id': network['id'], 'cidr': '10.0.0.0/24'},
+                                               {'network_id': network['id'], 'cidr': '10.0.0.0/25'}])
+
+    assert fake.collections['subnets'] == {}
+    assert fake.collections['networks'][network['id']]['subnets'] == []
+    assert openstack.create_resources('subnets', [{'network_id': network['id'], 'cidr': '10.0.0.0/25'}])
+
+
+def test_destroy_topology_deletes_layers_in_order_and_is_rerunnable():
+    fake = FakeOpenStack(seed=1, delete_delay=0.2)
+    session = SessionPool(transport=fake.transport())
+    openstack = OpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+    openstack.auth_openstack()
+    assert openstack.create_topology(*TOPOLOGY).ok
+    spec = load_spec('topologies/lab.yaml')
+
+    # les ressources de ``create_topology`` ne sont pas étiquetées
+    assert plan_destroy(spec, read_state(openstack)).actions == []
+    reads = fake.calls['GET compute/servers']
+    plan, result = destroy_topology(openstack, spec, untagged=True)
+
+    assert result.ok
+    # une lecture de l'état, puis une seule liste par attente pour les trois machines virtuelles
+    assert WAIT_SERVERS in result.timings
+    assert fake.calls['GET compute/servers'] - reads <= 4
+    assert [action.kind for action in plan.actions] == (
+        ['server'] * 3 + ['interface'] + ['router'] + ['subnet'] * 3 + ['network'] * 3)
+    assert all(not fake.collections[kind] for kind in ('servers', 'ports', 'routers', 'subnets', 'networks'))
+    plan, result = destroy_topology(openstack, spec, untagged=True)
+    assert plan.actions == [] and result is None
+
+
+def test_generate_spec_provisions_and_reports_phases():
+    spec = generate_spec(12, vms_per_network=3, routers=5, cidr='10.8.0.0/16', prefix=26)
+    assert spec['subnets'][11]['cidr'] == '10.8.2.192/26'
+    assert sorted(len(router['interfaces']) for router in spec['routers']) == [2, 2, 2, 3, 3]
+    with pytest.raises(ValueError):
+        generate_spec(5, cidr='10.0.0.0/23', prefix=24)
+
+    fake = FakeOpenStack(seed=1, latency=0.005)
+    session = SessionPool(transport=fake.transport())
+    openstack = OpenStack('fake', '80', 'admin', 'admin', 'password', session=session)
+    openstack.auth_openstack()
+    state = read_state(openstack)
+    plan = plan_topology(spec, state)
+    result = apply_plan(openstack, plan, spec, state, max_workers=8)
+    measures = phase_report(plan, result)
+
+    assert result.ok and measures['failed'] == 0
+    rows = {row['phase']: row for row in measures['phases']}
+    assert (rows['create network']['resources'], rows['create network']['tasks']) == (12, 1)
+    assert (rows['create server']['resources'], rows['create server']['tasks']) == (36, 12)
+    assert rows['create interface']['p95'] >= rows['create interface']['p50'] > 0
+    assert measures['resources'] == 12 + 12 + 5 + 12 + 36
+    assert measures['throughput'] > 0
+    assert len(fake.collections['servers']) == 36
+
+
+def test_preflight_fails_in_one_round_trip_when_over_quota(tmp_path):
+    fake = FakeOpenStack(seed=1, quotas={'instances': 4, 'cores': 8, 'network': 100, 'port': 6})
+    fake.populate(networks=2, servers=2)
+    session = SessionPool(transport=fake.transport())
+    cache = TokenCache(path=str(tmp_path / 'tokens.json'))
+    OpenStack('fake', '80', 'admin', 'admin', 'password', session=session, token_cache=cache)
+    openstack = OpenStack('fake', '80', 'admin', 'admin', 'password', session=session, token_cache=cache)
+    assert openstack.project_id == fake.project_id
+
+    spec = generate_spec(2, vms_per_network=2, routers=1, name='quota')
+    plan = plan_topology(spec, read_state(openstack))
+    fake.calls.clear()
+    result = preflight(openstack, Demand.from_plan(plan))
+
+    assert not result.ok
+    assert any('instances' in problem for problem in result.problems)
+    assert any('port' in problem for problem in result.problems)
+    # l'image vient de l'index chargé par ``read_state`` ; aucune création n'est envoyée
+    assert sorted(fake.calls) == ['GET compute/flavors', 'GET compute/limits', 'GET network/quotas']
+    assert sum(fake.calls.values()) == 3
+
+    demand = Demand(networks=1, subnets=1)
+    demand.add_server('cirros-0.5.2-x86_64-disk', 'm1.missing')
+    result = preflight(openstack, demand)
+    assert result.problems == ['Flavor m1.missing introuvable']
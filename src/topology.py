@@ -0,0 +1,1165 @@
+#!/usr/bin/env python
+
+import functools
+import inspect
+import ipaddress
+import json
+import os
+import time
+from collections import namedtuple
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+import typer
+
+from src.auth import AuthenticationError, TokenCache
+from src.instrumentation import Recorder, make_recorder, percentile, report
+from src.preflight import Demand, run_preflight
+from src.resilience import DEFAULT_MAX_CONCURRENCY, DEFAULT_RETRIES, Resilience
+from src.pagination import DEFAULT_PAGE_SIZE
+from src.scheduler import DEFAULT_WORKERS, TaskGraph
+from src.script1 import OpenStack
+from src.session import DEFAULT_MAX_CONNECTIONS, DEFAULT_TIMEOUT, SessionPool
+from src.snapshot import changes_since
+
+app = typer.Typer()
+
+# étiquette des ressources gérées par une topologie : ``description`` des
+# ressources Neutron (``openstack-lab:<topologie>``) et métadonnée des serveurs
+MANAGED_TAG = "openstack-lab"
+
+DEFAULT_IMAGE = "cirros-0.5.2-x86_64-disk"
+DEFAULT_FLAVOR = "m1.tiny"
+
+# collections lues (en parallèle) pour comparer la spécification à l'état du cloud :
+# (type de ressource, projection ``fields=``, filtres)
+STATE_QUERIES = {
+    "networks": (["name", "description", "router:external"], {}),
+    "subnets": (["name", "description", "network_id", "cidr"], {}),
+    "routers": (["name", "description", "external_gateway_info"], {}),
+    "ports": (["device_id", "fixed_ips"], {"device_owner": "network:router_interface"}),
+    "server_details": (None, {}),
+    "images": (None, {}),
+    "flavors": (None, {}),
+}
+
+# une action du plan :
+#   op : create, update ou delete
+#   kind : network, subnet, router, interface ou server
+#   name : le nom de la ressource (``<routeur>:<sous-réseau>`` pour une interface)
+#   calls : le nombre d'appels d'API nécessaires
+#   reason : la raison d'une mise à jour ou d'un remplacement
+#   data : les paramètres de l'action
+Action = namedtuple("Action", "op kind name calls reason data")
+
+SYMBOLS = {"create": "+", "update": "~", "delete": "-"}
+
+# créations regroupées en une seule requête par type (création en lot de Neutron)
+BULK_CREATES = {"network": "networks", "subnet": "subnets"}
+
+# suppressions qui doivent précéder la suppression d'un type de ressource
+DELETE_ORDER = {
+    "interface": ("server",),
+    "subnet": ("server", "interface"),
+    "network": ("server", "interface", "subnet", "router"),
+}
+
+# tâche qui attend, en une seule liste par lecture, la disparition des machines virtuelles supprimées
+WAIT_SERVERS = "wait server deletion"
+
+# index d'un plan pour ``_dependencies``, construit une fois par plan (``_plan_index``)
+PlanIndex = namedtuple("PlanIndex", "planned network_subnets deletes interfaces")
+
+
+def managed_description(topology):
+    return f"{MANAGED_TAG}:{topology}"
+
+
+def is_managed(kind, item, topology):
+    """
+    Indique si une ressource existante a été créée par la topologie ``topology``.
+    """
+    if kind == "server":
+        return (item.get("metadata") or {}).get(MANAGED_TAG) == topology
+    return item.get("description") == managed_description(topology)
+
+
+def load_spec(path):
+    """
+    Lit une spécification de topologie YAML ou JSON.
+    Args:
+        path: le chemin du fichier (``.json``, ``.yaml`` ou ``.yml``).
+
+    Returns:
+        La spécification normalisée (voir ``normalize_spec``).
+    """
+    with open(path) as f:
+        content = f.read()
+
+    if path.endswith(".json"):
+        raw = json.loads(content)
+    else:
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("PyYAML est nécessaire pour lire une spécification YAML (pip install pyyaml)")
+        raw = yaml.safe_load(content)
+
+    default_name = os.path.splitext(os.path.basename(path))[0]
+    return normalize_spec(raw, default_name=default_name)
+
+
+def normalize_spec(raw, default_name="lab"):
+    """
+    Complète une spécification avec ses valeurs par défaut et vérifie ses références.
+
+    Exemple::
+
+        name: lab
+        image: cirros-0.5.2-x86_64-disk
+        flavor: m1.tiny
+        networks:
+          - name: blue
+            subnets: [{name: blue_subnet, cidr: 10.0.0.0/24}]
+        routers:
+          - name: router
+            external_network: public
+            interfaces: [blue_subnet]
+        servers:
+          - {name: web, network: blue, count: 3}
+
+    Returns:
+        Le dictionnaire ``{"name", "networks", "subnets", "routers", "servers"}``.
+    """
+    raw = raw or {}
+    image = raw.get("image", DEFAULT_IMAGE)
+    flavor = raw.get("flavor", DEFAULT_FLAVOR)
+
+    networks = []
+    subnets = {}
+    for network in raw.get("networks", []):
+        network_subnets = []
+        for subnet in network.get("subnets", []):
+            if "cidr" not in subnet:
+                raise ValueError(f"Le sous-réseau {subnet.get('name')} n'a pas de CIDR")
+            subnet = {
+                "name": subnet["name"],
+                "network": network["name"],
+                "cidr": subnet["cidr"],
+                "gateway_ip": subnet.get("gateway_ip"),
+                "enable_dhcp": subnet.get("enable_dhcp", True),
+            }
+            if subnet["name"] in subnets:
+                raise ValueError(f"Sous-réseau {subnet['name']} défini deux fois")
+            subnets[subnet["name"]] = subnet
+            network_subnets.append(subnet)
+        networks.append({
+            "name": network["name"],
+            "external": bool(network.get("external", False)),
+            "subnets": network_subnets,
+        })
+    network_names = {network["name"] for network in networks}
+    if len(network_names) != len(networks):
+        raise ValueError("Un réseau est défini deux fois")
+
+    routers = []
+    for router in raw.get("routers", []):
+        external_network = router.get("external_network")
+        if external_network is not None and external_network not in network_names:
+            raise ValueError(f"Le routeur {router['name']} référence un réseau inconnu : {external_network}")
+        for subnet in router.get("interfaces", []):
+            if subnet not in subnets:
+                raise ValueError(f"Le routeur {router['name']} référence un sous-réseau inconnu : {subnet}")
+        routers.append({
+            "name": router["name"],
+            "external_network": external_network,
+            "interfaces": list(router.get("interfaces", [])),
+        })
+
+    servers = []
+    for server in raw.get("servers", []):
+        if server.get("network") not in network_names:
+            raise ValueError(f"La machine virtuelle {server['name']} référence un réseau inconnu : {server.get('network')}")
+        servers.append({
+            "name": server["name"],
+            "network": server["network"],
+            "image": server.get("image", image),
+            "flavor": server.get("flavor", flavor),
+            "count": int(server.get("count", 1)),
+        })
+
+    return {
+        "name": raw.get("name", default_name),
+        "networks": networks,
+        "subnets": list(subnets.values()),
+        "routers": routers,
+        "servers": servers,
+    }
+
+
+def generate_spec(networks, vms_per_network=1, routers=1, name="loadtest", cidr="10.0.0.0/8", prefix=24,
+                  image=DEFAULT_IMAGE, flavor=DEFAULT_FLAVOR, multi_create=True):
+    """
+    Génère une topologie synthétique pour les tests de charge.
+
+    Le réseau ``i`` reçoit le ``i``-ème bloc ``/prefix`` de ``cidr``. Les
+    sous-réseaux sont répartis à tour de rôle entre les routeurs (sans
+    passerelle externe).
+    Args:
+        networks: le nombre de réseaux (un sous-réseau chacun).
+        vms_per_network: le nombre de machines virtuelles par réseau.
+        routers: le nombre de routeurs.
+        name: le nom de la topologie, préfixe des ressources.
+        cidr: le bloc d'adresses découpé entre les sous-réseaux.
+        prefix: la longueur du préfixe des sous-réseaux.
+        multi_create: crée les machines d'un réseau par une création multiple
+            (``<réseau>-vm-1`` à ``-N``) plutôt qu'une requête par machine.
+
+    Returns:
+        La spécification normalisée.
+    """
+    if networks < 1:
+        raise ValueError("Il faut au moins un réseau")
+    blocks = list(islice(ipaddress.ip_network(cidr).subnets(new_prefix=prefix), networks))
+    if len(blocks) < networks:
+        raise ValueError(f"{cidr} ne contient que {len(blocks)} sous-réseaux /{prefix}")
+
+    width = len(str(networks))
+    network_names = [f"{name}-net{i:0{width}d}" for i in range(networks)]
+    raw = {
+        "name": name,
+        "image": image,
+        "flavor": flavor,
+        "networks": [{"name": network, "subnets": [{"name": f"{network}-subnet", "cidr": str(block)}]}
+                     for network, block in zip(network_names, blocks)],
+        "routers": [{"name": f"{name}-router{k}",
+                     "interfaces": [f"{network}-subnet" for network in network_names[k::routers]]}
+                    for k in range(routers)],
+        "servers": [],
+    }
+    for network in network_names:
+        if vms_per_network < 1:
+            break
+        if multi_create:
+            raw["servers"].append({"name": f"{network}-vm", "network": network, "count": vms_per_network})
+        else:
+            raw["servers"].extend({"name": f"{network}-vm{j}", "network": network} for j in range(vms_per_network))
+    return normalize_spec(raw)
+
+
+def server_names(server):
+    """
+    Retourne les noms des machines virtuelles d'une entrée ``servers`` de la spécification.
+
+    Nova nomme ``<name>-1`` à ``<name>-<count>`` les machines d'une création multiple.
+    """
+    if server["count"] == 1:
+        return [server["name"]]
+    return [f"{server['name']}-{i}" for i in range(1, server["count"] + 1)]
+
+
+def read_state(openstack, max_workers=DEFAULT_WORKERS):
+    """
+    Lit en une passe (requêtes parallèles) l'état du cloud utile au plan.
+
+    Les collections lues alimentent aussi l'index du client.
+    Args:
+        openstack: le client ``OpenStack``.
+        max_workers: le nombre maximal de collections lues en même temps.
+
+    Returns:
+        Les ressources par type (clés de ``STATE_QUERIES``).
+    """
+    def read(kind):
+        fields, filters = STATE_QUERIES[kind]
+        return list(openstack.query(kind, fields=fields, **filters))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {kind: executor.submit(read, kind) for kind in STATE_QUERIES}
+        state = {kind: future.result() for kind, future in futures.items()}
+
+    for kind in ("networks", "subnets", "routers", "images", "flavors"):
+        openstack.index.load(kind, state[kind])
+    openstack.index.load("servers", state["server_details"])
+    return state
+
+
+class Plan:
+    """
+    Liste minimale des appels qui amènent le cloud à l'état décrit par une spécification.
+
+    Attributes:
+        actions: les actions à exécuter.
+        reads: le nombre de collections lues pour établir le plan.
+    """
+
+    def __init__(self, topology, actions, reads=len(STATE_QUERIES)):
+        self.topology = topology
+        self.actions = actions
+        self.reads = reads
+
+    @property
+    def calls(self):
+        # les créations de réseaux (et de sous-réseaux) partagent une seule requête
+        bulk = {action.kind for action in self.actions if _is_bulk(action)}
+        return sum(action.calls for action in self.actions if not _is_bulk(action)) + len(bulk)
+
+    def count(self, op):
+        return sum(1 for action in self.actions if action.op == op)
+
+    def summary(self):
+        return (f"Plan: {self.count('create')} to create, {self.count('update')} to update, "
+                f"{self.count('delete')} to delete ({self.calls} API calls, "
+                f"after {self.reads} collection reads)")
+
+    def lines(self):
+        for action in self.actions:
+            line = f"{SYMBOLS[action.op]} {action.op} {action.kind} {action.name}"
+            if action.reason:
+                line += f" ({action.reason})"
+            yield line
+
+    def to_dict(self):
+        return {
+            "topology": self.topology,
+            "calls": self.calls,
+            "reads": self.reads,
+            "actions": [
+                {"op": action.op, "kind": action.kind, "name": action.name,
+                 "calls": action.calls, "reason": action.reason}
+                for action in self.actions
+            ],
+        }
+
+
+def _by_name(items):
+    by_name = {}
+    for item in items:
+        by_name.setdefault(item.get("name"), item)
+    return by_name
+
+
+def _conflict(kind, name, reason):
+    return ValueError(f"{kind} {name} existe déjà mais n'est pas géré par la topologie ({reason})")
+
+
+def plan_topology(spec, state, prune=False):
+    """
+    Compare une spécification à l'état du cloud et retourne le plan des modifications.
+
+    Une ressource existante du même nom est conservée si elle est conforme ; une
+    ressource gérée par la topologie mais non conforme est remplacée. Seules les
+    ressources gérées (étiquetées) sont supprimées, et seulement avec ``prune``.
+    Args:
+        spec: la spécification normalisée.
+        state: l'état lu par ``read_state``.
+        prune: supprime les ressources gérées absentes de la spécification.
+
+    Returns:
+        Un ``Plan``.
+    """
+    topology = spec["name"]
+    networks = _by_name(state["networks"])
+    subnets = _by_name(state["subnets"])
+    routers = _by_name(state["routers"])
+    servers = _by_name(state["server_details"])
+    images = _by_name(state["images"])
+    flavors = _by_name(state["flavors"])
+
+    attached = {}
+    for port in state["ports"]:
+        for fixed_ip in port.get("fixed_ips", []):
+            attached.setdefault(port.get("device_id"), set()).add(fixed_ip.get("subnet_id"))
+    subnet_names = {item["id"]: item.get("name") for item in state["subnets"]}
+    router_names = {item["id"]: item.get("name") for item in state["routers"]}
+
+    creates, updates, deletes = [], [], []
+
+    def detach(router_id, subnet_id):
+        name = f"{router_names.get(router_id, router_id)}:{subnet_names.get(subnet_id, subnet_id)}"
+        if not any(action.kind == "interface" and action.name == name for action in deletes):
+            deletes.append(Action("delete", "interface", name, 1, "",
+                                  {"router_id": router_id, "subnet_id": subnet_id}))
+
+    def replace(kind, name, item, reason, data):
+        if not is_managed(kind, item, topology):
+            raise _conflict(kind, name, reason)
+        if kind == "subnet":
+            # un sous-réseau attaché à un routeur ne peut pas être supprimé
+            for router_id, subnet_ids in sorted(attached.items()):
+                if item["id"] in subnet_ids:
+                    detach(router_id, item["id"])
+        deletes.append(Action("delete", kind, name, 1, reason, {"id": item["id"]}))
+        creates.append(Action("create", kind, name, 1, reason, data))
+
+    # réseaux
+    for network in spec["networks"]:
+        existing = networks.get(network["name"])
+        if existing is None:
+            creates.append(Action("create", "network", network["name"], 1, "", network))
+        elif bool(existing.get("router:external")) != network["external"]:
+            # un réseau partagé (``public`` de DevStack...) n'est jamais modifié
+            if not is_managed("network", existing, topology):
+                raise _conflict("network", network["name"], "router:external")
+            updates.append(Action("update", "network", network["name"], 1, "router:external", network))
+
+    # sous-réseaux ; un réseau existant non géré, ou externe et déjà pourvu de
+    # sous-réseaux (``public`` de DevStack), est utilisé tel quel, comme dans ``create_topology``
+    unmanaged_subnets = {}
+    for subnet in spec["subnets"]:
+        existing = subnets.get(subnet["name"])
+        network = networks.get(subnet["network"])
+        if existing is None and network is not None and (
+                not is_managed("network", network, topology)
+                or (network.get("router:external") and network.get("subnets"))):
+            unmanaged_subnets[subnet["name"]] = subnet["network"]
+        elif existing is None:
+            creates.append(Action("create", "subnet", subnet["name"], 1, "", subnet))
+        elif existing.get("cidr") != subnet["cidr"]:
+            replace("subnet", subnet["name"], existing, f"cidr {existing.get('cidr')} -> {subnet['cidr']}", subnet)
+        elif network is None or existing.get("network_id") != network["id"]:
+            replace("subnet", subnet["name"], existing, f"network -> {subnet['network']}", subnet)
+
+    # routeurs et interfaces
+    for router in spec["routers"]:
+        existing = routers.get(router["name"])
+        interfaces = set(router["interfaces"])
+        for name in sorted(interfaces & set(unmanaged_subnets)):
+            raise ValueError(f"Le routeur {router['name']} ne peut pas être attaché à {name} : "
+                             f"le réseau {unmanaged_subnets[name]} n'est pas géré par la topologie")
+        if existing is None:
+            creates.append(Action("create", "router", router["name"], 1, "", router))
+        else:
+            external = networks.get(router["external_network"]) if router["external_network"] else None
+            gateway = (existing.get("external_gateway_info") or {}).get("network_id")
+            if gateway != (external["id"] if external is not None else None):
+                updates.append(Action("update", "router", router["name"], 1, "gateway", router))
+
+            current = {subnet_names.get(subnet_id, subnet_id) for subnet_id in attached.get(existing["id"], ())}
+            # une interface vers un sous-réseau remplacé disparaît avec lui
+            replaced = {action.name for action in deletes if action.kind == "subnet"}
+            interfaces -= current - replaced
+            if prune and is_managed("router", existing, topology):
+                for subnet_id in sorted(attached.get(existing["id"], ())):
+                    if subnet_names.get(subnet_id, subnet_id) not in router["interfaces"]:
+                        detach(existing["id"], subnet_id)
+
+        for subnet in sorted(interfaces):
+            creates.append(Action("create", "interface", f"{router['name']}:{subnet}", 1, "",
+                                  {"router": router["name"], "subnet": subnet}))
+
+    # machines virtuelles
+    for server in spec["servers"]:
+        if server["image"] not in images:
+            raise ValueError(f"Image {server['image']} introuvable")
+        if server["flavor"] not in flavors:
+            raise ValueError(f"Flavor {server['flavor']} introuvable")
+        image_id = images[server["image"]]["id"]
+        flavor_id = flavors[server["flavor"]]["id"]
+
+        names = server_names(server)
+        missing = [name for name in names if name not in servers]
+        if server["count"] > 1 and len(missing) == server["count"]:
+            # création multiple (une requête + la lecture de la réservation)
+            creates.append(Action("create", "server", server["name"], 2, f"count={server['count']}", server))
+            continue
+
+        for name in names:
+            data = dict(server, name=name, count=1)
+            existing = servers.get(name)
+            if existing is None:
+                creates.append(Action("create", "server", name, 1, "", data))
+                continue
+
+            reasons = []
+            addresses = existing.get("addresses") or {}
+            if addresses and server["network"] not in addresses:
+                reasons.append(f"network -> {server['network']}")
+            if isinstance(existing.get("image"), dict) and existing["image"].get("id") != image_id:
+                reasons.append(f"image -> {server['image']}")
+            if isinstance(existing.get("flavor"), dict) and existing["flavor"].get("id") not in (None, flavor_id):
+                reasons.append(f"flavor -> {server['flavor']}")
+            if reasons:
+                replace("server", name, existing, ", ".join(reasons), data)
+
+    # ressources gérées absentes de la spécification
+    if prune:
+        wanted_servers = {name for server in spec["servers"] for name in server_names(server)}
+        for name, item in sorted(servers.items()):
+            if name not in wanted_servers and is_managed("server", item, topology):
+                deletes.append(Action("delete", "server", name, 1, "", {"id": item["id"]}))
+
+        wanted_routers = {router["name"] for router in spec["routers"]}
+        for name, item in sorted(routers.items()):
+            if name not in wanted_routers and is_managed("router", item, topology):
+                for subnet_id in sorted(attached.get(item["id"], ())):
+                    detach(item["id"], subnet_id)
+                deletes.append(Action("delete", "router", name, 1, "", {"id": item["id"]}))
+
+        wanted_subnets = {subnet["name"] for subnet in spec["subnets"]}
+        for name, item in sorted(subnets.items()):
+            if name not in wanted_subnets and is_managed("subnet", item, topology):
+                deletes.append(Action("delete", "subnet", name, 1, "", {"id": item["id"]}))
+
+        wanted_networks = {network["name"] for network in spec["networks"]}
+        for name, item in sorted(networks.items()):
+            if name not in wanted_networks and is_managed("network", item, topology):
+                deletes.append(Action("delete", "network", name, 1, "", {"id": item["id"]}))
+
+    return Plan(topology, deletes + updates + creates)
+
+
+def plan_destroy(spec, state, untagged=False):
+    """
+    Retourne le plan de suppression des ressources d'une topologie.
+
+    Une ressource appartient à la topologie si elle porte son étiquette. Avec
+    ``untagged``, les ressources non étiquetées nommées dans la spécification
+    (celles de ``create_topology``) en font aussi partie, sauf un réseau externe
+    non étiqueté (le réseau ``public`` de DevStack, partagé) et ses sous-réseaux.
+    Les interfaces des routeurs supprimés, et celles des autres routeurs vers
+    les sous-réseaux supprimés, sont détachées.
+    Args:
+        spec: la spécification normalisée.
+        state: l'état lu par ``read_state``.
+        untagged: inclut les ressources non étiquetées nommées dans la spécification.
+
+    Returns:
+        Un ``Plan`` de suppressions, vide si la topologie n'existe plus.
+    """
+    topology = spec["name"]
+    names = {
+        "network": {network["name"] for network in spec["networks"]},
+        "subnet": {subnet["name"] for subnet in spec["subnets"]},
+        "router": {router["name"] for router in spec["routers"]},
+        "server": {name for server in spec["servers"] for name in server_names(server)},
+    }
+    shared = {item["id"] for item in state["networks"]
+              if item.get("router:external") and not is_managed("network", item, topology)}
+
+    def owned(kind, item):
+        if is_managed(kind, item, topology):
+            return True
+        if not untagged or item.get("name") not in names[kind]:
+            return False
+        if kind == "network":
+            return item["id"] not in shared
+        if kind == "subnet":
+            return item.get("network_id") not in shared
+        return True
+
+    def deletes(kind, items):
+        # deux ressources du même nom (machine virtuelle recréée...) sont distinguées par leur identifiant
+        counts = {}
+        for item in items:
+            counts[item.get("name")] = counts.get(item.get("name"), 0) + 1
+        return [Action("delete", kind, item.get("name") if counts[item.get("name")] == 1
+                       else f"{item.get('name')} ({item['id']})", 1, "", {"id": item["id"]})
+                for item in items]
+
+    servers = [item for item in state["server_details"] if owned("server", item)]
+    routers = [item for item in state["routers"] if owned("router", item)]
+    networks = [item for item in state["networks"] if owned("network", item)]
+    network_ids = {item["id"] for item in networks}
+    # les sous-réseaux d'un réseau supprimé disparaissent avec lui
+    subnets = [item for item in state["subnets"] if owned("subnet", item) or item.get("network_id") in network_ids]
+
+    router_ids = {item["id"] for item in routers}
+    subnet_ids = {item["id"] for item in subnets}
+    router_names = {item["id"]: item.get("name") for item in state["routers"]}
+    subnet_names = {item["id"]: item.get("name") for item in state["subnets"]}
+    interfaces = {}
+    for port in state["ports"]:
+        router_id = port.get("device_id")
+        for fixed_ip in port.get("fixed_ips", []):
+            subnet_id = fixed_ip.get("subnet_id")
+            if router_id in router_ids or subnet_id in subnet_ids:
+                name = f"{router_names.get(router_id, router_id)}:{subnet_names.get(subnet_id, subnet_id)}"
+                interfaces.setdefault((router_id, subnet_id), Action(
+                    "delete", "interface", name, 1, "", {"router_id": router_id, "subnet_id": subnet_id}))
+
+    # la passerelle d'un routeur est supprimée avec lui
+    return Plan(topology, deletes("server", servers) + list(interfaces.values()) + deletes("router", routers)
+                + deletes("subnet", subnets) + deletes("network", networks))
+
+
+def _is_bulk(action):
+    return action.op == "create" and action.kind in BULK_CREATES
+
+
+def _task_name(action):
+    return f"{action.op} {action.kind} {action.name}"
+
+
+def _batch_name(action):
+    """
+    Retourne la tâche qui exécute ``action`` : une tâche par type pour les créations en lot.
+    """
+    return f"create {BULK_CREATES[action.kind]}" if _is_bulk(action) else _task_name(action)
+
+
+def _layer_name(kind):
+    """
+    Retourne la tâche-barrière qui suit toutes les suppressions d'un type de ressource.
+    """
+    return WAIT_SERVERS if kind == "server" else f"wait {kind} deletion"
+
+
+def _plan_index(plan, spec):
+    """
+    Indexe un plan une seule fois : tâches par (op, type, nom), sous-réseaux par
+    réseau, suppressions par type et suppressions d'interfaces par routeur.
+    """
+    deletes, interfaces = {}, {}
+    for a in plan.actions:
+        if a.op == "delete":
+            deletes.setdefault(a.kind, []).append(_task_name(a))
+            if a.kind == "interface":
+                interfaces.setdefault(a.data["router_id"], []).append(_task_name(a))
+    return PlanIndex(
+        planned={(a.op, a.kind, a.name): _task_name(a) for a in plan.actions},
+        network_subnets={network["name"]: [subnet["name"] for subnet in network["subnets"]]
+                         for network in spec["networks"]},
+        deletes=deletes,
+        interfaces=interfaces,
+    )
+
+
+def _dependencies(action, index):
+    """
+    Retourne les tâches du plan qui doivent précéder ``action`` (``index`` : voir ``_plan_index``).
+    """
+    planned, network_subnets = index.planned, index.network_subnets
+    wanted = []
+
+    if action.op == "delete":
+        if action.kind == "router":
+            return index.interfaces.get(action.data["id"], [])
+        # les machines virtuelles et les interfaces libèrent leurs ports avant
+        # la suppression des sous-réseaux et des réseaux : chaque suppression
+        # dépend des barrières des couches précédentes, pas de chacune de leurs tâches
+        return [_layer_name(kind) for kind in DELETE_ORDER.get(action.kind, ()) if kind in index.deletes]
+
+    if action.kind == "subnet":
+        wanted = [("create", "network", action.data["network"]), ("delete", "subnet", action.name)]
+    elif action.kind == "router":
+        external = action.data["external_network"]
+        if external is not None:
+            wanted = [("create", "network", external)] + [("create", "subnet", s) for s in network_subnets[external]]
+    elif action.kind == "interface":
+        wanted = [("create", "router", action.data["router"]), ("update", "router", action.data["router"]),
+                  ("create", "subnet", action.data["subnet"])]
+    elif action.kind == "server":
+        network = action.data["network"]
+        wanted = [("create", "network", network), ("delete", "server", action.name)]
+        wanted += [("create", "subnet", s) for s in network_subnets[network]]
+
+    return [planned[key] for key in wanted if key in planned]
+
+
+def apply_plan(openstack, plan, spec, state, max_workers=DEFAULT_WORKERS):
+    """
+    Exécute un plan : chaque action est une tâche d'un ``TaskGraph``, sauf les
+    créations de réseaux et de sous-réseaux, regroupées en une création en lot par type.
+    Args:
+        openstack: le client ``OpenStack``.
+        plan: le plan retourné par ``plan_topology``.
+        spec: la spécification normalisée.
+        state: l'état lu par ``read_state``.
+        max_workers: le nombre maximal d'appels envoyés en parallèle.
+
+    Returns:
+        Le ``GraphResult`` de l'exécution.
+    """
+    description = managed_description(spec["name"])
+    metadata = {MANAGED_TAG: spec["name"]}
+
+    # identifiants par (type, nom), complétés au fil des créations
+    ids = {}
+    for kind, collection in (("network", "networks"), ("subnet", "subnets"), ("router", "routers"),
+                             ("server", "server_details"), ("image", "images"), ("flavor", "flavors")):
+        for name, item in _by_name(state[collection]).items():
+            ids[(kind, name)] = item["id"]
+
+    def gateway(router):
+        if router["external_network"] is None:
+            return None
+        return {"network_id": ids[("network", router["external_network"])]}
+
+    def attributes(action):
+        data = action.data
+        if action.kind == "network":
+            return {"name": data["name"], "description": description, "router:external": data["external"]}
+        attributes = {
+            "name": data["name"],
+            "description": description,
+            "network_id": ids[("network", data["network"])],
+            "cidr": data["cidr"],
+            "ip_version": 4,
+            "enable_dhcp": data["enable_dhcp"],
+        }
+        if data["gateway_ip"] is not None:
+            attributes["gateway_ip"] = data["gateway_ip"]
+        return attributes
+
+    def run_batch(actions):
+        kind = actions[0].kind
+        created = openstack.create_resources(BULK_CREATES[kind], [attributes(action) for action in actions])
+        # Neutron retourne les ressources dans l'ordre de la demande
+        for action, item in zip(actions, created):
+            ids[(kind, action.name)] = item["id"]
+        return [item["id"] for item in created]
+
+    def run(action):
+        data = action.data
+        if action.op == "delete":
+            if action.kind == "interface":
+                return openstack.router_interface(data["router_id"], data["subnet_id"], action="remove")
+            kind = {"network": "networks", "subnet": "subnets", "router": "routers", "server": "servers"}[action.kind]
+            openstack.delete_resource(kind, data["id"])
+            ids.pop((action.kind, action.name), None)
+            return data["id"]
+
+        if action.kind == "network":
+            item = openstack.update_resource("networks", ids[("network", data["name"])],
+                                             {"router:external": data["external"]})
+        elif action.kind == "router":
+            if action.op == "create":
+                attributes = {"name": data["name"], "description": description, "admin_state_up": True}
+                if data["external_network"] is not None:
+                    attributes["external_gateway_info"] = gateway(data)
+                item = openstack.create_resource("routers", attributes)
+            else:
+                item = openstack.update_resource("routers", ids[("router", data["name"])],
+                                                 {"external_gateway_info": gateway(data) or {}})
+        elif action.kind == "interface":
+            return openstack.router_interface(ids[("router", data["router"])], ids[("subnet", data["subnet"])])
+        else:
+            image_id = ids[("image", data["image"])]
+            flavor_id = ids[("flavor", data["flavor"])]
+            network_id = ids[("network", data["network"])]
+            if data["count"] > 1:
+                created = openstack.boot_vms(data["name"], image_id, flavor_id, network_id, data["count"],
+                                             metadata=metadata)
+                for i, server_id in enumerate(created, 1):
+                    ids[("server", f"{data['name']}-{i}")] = server_id
+                return created
+            vm = openstack.create_vm(data["name"], image_id, flavor_id, network_id, metadata=metadata)
+            if "server" not in vm:
+                raise RuntimeError(f"Échec de la création de la machine virtuelle {data['name']}")
+            item = vm["server"]
+
+        ids[(action.kind, action.name)] = item["id"]
+        return item["id"]
+
+    # les créations de réseaux et de sous-réseaux sont regroupées en une tâche (et une requête) par type
+    batches = {}
+    for action in plan.actions:
+        batches.setdefault(_batch_name(action), []).append(action)
+    batch_of = {_task_name(action): _batch_name(action) for action in plan.actions}
+
+    graph = TaskGraph()
+    index = _plan_index(plan, spec)
+    for kind, tasks in index.deletes.items():
+        if kind == "server":
+            # Nova ne libère les ports qu'à la fin de la suppression : la couche est attendue
+            # en une fois, à partir d'une date antérieure à toutes les suppressions du plan
+            since = changes_since(time.time())
+            graph.add(WAIT_SERVERS, lambda *server_ids: openstack.wait_for_deletion(server_ids, since), deps=tasks)
+        elif any(kind in kinds for kinds in DELETE_ORDER.values()):
+            graph.add(_layer_name(kind), lambda *_: None, deps=tasks)
+    for name, actions in batches.items():
+        deps = {batch_of.get(dep, dep) for action in actions for dep in _dependencies(action, index)} - {name}
+        if _is_bulk(actions[0]):
+            graph.add(name, lambda *_, actions=actions: run_batch(actions), deps=sorted(deps))
+        else:
+            graph.add(name, lambda *_, action=actions[0]: run(action), deps=sorted(deps))
+
+    return graph.run(max_workers=max_workers)
+
+
+def destroy_topology(openstack, spec, untagged=False, max_workers=DEFAULT_WORKERS, confirm=None):
+    """
+    Supprime les ressources d'une topologie, couche par couche.
+
+    L'état est lu en une passe (``read_state``), puis ``apply_plan`` exécute les
+    suppressions dans l'ordre des dépendances : les machines virtuelles (jusqu'à
+    leur disparition), puis les interfaces, les routeurs, les sous-réseaux et
+    les réseaux, chaque couche en parallèle. Une topologie déjà supprimée donne
+    un plan vide : la suppression peut être relancée sans risque.
+    Args:
+        openstack: le client ``OpenStack``.
+        spec: la spécification normalisée.
+        untagged: inclut les ressources non étiquetées nommées dans la spécification.
+        max_workers: le nombre maximal d'appels envoyés en parallèle.
+        confirm: appelée avec le plan avant les suppressions, qui sont annulées si elle retourne False.
+
+    Returns:
+        Le couple (plan, ``GraphResult``) ; le résultat est None si rien n'a été supprimé.
+    """
+    state = read_state(openstack, max_workers=max_workers)
+    destroy_plan = plan_destroy(spec, state, untagged=untagged)
+    for line in destroy_plan.lines():
+        typer.echo(line)
+    typer.echo(destroy_plan.summary())
+    if not destroy_plan.actions:
+        typer.echo(f"La topologie {spec['name']} n'existe plus.")
+        return destroy_plan, None
+    if confirm is not None and not confirm(destroy_plan):
+        return destroy_plan, None
+    return destroy_plan, apply_plan(openstack, destroy_plan, spec, state, max_workers=max_workers)
+
+
+def _report_result(result):
+    for name, error in result.errors.items():
+        typer.echo(f"Erreur lors de la tâche {name} : {error}")
+    for name in sorted(result.skipped):
+        typer.echo(f"Tâche {name} annulée (dépendance en échec)")
+
+
+def phase_report(plan, result):
+    """
+    Mesure l'exécution d'un plan par phase (type de ressource).
+
+    Pour chaque phase : le nombre de ressources et de tâches (une création en
+    lot est une seule tâche), les échecs, la latence des tâches (p50, p95, max)
+    et la durée de la phase (du début de sa première tâche à la fin de la dernière).
+    Args:
+        plan: le plan exécuté.
+        result: le ``GraphResult`` de ``apply_plan``.
+
+    Returns:
+        Le dictionnaire ``{"phases": [...], "resources", "failed", "seconds", "throughput"}``.
+    """
+    phases = {}
+    for action in plan.actions:
+        phase = phases.setdefault(f"{action.op} {action.kind}", {"resources": 0, "failed": 0, "tasks": set()})
+        task = _batch_name(action)
+        resources = action.data.get("count", 1) if action.kind == "server" and action.op == "create" else 1
+        phase["resources"] += resources
+        phase["tasks"].add(task)
+        if task in result.errors or task in result.skipped:
+            phase["failed"] += resources
+
+    rows = []
+    for name, phase in phases.items():
+        timings = [result.timings[task] for task in phase["tasks"] if task in result.timings]
+        latencies = sorted(finished - started for started, finished in timings)
+        rows.append({
+            "phase": name,
+            "resources": phase["resources"],
+            "tasks": len(phase["tasks"]),
+            "failed": phase["failed"],
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "max": latencies[-1] if latencies else 0.0,
+            "seconds": (max(end for _, end in timings) - min(start for start, _ in timings)) if timings else 0.0,
+            "_started": min((start for start, _ in timings), default=0.0),
+        })
+    rows.sort(key=lambda row: row.pop("_started"))
+
+    timings = list(result.timings.values())
+    seconds = (max(end for _, end in timings) - min(start for start, _ in timings)) if timings else 0.0
+    resources = sum(row["resources"] for row in rows)
+    failed = sum(row["failed"] for row in rows)
+    return {
+        "phases": rows,
+        "resources": resources,
+        "failed": failed,
+        "seconds": seconds,
+        "throughput": (resources - failed) / seconds if seconds else 0.0,
+    }
+
+
+def phase_lines(measures):
+    """
+    Retourne le rapport de ``phase_report`` : une ligne par phase, puis le débit obtenu.
+    """
+    lines = [f"{'phase':18} {'ressources':>10} {'tâches':>6} {'échecs':>6} "
+             f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'durée s':>8}"]
+    for row in measures["phases"]:
+        lines.append(f"{row['phase']:18} {row['resources']:10} {row['tasks']:6} {row['failed']:6} "
+                     f"{row['p50'] * 1000:8.1f} {row['p95'] * 1000:8.1f} {row['max'] * 1000:8.1f} "
+                     f"{row['seconds']:8.2f}")
+    lines.append(f"{measures['resources'] - measures['failed']}/{measures['resources']} ressource(s) en "
+                 f"{measures['seconds']:.2f} s : {measures['throughput']:.1f} ressources/s")
+    return lines
+
+
+# options de connexion et d'instrumentation communes aux commandes (voir ``connection_options``)
+CONNECTION_OPTIONS = {
+    "openstack_ip": (str, typer.Option("172.28.0.2", help="OpenStack IP address", envvar="OPENSTACK_IP")),
+    "openstack_port": (str, typer.Option("80", help="OpenStack port", envvar="OPENSTACK_PORT")),
+    "project_name": (str, typer.Option("admin", help="OpenStack project name", envvar="OS_PROJECT_NAME")),
+    "username": (str, typer.Option("admin", help="OpenStack username", envvar="OS_USERNAME")),
+    "password": (str, typer.Option("password", help="OpenStack password", envvar="OS_PASSWORD")),
+    "pool_size": (int, typer.Option(DEFAULT_MAX_CONNECTIONS, help="Maximum HTTP connections per endpoint")),
+    "timeout": (float, typer.Option(DEFAULT_TIMEOUT, help="HTTP timeout in seconds")),
+    "token_cache": (bool, typer.Option(True, help="Reuse cached Keystone tokens across runs")),
+    "auth_url": (str, typer.Option(None, help="Keystone URL", envvar="OS_AUTH_URL")),
+    "interface": (str, typer.Option("public", help="Service catalog interface", envvar="OS_INTERFACE")),
+    "region": (str, typer.Option(None, help="Service catalog region", envvar="OS_REGION_NAME")),
+    "page_size": (int, typer.Option(DEFAULT_PAGE_SIZE, help="Number of items requested per page")),
+    "timings": (bool, typer.Option(False, help="Print request count and p50/p95/max latency per endpoint")),
+    "metrics_file": (str, typer.Option(None, help="Write the request metrics to this Prometheus textfile")),
+    "trace_file": (str, typer.Option(None, help="Write every request to this JSON trace (chrome://tracing, Perfetto)")),
+    "retries": (int, typer.Option(DEFAULT_RETRIES, help="Retries of idempotent requests on 429/5xx and network errors")),
+    "max_concurrency": (int, typer.Option(DEFAULT_MAX_CONCURRENCY,
+                                          help="Maximum concurrent requests per service (adaptive)")),
+}
+
+
+class Connection:
+    """
+    Options de connexion et d'instrumentation d'une commande (``CONNECTION_OPTIONS``).
+
+    ``connect`` ouvre le client et ``report`` affiche ou écrit les mesures des requêtes.
+    """
+
+    def __init__(self, **options):
+        for name, value in options.items():
+            setattr(self, name, value)
+        self.recorder = None
+
+    def connect(self, record=False):
+        """
+        Ouvre le client ; avec ``record``, les requêtes sont mesurées même sans option d'instrumentation.
+        """
+        self.recorder = Recorder() if record else make_recorder(self.timings, self.metrics_file, self.trace_file)
+        session = SessionPool(max_connections=self.pool_size, timeout=self.timeout, recorder=self.recorder,
+                              resilience=Resilience(retries=self.retries, max_concurrency=self.max_concurrency))
+        try:
+            return OpenStack(self.openstack_ip, self.openstack_port, self.project_name, self.username,
+                             self.password, session=session, token_cache=TokenCache() if self.token_cache else None,
+                             auth_url=self.auth_url, interface=self.interface, region=self.region,
+                             page_size=self.page_size)
+        except AuthenticationError as e:
+            typer.echo(f"Erreur : {e}", err=True)
+            session.close()
+            raise typer.Exit(1)
+
+    def report(self):
+        report(self.recorder, self.timings, self.metrics_file, self.trace_file)
+
+
+def connection_options(command):
+    """
+    Ajoute les options ``CONNECTION_OPTIONS`` à une commande typer ; la commande
+    reçoit à la place un ``Connection`` dans son paramètre ``connection``.
+    """
+    signature = inspect.signature(command)
+    parameters = [parameter for name, parameter in signature.parameters.items() if name != "connection"]
+    parameters += [inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=option, annotation=annotation)
+                   for name, (annotation, option) in CONNECTION_OPTIONS.items()]
+
+    @functools.wraps(command)
+    def wrapper(**kwargs):
+        options = {name: kwargs.pop(name) for name in CONNECTION_OPTIONS}
+        return command(connection=Connection(**options), **kwargs)
+
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
+
+
+def _plan(spec_path, openstack, prune, workers):
+    try:
+        spec = load_spec(spec_path)
+        state = read_state(openstack, max_workers=workers)
+        return spec, state, plan_topology(spec, state, prune=prune)
+    except ValueError as e:
+        typer.echo(f"Erreur : {e}", err=True)
+        openstack.close()
+        raise typer.Exit(1)
+
+
+@app.command(help="Show the calls needed to converge the cloud to a topology spec.")
+@connection_options
+def plan(
+    spec_path: str = typer.Argument(..., help="Topology spec (YAML or JSON)"),
+    prune: bool = typer.Option(False, help="Delete managed resources missing from the spec"),
+    output_json: bool = typer.Option(False, "--json", help="Print the plan as JSON"),
+    workers: int = typer.Option(DEFAULT_WORKERS, help="Maximum number of concurrent requests"),
+    connection=None,
+):
+    """
+    Cette commande permet d'afficher les appels nécessaires pour amener le cloud à l'état d'une spécification.
+    Args:
+        spec_path: le chemin de la spécification de la topologie.
+        prune: supprime les ressources gérées absentes de la spécification.
+        output_json: affiche le plan en JSON.
+        connection: les options de connexion et d'instrumentation.
+    """
+    openstack = connection.connect()
+    _, _, topology_plan = _plan(spec_path, openstack, prune, workers)
+    openstack.close()
+    connection.report()
+
+    if output_json:
+        typer.echo(json.dumps(topology_plan.to_dict(), indent=4))
+        return
+    for line in topology_plan.lines():
+        typer.echo(line)
+    typer.echo(topology_plan.summary())
+
+
+@app.command(help="Converge the cloud to a topology spec, running only the planned calls.")
+@connection_options
+def apply(
+    spec_path: str = typer.Argument(..., help="Topology spec (YAML or JSON)"),
+    prune: bool = typer.Option(False, help="Delete managed resources missing from the spec"),
+    workers: int = typer.Option(DEFAULT_WORKERS, help="Maximum number of concurrent requests"),
+    skip_preflight: bool = typer.Option(False, help="Skip the quota, image and flavor check before provisioning"),
+    connection=None,
+):
+    """
+    Cette commande permet d'amener le cloud à l'état d'une spécification en n'exécutant que le plan.
+    Args:
+        spec_path: le chemin de la spécification de la topologie.
+        prune: supprime les ressources gérées absentes de la spécification.
+        workers: le nombre maximal d'appels envoyés en parallèle.
+        skip_preflight: ne vérifie pas les quotas, l'image et le flavor avant les créations.
+        connection: les options de connexion et d'instrumentation.
+    """
+    openstack = connection.connect()
+    spec, state, topology_plan = _plan(spec_path, openstack, prune, workers)
+
+    for line in topology_plan.lines():
+        typer.echo(line)
+    typer.echo(topology_plan.summary())
+    if not topology_plan.actions:
+        typer.echo("La topologie est déjà à jour.")
+        openstack.close()
+        connection.report()
+        return
+
+    demand = Demand.from_plan(topology_plan)
+    if demand and not skip_preflight:
+        run_preflight(openstack, demand)
+
+    result = apply_plan(openstack, topology_plan, spec, state, max_workers=workers)
+    openstack.close()
+    connection.report()
+
+    _report_result(result)
+    if not result.ok:
+        raise typer.Exit(1)
+    typer.echo(f"Topologie {spec['name']} appliquée.")
+
+
+def confirm_destroy(destroy_plan):
+    return typer.confirm(f"Supprimer {len(destroy_plan.actions)} ressource(s) de la topologie "
+                         f"{destroy_plan.topology} ?")
+
+
+@app.command(help="Delete every resource of a topology, layer by layer (safe to rerun).")
+@connection_options
+def destroy(
+    spec_path: str = typer.Argument(..., help="Topology spec (YAML or JSON)"),
+    untagged: bool = typer.Option(False, help="Also delete untagged resources named in the spec (create_topology)"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Do not ask for confirmation"),
+    workers: int = typer.Option(DEFAULT_WORKERS, help="Maximum number of concurrent requests"),
+    connection=None,
+):
+    """
+    Cette commande permet de supprimer les ressources d'une topologie.
+    Args:
+        spec_path: le chemin de la spécification de la topologie.
+        untagged: supprime aussi les ressources non étiquetées nommées dans la spécification.
+        yes: supprime sans demander de confirmation.
+        workers: le nombre maximal d'appels envoyés en parallèle.
+        connection: les options de connexion et d'instrumentation.
+    """
+    try:
+        spec = load_spec(spec_path)
+    except (OSError, ValueError) as e:
+        typer.echo(f"Erreur : {e}", err=True)
+        raise typer.Exit(1)
+    openstack = connection.connect()
+    _, result = destroy_topology(openstack, spec, untagged=untagged, max_workers=workers,
+                                 confirm=None if yes else confirm_destroy)
+    openstack.close()
+    connection.report()
+
+    if result is None:
+        return
+    _report_result(result)
+    if not result.ok:
+        raise typer.Exit(1)
+    typer.echo(f"Topologie {spec['name']} supprimée.")
+
+
+@app.command(help="Provision a synthetic N-network topology and report throughput and per-phase latency.")
+@connection_options
+def generate(
+    networks: int = typer.Option(10, help="Number of networks (one subnet each)"),
+    vms_per_network: int = typer.Option(1, help="Number of VMs per network"),
+    routers: int = typer.Option(1, help="Number of routers (subnets are spread round-robin)"),
+    name: str = typer.Option("loadtest", help="Topology name, used as resource prefix and tag"),
+    cidr: str = typer.Option("10.0.0.0/8", help="Address block split into the subnets"),
+    prefix: int = typer.Option(24, help="Prefix length of the subnets"),
+    image: str = typer.Option(DEFAULT_IMAGE, help="Image of the VMs"),
+    flavor: str = typer.Option(DEFAULT_FLAVOR, help="Flavor of the VMs"),
+    multi_create: bool = typer.Option(True, help="Boot the VMs of a network with one Nova multi-create"),
+    destroy_after: bool = typer.Option(False, "--destroy", help="Delete the generated topology after the run"),
+    output: str = typer.Option(None, help="Write the measures to this JSON file"),
+    workers: int = typer.Option(DEFAULT_WORKERS, help="Provisioning concurrency (maximum concurrent tasks)"),
+    skip_preflight: bool = typer.Option(False, help="Skip the quota, image and flavor check before provisioning"),
+    connection=None,
+):
+    """
+    Cette commande permet de créer une topologie synthétique et de mesurer le débit du plan de contrôle.
+    Args:
+        networks: le nombre de réseaux.
+        vms_per_network: le nombre de machines virtuelles par réseau.
+        routers: le nombre de routeurs.
+        name: le nom de la topologie.
+        workers: le nombre maximal de tâches exécutées en parallèle.
+        destroy_after: supprime la topologie générée après la mesure.
+        output: le fichier JSON des mesures.
+        skip_preflight: ne vérifie pas les quotas, l'image et le flavor avant les créations.
+        connection: les options de connexion et d'instrumentation.
+    """
+    try:
+        spec = generate_spec(networks, vms_per_network, routers, name=name, cidr=cidr, prefix=prefix,
+                             image=image, flavor=flavor, multi_create=multi_create)
+    except ValueError as e:
+        typer.echo(f"Erreur : {e}", err=True)
+        raise typer.Exit(1)
+    # le nombre de requêtes rapporté est celui réellement envoyé (nouvelles tentatives comprises)
+    openstack = connection.connect(record=True)
+    try:
+        state = read_state(openstack, max_workers=workers)
+        topology_plan = plan_topology(spec, state)
+    except ValueError as e:
+        typer.echo(f"Erreur : {e}", err=True)
+        openstack.close()
+        raise typer.Exit(1)
+    typer.echo(topology_plan.summary())
+    demand = Demand.from_plan(topology_plan)
+    if demand and not skip_preflight:
+        run_preflight(openstack, demand)
+
+    sent = len(connection.recorder.samples)
+    result = apply_plan(openstack, topology_plan, spec, state, max_workers=workers)
+    measures = dict(phase_report(topology_plan, result), workers=workers,
+                    requests=len(connection.recorder.samples) - sent)
+    _report_result(result)
+    for line in phase_lines(measures):
+        typer.echo(line)
+    if output:
+        with open(output, "w") as f:
+            json.dump(measures, f, indent=4)
+
+    if destroy_after:
+        _, destroyed = destroy_topology(openstack, spec, max_workers=workers)
+        if destroyed is not None:
+            _report_result(destroyed)
+    openstack.close()
+    connection.report()
+
+    if not result.ok:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()